@@ -67,6 +67,10 @@ INSTALLED_APPS = (
 
 PIPELINE_ENABLED = False
 
+# Stands in for a mail server locally: send_queued_emails prints each email instead. To keep
+# them as files, use 'django.core.mail.backends.filebased.EmailBackend' and set EMAIL_FILE_PATH.
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+
 try:
     from example_project.local_settings import * # pylint: disable=E0611
 except ImportError:
@@ -38,3 +38,5 @@
 from ._version import get_versions
 __version__ = get_versions()['version']
 del get_versions
+
+default_app_config = 'portal.apps.PortalConfig'
@@ -39,7 +39,8 @@ from django.contrib.auth.models import User
 from django.contrib.auth.admin import UserAdmin
 
 
-from portal.models import Class, Student, Guardian, Teacher, School, UserProfile, FrontPageNews, EmailVerification
+from portal.models import Class, Student, Guardian, Teacher, School, UserProfile, FrontPageNews, EmailVerification, \
+    QueuedEmail
 
 
 class ClassAdmin(admin.ModelAdmin):
@@ -72,6 +73,12 @@ class EmailVerificationAdmin(admin.ModelAdmin):
     search_fields = ['new_user']
 
 
+class QueuedEmailAdmin(admin.ModelAdmin):
+    search_fields = ['recipients', 'subject']
+    list_filter = ['failed', 'sent']
+    list_display = ['subject', 'recipients', 'created', 'attempts', 'sent', 'failed']
+
+
 UserAdmin.list_display += ('date_joined',)
 UserAdmin.list_filter += ('date_joined',)
 
@@ -86,3 +93,4 @@ admin.site.register(User, UserAdmin)
 admin.site.register(UserProfile, UserProfileAdmin)
 admin.site.register(FrontPageNews)
 admin.site.register(EmailVerification, EmailVerificationAdmin)
+admin.site.register(QueuedEmail, QueuedEmailAdmin)
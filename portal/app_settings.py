@@ -42,8 +42,67 @@ CONTACT_FORM_EMAILS = getattr(settings, 'PORTAL_CONTACT_FORM_EMAIL', ('codeforli
 #: Email address to source notifications from
 EMAIL_ADDRESS = getattr(settings, 'EMAIL_ADDRESS', 'no-reply@codeforlife.education')
 
+#: Send emails as soon as they are queued rather than leaving them to the send_queued_emails command
+EMAIL_OUTBOX_EAGER = getattr(settings, 'EMAIL_OUTBOX_EAGER', False)
+
+#: Number of times sending a queued email is attempted before giving up on it
+EMAIL_OUTBOX_MAX_ATTEMPTS = getattr(settings, 'EMAIL_OUTBOX_MAX_ATTEMPTS', 5)
+
+#: Seconds before the first retry of a queued email, doubled for each further retry
+EMAIL_OUTBOX_RETRY_DELAY = getattr(settings, 'EMAIL_OUTBOX_RETRY_DELAY', 60)
+
+#: Seconds a worker has to send the emails it picked up before another worker may pick them up
+EMAIL_OUTBOX_LEASE = getattr(settings, 'EMAIL_OUTBOX_LEASE', 60 * 5)
+
+#: Most emails the send_queued_emails command sends a second, or 0 for no limit
+EMAIL_MESSAGES_PER_SECOND = getattr(settings, 'EMAIL_MESSAGES_PER_SECOND', 10)
+
+#: Number of news stories shown on the home page
+FRONT_PAGE_NEWS_ITEMS = getattr(settings, 'FRONT_PAGE_NEWS_ITEMS', 10)
+
+#: Names of the pages served to logged out visitors from the page cache
+ANONYMOUS_PAGE_CACHE_URLS = getattr(settings, 'ANONYMOUS_PAGE_CACHE_URLS',
+                                    ('home', 'about', 'help', 'terms', 'teach', 'play'))
+
+#: Seconds a page is kept in the page cache, on top of being purged when news or CMS content changes
+ANONYMOUS_PAGE_CACHE_TIMEOUT = getattr(settings, 'ANONYMOUS_PAGE_CACHE_TIMEOUT', 60 * 60)
+
+#: Names of the JSON endpoints that skip the CMS middleware
+FAST_LANE_URLS = getattr(settings, 'FAST_LANE_URLS',
+                         ('post_event', 'post_events', 'organisation_fuzzy_lookup', 'organisation_fuzzy_lookup_new',
+                          'teacher_class_presence'))
+
+#: Seconds before a user's last-seen time is rewritten; presence is only as precise as this
+PRESENCE_UPDATE_INTERVAL = getattr(settings, 'PRESENCE_UPDATE_INTERVAL', 60)
+
+#: Seconds since a user was last seen after which they are no longer shown as logged in
+PRESENCE_IDLE_AFTER = getattr(settings, 'PRESENCE_IDLE_AFTER', 60 * 5)
+
+#: Seconds a user's last-seen time is kept for
+PRESENCE_OFFLINE_AFTER = getattr(settings, 'PRESENCE_OFFLINE_AFTER', 60 * 10)
+
+#: Seconds a class roster version is remembered for, so later polls can be answered with a delta
+ROSTER_SNAPSHOT_TIMEOUT = getattr(settings, 'ROSTER_SNAPSHOT_TIMEOUT', 60 * 10)
+
+#: Seconds the names of a class's students are cached for the student login form
+LOGIN_ROSTER_CACHE_TIMEOUT = getattr(settings, 'LOGIN_ROSTER_CACHE_TIMEOUT', 60 * 5)
+
 #: Private key for Recaptcha
 RECAPTCHA_PRIVATE_KEY = getattr(settings, 'RECAPTCHA_PRIVATE_KEY', os.getenv('RECAPTCHA_PRIVATE_KEY', None))
 
 #: Public key for Recaptcha
 RECAPTCHA_PUBLIC_KEY = getattr(settings, 'RECAPTCHA_PUBLIC_KEY', os.getenv('RECAPTCHA_PUBLIC_KEY', None))
+
+#: Directory holding the teaching material PDFs referenced by PDF_DATA
+MATERIALS_SOURCE_DIR = getattr(settings, 'MATERIALS_SOURCE_DIR', os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'teaching_packs'))
+
+#: Directory the materials index and key stage bundles are built into
+MATERIALS_BUILD_DIR = getattr(settings, 'MATERIALS_BUILD_DIR', os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'teaching_packs_build'))
+
+#: Fraction of requests profiled by the profiling middleware, from 0 (off) to 1 (every request)
+PROFILING_SAMPLE_RATE = getattr(settings, 'PROFILING_SAMPLE_RATE', 0)
+
+#: Seconds the per-view profiling summary is kept for after the last profiled request
+PROFILING_SUMMARY_TIMEOUT = getattr(settings, 'PROFILING_SUMMARY_TIMEOUT', 60 * 60 * 24)
@@ -97,21 +97,31 @@ SETTINGS = {
     'STATICFILES_STORAGE': 'pipeline.storage.PipelineStorage',
     'MESSAGE_STORAGE': 'django.contrib.messages.storage.session.SessionStorage',
     'MIDDLEWARE_CLASSES': [
+        'portal.middleware.profiling.ProfilingMiddleware',
+        'portal.middleware.page_cache.AnonymousPageCacheMiddleware',
         'django.contrib.sessions.middleware.SessionMiddleware',
         'django.middleware.locale.LocaleMiddleware',
         'django.middleware.common.CommonMiddleware',
         'django.middleware.csrf.CsrfViewMiddleware',
         'django.contrib.auth.middleware.AuthenticationMiddleware',
-        'online_status.middleware.OnlineStatusMiddleware',
+        'portal.middleware.presence.PresenceMiddleware',
         'django.contrib.messages.middleware.MessageMiddleware',
         'django.middleware.clickjacking.XFrameOptionsMiddleware',
         'deploy.middleware.exceptionlogging.ExceptionLoggingMiddleware',
-        'cms.middleware.user.CurrentUserMiddleware',
-        'cms.middleware.page.CurrentPageMiddleware',
-        'cms.middleware.toolbar.ToolbarMiddleware',
-        'cms.middleware.language.LanguageCookieMiddleware',
+        'portal.middleware.fast_lane.CurrentUserMiddleware',
+        'portal.middleware.fast_lane.CurrentPageMiddleware',
+        'portal.middleware.fast_lane.ToolbarMiddleware',
+        'portal.middleware.fast_lane.LanguageCookieMiddleware',
         'portal.middleware.ratelimit_login_attempts.RateLimitLoginAttemptsMiddleware',
         'django_otp.middleware.OTPMiddleware',
+        'portal.middleware.user_role.UserRoleMiddleware',
+    ],
+
+    'AUTHENTICATION_BACKENDS': [
+        'portal.backends.ModelBackend',
+        # Always added by autoconfig, as Django's default. Keeps sessions started before
+        # portal.backends.ModelBackend valid; that backend refuses the credentials it would re-check
+        'django.contrib.auth.backends.ModelBackend',
     ],
 
     'TEMPLATES': [
@@ -146,7 +156,11 @@ SETTINGS = {
             'two_factor': {
                 'handlers': ['console'],
                 'level': 'INFO',
-            }
+            },
+            'portal.profiling': {
+                'handlers': ['console'],
+                'level': 'INFO',
+            },
         }
     },
 
@@ -156,15 +170,48 @@ SETTINGS = {
 RELATIONSHIPS = [
     OrderingRelationship(
         'MIDDLEWARE_CLASSES',
-        'cms.middleware.toolbar.ToolbarMiddleware',
+        'portal.middleware.profiling.ProfilingMiddleware',
+        before=[
+            'portal.middleware.page_cache.AnonymousPageCacheMiddleware',
+            'django.contrib.sessions.middleware.SessionMiddleware',
+        ],
+        add_missing=False,
+    ),
+    OrderingRelationship(
+        'MIDDLEWARE_CLASSES',
+        'portal.middleware.page_cache.AnonymousPageCacheMiddleware',
+        before=[
+            'django.contrib.sessions.middleware.SessionMiddleware',
+        ],
+        add_missing=False,
+    ),
+    OrderingRelationship(
+        'MIDDLEWARE_CLASSES',
+        'portal.middleware.fast_lane.ToolbarMiddleware',
+        after=[
+            'django.contrib.auth.middleware.AuthenticationMiddleware',
+        ],
+        add_missing=False,
+    ),
+    OrderingRelationship(
+        'MIDDLEWARE_CLASSES',
+        'portal.middleware.presence.PresenceMiddleware',
         after=[
             'django.contrib.auth.middleware.AuthenticationMiddleware',
         ],
         add_missing=False,
     ),
+    OrderingRelationship(
+        'AUTHENTICATION_BACKENDS',
+        'portal.backends.ModelBackend',
+        before=[
+            'django.contrib.auth.backends.ModelBackend',
+        ],
+        add_missing=False,
+    ),
     OrderingRelationship(
         'MIDDLEWARE_CLASSES',
-        'online_status.middleware.OnlineStatusMiddleware',
+        'portal.middleware.user_role.UserRoleMiddleware',
         after=[
             'django.contrib.auth.middleware.AuthenticationMiddleware',
         ],
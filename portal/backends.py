@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+# Code for Life
+#
+# Copyright (C) 2016, Ocado Innovation Limited
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ADDITIONAL TERMS – Section 7 GNU General Public Licence
+#
+# This licence does not grant any right, title or interest in any “Ocado” logos,
+# trade names or the trademark “Ocado” or any other trademarks or domain names
+# owned by Ocado Innovation Limited or the Ocado group of companies or any other
+# distinctive brand features of “Ocado” as may be secured from time to time. You
+# must not distribute any modification of this program using the trademark
+# “Ocado” or claim any affiliation or association with Ocado or its employees.
+#
+# You are not authorised to use the name Ocado (or any of its trade names) or
+# the names of any author or contributor in advertising or for publicity purposes
+# pertaining to the distribution of this program, without the prior written
+# authorisation of Ocado.
+#
+# Any propagation, distribution or conveyance of this program must include this
+# copyright notice and these terms. You must not misrepresent the origins of this
+# program; modified versions of the program must be marked as such and not
+# identified as the original program.
+from django.conf import settings
+from django.contrib.auth import backends
+from django.contrib.auth.models import User
+from django.core.exceptions import PermissionDenied
+
+from portal.roles import USER_ROLE_RELATIONS
+
+
+DJANGO_MODEL_BACKEND = 'django.contrib.auth.backends.ModelBackend'
+
+
+class ModelBackend(backends.ModelBackend):
+    '''Loads the user's profile, teacher, student and class in the same query as the user.'''
+
+    def authenticate(self, username=None, password=None):
+        # Credentials without a username and password are left to the backends they're meant for
+        if username is None or password is None:
+            return None
+        try:
+            user = User.objects.select_related(*USER_ROLE_RELATIONS).get(username=username)
+        except User.DoesNotExist:
+            # Run the default password hasher once to reduce the timing
+            # difference between an existing and a non-existing user.
+            User().set_password(password)
+        else:
+            if user.check_password(password):
+                return user
+        if self._only_checked_again():
+            raise PermissionDenied
+        return None
+
+    def _only_checked_again(self):
+        # autoconfig always keeps Django's backend after this one, which also keeps sessions from
+        # before it valid. It would look up and hash the same username and password again, so
+        # when no other backend follows, the credentials are refused here instead.
+        path = '%s.%s' % (type(self).__module__, type(self).__name__)
+        backends = list(settings.AUTHENTICATION_BACKENDS)
+        later = backends[backends.index(path) + 1:] if path in backends else []
+        return all(backend == DJANGO_MODEL_BACKEND for backend in later)
+
+    def get_user(self, user_id):
+        try:
+            return User.objects.select_related(*USER_ROLE_RELATIONS).get(pk=user_id)
+        except User.DoesNotExist:
+            return None
@@ -34,6 +34,9 @@
 # copyright notice and these terms. You must not misrepresent the origins of this
 # program; modified versions of the program must be marked as such and not
 # identified as the original program.
+from portal.roles import get_user_role
+
+
 def has_beta_access(request):
     return is_on_beta_host(request) or is_developer(request)
     
@@ -41,4 +44,4 @@ def is_on_beta_host(request):
     return request.get_host().startswith("beta")
 
 def is_developer(request):
-    return ((not request.user.is_anonymous()) and request.user.userprofile.developer)
\ No newline at end of file
+    return get_user_role(request.user).is_developer
\ No newline at end of file
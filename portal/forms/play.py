@@ -43,6 +43,7 @@ from django.utils import timezone
 
 from portal.models import Student, Class, stripStudentName
 from portal.helpers.password import password_strength_test
+from portal.helpers.roster import find_student_login
 
 
 class StudentLoginForm(forms.Form):
@@ -65,26 +66,20 @@ class StudentLoginForm(forms.Form):
         password = self.cleaned_data.get('password', None)
 
         if name and access_code and password:
-            classes = Class.objects.filter(access_code__iexact=access_code)
-            if len(classes) != 1:
-                raise forms.ValidationError("Invalid name, class access code or password")
-
-            name = stripStudentName(name)
-
-            students = Student.objects.filter(
-                new_user__first_name__iexact=name, class_field=classes[0])
-            if len(students) != 1:
+            login = find_student_login(access_code, stripStudentName(name))
+            if login is None:
                 raise forms.ValidationError("Invalid name, class access code or password")
 
-            student = students[0]
-            user = authenticate(username=student.new_user.username, password=password)
+            class_id, username = login
+            user = authenticate(username=username, password=password)
 
-            if user is None:
+            # The class's cached names may be a few minutes behind a student moving class
+            if user is None or user.new_student.class_field_id != class_id:
                 raise forms.ValidationError("Invalid name, class access code or password")
             if not user.is_active:
                 raise forms.ValidationError("This user account has been deactivated")
 
-            self.student = student
+            self.student = user.new_student
             self.user = user
 
         return self.cleaned_data
@@ -226,7 +221,7 @@ class StudentJoinOrganisationForm(forms.Form):
         access_code = self.cleaned_data.get('access_code', None)
 
         if access_code:
-            classes = Class.objects.filter(access_code=access_code)
+            classes = Class.objects.filter(access_code=access_code.strip().upper())
             if len(classes) != 1:
                 raise forms.ValidationError("Cannot find the school or club and/or class")
             self.klass = classes[0]
@@ -45,8 +45,9 @@ from django.template import loader
 from django.utils.encoding import force_bytes
 from django.utils.http import urlsafe_base64_encode
 
-from portal.models import Student, Teacher
+from portal.models import Student
 from portal.helpers.password import password_strength_test
+from portal.utils import normalise_email
 
 
 class PasswordResetSetPasswordForm(django_auth_forms.SetPasswordForm):
@@ -155,14 +156,13 @@ class TeacherPasswordResetForm(forms.Form):
 
     def clean_email(self):
         email = self.cleaned_data.get('email', None)
-        # Check such an email exists
-        if not User.objects.filter(email=email).exists():
-            raise forms.ValidationError("Cannot find an account with that email")
-        teacher = Teacher.objects.filter(new_user__email=email)
         # Check such an email is associated with a teacher
-        if not teacher.exists():
+        teachers = User.objects.filter(userprofile__normalised_email=normalise_email(email),
+                                       userprofile__teacher__isnull=False)
+        username = teachers.order_by('pk').values_list('username', flat=True).first()
+        if username is None:
             raise forms.ValidationError("Cannot find an account with that email")
-        self.username = teacher[0].new_user.username
+        self.username = username
         return email
 
     def send_mail(self, subject_template_name, email_template_name,
@@ -42,6 +42,7 @@ from django.contrib.auth.models import User
 
 from portal.models import Student, Teacher, stripStudentName
 from portal.helpers.password import password_strength_test
+from portal.utils import normalise_email
 
 
 choices = [('Miss', 'Miss'), ('Mrs', 'Mrs'), ('Ms', 'Ms'), ('Mr', 'Mr'),
@@ -97,7 +98,7 @@ class TeacherSignupForm(forms.Form):
     def clean_email(self):
         email = self.cleaned_data.get('email', None)
 
-        if email and Teacher.objects.filter(new_user__email=email).exists():
+        if email and Teacher.objects.filter(new_user__userprofile__normalised_email=normalise_email(email)).exists():
             raise forms.ValidationError("That email address is already in use")
 
         return email
@@ -156,9 +157,8 @@ class TeacherEditAccountForm(forms.Form):
     def clean_email(self):
         email = self.cleaned_data.get('email', None)
         if email:
-            teachers = Teacher.objects.filter(new_user__email=email)
-            if ((len(teachers) == 1 and teachers[0].new_user != self.user) or
-                    len(teachers) > 1):
+            teachers = Teacher.objects.filter(new_user__userprofile__normalised_email=normalise_email(email))
+            if teachers.exclude(new_user=self.user).exists():
                 raise forms.ValidationError("That email address is already in use")
 
         return email
@@ -206,14 +206,9 @@ class TeacherLoginForm(forms.Form):
         password = self.cleaned_data.get('password', None)
 
         if email and password:
-            users = User.objects.filter(email=email)
-
             # Check it's a teacher and not a student using the same email address
-            user = None
-            for result in users:
-                if hasattr(result, 'userprofile') and hasattr(result.userprofile, 'teacher'):
-                    user = result
-                    break
+            user = User.objects.filter(userprofile__normalised_email=normalise_email(email),
+                                       userprofile__teacher__isnull=False).order_by('pk').first()
 
             if user is None:
                 raise forms.ValidationError('Incorrect email address or password')
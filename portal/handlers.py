@@ -35,16 +35,167 @@
 # program; modified versions of the program must be marked as such and not
 # identified as the original program.
 
+import logging
+
+from django.apps import apps
 from django.core.cache import cache
-from django.db.models.signals import post_save, pre_delete
+from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_logged_out
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import pre_save, post_init, post_save, post_delete
 from django.dispatch import receiver
-from django_otp.models import Device
+from django_otp import device_classes
+
+from portal import presence
+from portal.helpers.progress import record_attempt, rebuild_class_progress
+from portal.helpers.roster import forget_login_rosters
+from portal.models import FrontPageNews, EmailVerification, UserProfile, Class, Student, StudentProgress, \
+    ClassProgress
+from portal.utils import sync_two_factor_status, bump_episode_data_version, bump_anonymous_page_version, \
+    FRONT_PAGE_NEWS_CACHE_KEY, normalise_email
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+def connect_app_handlers():
+    '''Connects the handlers for the models of other apps, which aren't all loaded when this module
+    is imported (game.models imports portal.models). Called once the apps are ready.'''
+    for model in device_classes():
+        post_save.connect(update_two_factor_status, sender=model)
+        post_delete.connect(update_two_factor_status, sender=model)
+    for model in (apps.get_model('game', 'Episode'), apps.get_model('game', 'Level')):
+        post_save.connect(clear_episode_data_cache, sender=model)
+        post_delete.connect(clear_episode_data_cache, sender=model)
+    # Publishing saves the public copies of the page and its titles
+    for model in (apps.get_model('cms', 'Page'), apps.get_model('cms', 'Title')):
+        post_save.connect(clear_anonymous_page_cache, sender=model)
+        post_delete.connect(clear_anonymous_page_cache, sender=model)
+    post_save.connect(update_progress, sender=apps.get_model('game', 'Attempt'))
+
+
+def update_two_factor_status(sender, instance, **kwargs):
+    sync_two_factor_status([instance.user_id])
+
+
+def clear_episode_data_cache(sender, **kwargs):
+    model_name = sender._meta.model_name
+    # Custom levels have no episode and don't appear in the episode data
+    if model_name == 'episode' or (model_name == 'level' and
+                                   getattr(kwargs['instance'], 'episode_id', None) is not None):
+        bump_episode_data_version()
+
+
+@receiver([post_save, post_delete], sender=FrontPageNews)
+def clear_front_page_news_cache(sender, **kwargs):
+    cache.delete(FRONT_PAGE_NEWS_CACHE_KEY)
+    bump_anonymous_page_version()
+
+
+def clear_anonymous_page_cache(sender, **kwargs):
+    bump_anonymous_page_version()
+
+
+@receiver(post_save, sender=EmailVerification)
+def set_email_verified(sender, instance, **kwargs):
+    if instance.verified and instance.user_id is not None:
+        UserProfile.objects.filter(user_id=instance.user_id, email_verified=False).update(email_verified=True)
+
+
+@receiver(post_delete, sender=EmailVerification)
+def reset_email_verified(sender, instance, **kwargs):
+    if instance.verified and instance.user_id is not None:
+        still_verified = EmailVerification.objects.filter(user_id=instance.user_id, verified=True).exists()
+        UserProfile.objects.filter(user_id=instance.user_id).update(email_verified=still_verified)
+
+
+@receiver(pre_save, sender=UserProfile)
+def set_normalised_email(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and 'normalised_email' not in update_fields:
+        return
+    # Profiles are usually saved with their user already loaded, so only fetch the email otherwise
+    user = getattr(instance, UserProfile._meta.get_field('user').get_cache_name(), None)
+    if user is not None:
+        email = user.email
+    else:
+        email = User.objects.filter(pk=instance.user_id).values_list('email', flat=True).first()
+    instance.normalised_email = normalise_email(email)
+
+
+@receiver(post_save, sender=User)
+def update_normalised_email(sender, instance, update_fields=None, **kwargs):
+    # Logging in only saves last_login
+    if update_fields is not None and 'email' not in update_fields:
+        return
+    email = normalise_email(instance.email)
+    UserProfile.objects.filter(user_id=instance.pk).exclude(normalised_email=email).update(normalised_email=email)
+
+
+@receiver(user_logged_out)
+def clear_presence(sender, user, **kwargs):
+    if user is not None:
+        presence.forget(user.pk)
+
+
+@receiver(pre_save, sender=Class)
+def normalise_access_code(sender, instance, **kwargs):
+    instance.access_code = instance.access_code.strip().upper()
+
+
+@receiver([post_save, post_delete], sender=Student)
+def clear_class_login_roster(sender, instance, **kwargs):
+    # A student moved to another class is still cached in their old class until it expires,
+    # which the login form allows for by checking the class of the user it authenticates.
+    if instance.class_field_id is not None:
+        forget_login_rosters(Class.objects.filter(id=instance.class_field_id))
+
+
+@receiver(post_save, sender=User)
+def clear_renamed_student_login_roster(sender, instance, created=False, update_fields=None, **kwargs):
+    if created or (update_fields is not None and 'first_name' not in update_fields):
+        return
+    forget_login_rosters(Class.objects.filter(students__new_user_id=instance.pk))
+
+
+def update_progress(sender, instance, created=False, **kwargs):
+    # Progress is only a summary, so a failure to update it mustn't stop the game saving attempts.
+    # rebuild_progress puts it right.
+    try:
+        with transaction.atomic():
+            record_attempt(instance, created)
+    except Exception:
+        LOGGER.exception("Could not record the progress of attempt %s" % instance.pk)
+
+
+@receiver(post_init, sender=Student)
+def remember_class(sender, instance, **kwargs):
+    instance._saved_class_field_id = instance.class_field_id
+
 
-from portal.utils import two_factor_cache_key
+@receiver(post_save, sender=Student)
+def move_progress(sender, instance, created=False, **kwargs):
+    # Deferred instances aren't sent post_init for Student, so count them as moved
+    moved = instance.class_field_id != getattr(instance, '_saved_class_field_id', object())
+    instance._saved_class_field_id = instance.class_field_id
+    if created or not moved:
+        return
+    progress = StudentProgress.objects.filter(student=instance).exclude(class_field_id=instance.class_field_id).first()
+    if progress is not None:
+        old_class_id = progress.class_field_id
+        progress.class_field_id = instance.class_field_id
+        progress.save()
+        for class_id in (old_class_id, instance.class_field_id):
+            if class_id is not None:
+                rebuild_class_progress(class_id)
 
 
-@receiver([post_save, pre_delete])
-def clear_two_factor_cache(sender, **kwargs):
-    if issubclass(sender, Device):
-        user = kwargs['instance'].user
-        cache.delete(two_factor_cache_key(user))
+@receiver(post_delete, sender=StudentProgress)
+def remove_progress(sender, instance, **kwargs):
+    # Subtracted rather than rebuilt, as the class may be being deleted too
+    ClassProgress.objects.filter(klass_id=instance.class_field_id).update(
+        students_started=F('students_started') - 1,
+        attempts=F('attempts') - instance.attempts,
+        levels_attempted=F('levels_attempted') - instance.levels_attempted,
+        levels_completed=F('levels_completed') - instance.levels_completed,
+        total_score=F('total_score') - instance.total_score)
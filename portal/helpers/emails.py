@@ -34,16 +34,19 @@
 # copyright notice and these terms. You must not misrepresent the origins of this
 # program; modified versions of the program must be marked as such and not
 # identified as the original program.
+import logging
+import time
 from uuid import uuid4
 from datetime import timedelta
 
 from django.conf import settings
 from django.utils import timezone
-from django.core.mail import EmailMultiAlternatives
+from django.core.mail import EmailMultiAlternatives, get_connection
 from django.template import Context, loader
 
-from portal.models import EmailVerification
+from portal.models import EmailVerification, QueuedEmail
 from portal import app_settings
+from portal.profiling import timed
 from portal.emailMessages import emailVerificationNeededEmail
 from portal.emailMessages import emailChangeNotificationEmail
 from portal.emailMessages import emailChangeVerificationEmail
@@ -53,14 +56,30 @@ VERIFICATION_EMAIL = 'Code For Life Verification <' + app_settings.EMAIL_ADDRESS
 PASSWORD_RESET_EMAIL = 'Code For Life Password Reset <' + app_settings.EMAIL_ADDRESS + '>'
 CONTACT_EMAIL = 'Code For Life Contact <' + app_settings.EMAIL_ADDRESS + '>'
 
+LOGGER = logging.getLogger(__name__)
 
-def send_email(sender, recipients, subject, text_content, html_content=None,
-               plaintext_template='email.txt', html_template='email.html'):
+
+_compiled_templates = {}
+_prepared_emails = {}
+
+
+def get_compiled_template(name):
+    """Return the named template, only loading and compiling it once per process."""
+    template = _compiled_templates.get(name)
+    if template is None:
+        template = _compiled_templates[name] = loader.get_template(name)
+    return template
+
+
+@timed('send_email')
+def render_email(sender, recipients, subject, text_content, html_content=None,
+                 plaintext_template='email.txt', html_template='email.html'):
+    """Render an email into an unsaved QueuedEmail, ready for queue_emails."""
     # add in template for templates to message
 
     # setup templates
-    plaintext = loader.get_template(plaintext_template)
-    html = loader.get_template(html_template)
+    plaintext = get_compiled_template(plaintext_template)
+    html = get_compiled_template(html_template)
     plaintext_email_context = Context({'content': text_content})
     html_email_context = Context({'content': text_content})
     if html_content:
@@ -70,11 +89,152 @@ def send_email(sender, recipients, subject, text_content, html_content=None,
     plaintext_body = plaintext.render(plaintext_email_context)
     html_body = html.render(html_email_context)
 
-    # make message using templates
-    message = EmailMultiAlternatives(subject, plaintext_body, sender, recipients)
-    message.attach_alternative(html_body, "text/html")
+    return QueuedEmail(sender=sender,
+                       recipients='\n'.join(recipients),
+                       subject=subject,
+                       text_body=plaintext_body,
+                       html_body=html_body)
+
+
+def _fill(prepared, fields):
+    subject, text_body, html_body, placeholders = prepared
+    for name, placeholder in placeholders.items():
+        subject = subject.replace(placeholder, fields[name])
+        text_body = text_body.replace(placeholder, fields[name])
+        html_body = html_body.replace(placeholder, fields[name])
+    return subject, text_body, html_body
+
 
-    message.send()
+@timed('send_email')
+def render_message_email(sender, recipients, builder, request, **fields):
+    """Render the message from builder(request, **fields), one of the emailMessages functions,
+    into an unsaved QueuedEmail.
+
+    If every field is made of letters and digits, like tokens and access codes, the message is
+    built and rendered once per site with placeholders, which are then swapped for each
+    recipient's values. The first email of each kind is also rendered in full, and the
+    placeholders are only used from then on if both came out the same."""
+    def render_in_full():
+        message = builder(request, **fields)
+        return render_email(sender, recipients, message['subject'], message['message'])
+
+    if not all(value.isalnum() for value in fields.values()):
+        return render_in_full()
+
+    key = (builder.__module__, builder.__name__, request.scheme, request.get_host(), tuple(sorted(fields)))
+    prepared = _prepared_emails.get(key)
+    if prepared is None:
+        placeholders = dict((name, uuid4().hex) for name in fields)
+        message = builder(request, **placeholders)
+        email = render_email(sender, recipients, message['subject'], message['message'])
+        prepared = (email.subject, email.text_body, email.html_body, placeholders)
+
+        email = render_in_full()
+        if _fill(prepared, fields) != (email.subject, email.text_body, email.html_body):
+            prepared = False
+        _prepared_emails[key] = prepared
+        return email
+    if prepared is False:
+        return render_in_full()
+
+    subject, text_body, html_body = _fill(prepared, fields)
+    return QueuedEmail(sender=sender,
+                       recipients='\n'.join(recipients),
+                       subject=subject,
+                       text_body=text_body,
+                       html_body=html_body)
+
+
+@timed('send_email')
+def send_email(sender, recipients, subject, text_content, html_content=None,
+               plaintext_template='email.txt', html_template='email.html'):
+    queue_emails([render_email(sender, recipients, subject, text_content, html_content,
+                               plaintext_template, html_template)])
+
+
+@timed('send_email')
+def queue_emails(emails):
+    """Put unsaved QueuedEmails in the outbox in one go."""
+    if app_settings.EMAIL_OUTBOX_EAGER:
+        for email in emails:
+            email.save()
+        send_batch(emails)
+    else:
+        QueuedEmail.objects.bulk_create(emails)
+
+
+def _message(email, connection):
+    message = EmailMultiAlternatives(email.subject, email.text_body, email.sender,
+                                     email.recipient_list, connection=connection)
+    if email.html_body:
+        message.attach_alternative(email.html_body, "text/html")
+    return message
+
+
+def _record_attempt(email, error):
+    email.attempts += 1
+    if error is None:
+        email.sent = timezone.now()
+    else:
+        LOGGER.warning('Failed to send queued email %s: %s', email.pk, error)
+        email.last_error = '%s: %s' % (type(error).__name__, error)
+        if email.attempts >= app_settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+            email.failed = True
+        else:
+            delay = app_settings.EMAIL_OUTBOX_RETRY_DELAY * 2 ** (email.attempts - 1)
+            email.send_after = timezone.now() + timedelta(seconds=delay)
+    email.save()
+
+
+def send_batch(emails, messages_per_second=0):
+    """Send queued emails over a single mail server connection, scheduling retries for those
+    that fail. Sends at most messages_per_second a second if given, without limit otherwise.
+
+    Returns a list of (email, error) pairs, the error being None for each email sent."""
+    connection = get_connection()
+    results = []
+    next_send = time.time()
+    try:
+        for email in emails:
+            if messages_per_second:
+                delay = next_send - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+                next_send = max(next_send, time.time()) + 1.0 / messages_per_second
+            try:
+                # Opening an open connection does nothing, so this only reconnects after a failure
+                connection.open()
+                connection.send_messages([_message(email, connection)])
+                error = None
+            except Exception as e:
+                error = e
+                connection.close()
+            _record_attempt(email, error)
+            results.append((email, error))
+    finally:
+        connection.close()
+    return results
+
+
+def claim_queued_emails(limit):
+    """Return up to limit emails that are due, leased so that other workers skip them."""
+    now = timezone.now()
+    lease = now + timedelta(seconds=app_settings.EMAIL_OUTBOX_LEASE)
+    due = QueuedEmail.objects.filter(sent=None, failed=False, send_after__lte=now).order_by('send_after', 'id')
+    claimed = []
+    for email in due[:limit]:
+        # Only one worker can move send_after on from the value it read
+        if QueuedEmail.objects.filter(pk=email.pk, send_after=email.send_after).update(send_after=lease):
+            email.send_after = lease
+            claimed.append(email)
+    return claimed
+
+
+def send_queued_emails(limit=100, messages_per_second=0):
+    """Send the emails that are due. Returns the number sent and the number that failed."""
+    results = send_batch(claim_queued_emails(limit), messages_per_second)
+    failed = len([email for email, error in results if error is not None])
+    return len(results) - failed, failed
 
 
 def generate_token(user, email="", preverified=False):
@@ -87,37 +247,34 @@ def generate_token(user, email="", preverified=False):
     )
 
 
-def send_verification_email(request, user, new_email=None):
-    """Send an email prompting the user to verify their email address."""
+def verification_emails(request, user, new_email=None):
+    """Render the emails prompting the user to verify their email address, for queue_emails."""
 
     if not new_email:  # verifying first email address
         user.email_verifications.all().delete()
 
         verification = generate_token(user)
 
-        message = emailVerificationNeededEmail(request, verification.token)
-        send_email(VERIFICATION_EMAIL,
-                   [user.email],
-                   message['subject'],
-                   message['message'])
+        return [render_message_email(VERIFICATION_EMAIL, [user.email], emailVerificationNeededEmail,
+                                     request, token=verification.token)]
 
     else:  # verifying change of email address.
         verification = generate_token(user, new_email)
 
-        message = emailChangeVerificationEmail(request, verification.token)
-        send_email(VERIFICATION_EMAIL,
-                   [new_email],
-                   message['subject'],
-                   message['message'])
+        return [render_message_email(VERIFICATION_EMAIL, [new_email], emailChangeVerificationEmail,
+                                     request, token=verification.token),
+                render_message_email(VERIFICATION_EMAIL, [user.email], emailChangeNotificationEmail,
+                                     request, new_email=new_email)]
+
 
-        message = emailChangeNotificationEmail(request, new_email)
-        send_email(VERIFICATION_EMAIL,
-                   [user.email],
-                   message['subject'],
-                   message['message'])
+def send_verification_email(request, user, new_email=None):
+    """Send an email prompting the user to verify their email address."""
+    queue_emails(verification_emails(request, user, new_email))
 
 
 def is_verified(user):
     """Check that a user has verified their email address."""
-    verifications = user.email_verifications.filter(verified=True)
-    return len(verifications) != 0
+    profile = getattr(user, 'userprofile', None)
+    if profile is not None:
+        return profile.email_verified
+    return user.email_verifications.filter(verified=True).exists()
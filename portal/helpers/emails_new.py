@@ -39,10 +39,9 @@ from datetime import timedelta
 
 from django.conf import settings
 from django.utils import timezone
-from django.core.mail import EmailMultiAlternatives
-from django.template import Context, loader
 
 from portal.models import EmailVerification
+from portal.helpers.emails import queue_emails, render_message_email
 from portal import app_settings
 from portal.emailMessages_new import emailVerificationNeededEmail
 from portal.emailMessages import emailChangeNotificationEmail
@@ -54,29 +53,6 @@ PASSWORD_RESET_EMAIL = 'Code For Life Password Reset <' + app_settings.EMAIL_ADD
 CONTACT_EMAIL = 'Code For Life Contact <' + app_settings.EMAIL_ADDRESS + '>'
 
 
-def send_email(sender, recipients, subject, text_content, html_content=None,
-               plaintext_template='email.txt', html_template='email.html'):
-    # add in template for templates to message
-
-    # setup templates
-    plaintext = loader.get_template(plaintext_template)
-    html = loader.get_template(html_template)
-    plaintext_email_context = Context({'content': text_content})
-    html_email_context = Context({'content': text_content})
-    if html_content:
-        html_email_context = Context({'content': html_content})
-
-    # render templates
-    plaintext_body = plaintext.render(plaintext_email_context)
-    html_body = html.render(html_email_context)
-
-    # make message using templates
-    message = EmailMultiAlternatives(subject, plaintext_body, sender, recipients)
-    message.attach_alternative(html_body, "text/html")
-
-    message.send()
-
-
 def generate_token(user, email="", preverified=False):
     return EmailVerification.objects.create(
         user=user,
@@ -95,29 +71,21 @@ def send_verification_email(request, user, new_email=None):
 
         verification = generate_token(user)
 
-        message = emailVerificationNeededEmail(request, verification.token)
-        send_email(VERIFICATION_EMAIL,
-                   [user.email],
-                   message['subject'],
-                   message['message'])
+        queue_emails([render_message_email(VERIFICATION_EMAIL, [user.email], emailVerificationNeededEmail,
+                                           request, token=verification.token)])
 
     else:  # verifying change of email address.
         verification = generate_token(user, new_email)
 
-        message = emailChangeVerificationEmail(request, verification.token)
-        send_email(VERIFICATION_EMAIL,
-                   [new_email],
-                   message['subject'],
-                   message['message'])
-
-        message = emailChangeNotificationEmail(request, new_email)
-        send_email(VERIFICATION_EMAIL,
-                   [user.email],
-                   message['subject'],
-                   message['message'])
+        queue_emails([render_message_email(VERIFICATION_EMAIL, [new_email], emailChangeVerificationEmail,
+                                           request, token=verification.token),
+                      render_message_email(VERIFICATION_EMAIL, [user.email], emailChangeNotificationEmail,
+                                           request, new_email=new_email)])
 
 
 def is_verified(user):
     """Check that a user has verified their email address."""
-    verifications = user.email_verifications.filter(verified=True)
-    return len(verifications) != 0
+    profile = getattr(user, 'userprofile', None)
+    if profile is not None:
+        return profile.email_verified
+    return user.email_verifications.filter(verified=True).exists()
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+# Code for Life
+#
+# Copyright (C) 2016, Ocado Innovation Limited
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ADDITIONAL TERMS – Section 7 GNU General Public Licence
+#
+# This licence does not grant any right, title or interest in any “Ocado” logos,
+# trade names or the trademark “Ocado” or any other trademarks or domain names
+# owned by Ocado Innovation Limited or the Ocado group of companies or any other
+# distinctive brand features of “Ocado” as may be secured from time to time. You
+# must not distribute any modification of this program using the trademark
+# “Ocado” or claim any affiliation or association with Ocado or its employees.
+#
+# You are not authorised to use the name Ocado (or any of its trade names) or
+# the names of any author or contributor in advertising or for publicity purposes
+# pertaining to the distribution of this program, without the prior written
+# authorisation of Ocado.
+#
+# Any propagation, distribution or conveyance of this program must include this
+# copyright notice and these terms. You must not misrepresent the origins of this
+# program; modified versions of the program must be marked as such and not
+# identified as the original program.
+import hashlib
+import json
+import os
+import zipfile
+
+from portal import app_settings
+from portal.views.teacher.pdfs import PDF_DATA
+
+INDEX_FILENAME = 'index.json'
+
+#: Key stage bundles, the materials they contain and where the old hand made zip lives
+KEY_STAGE_BUNDLES = {
+    'KS1': {'page_origin_prefix': '#ks1-', 'cloud_url': 'KS1.zip'},
+    'KS2': {'page_origin_prefix': '#lks2-', 'cloud_url': 'KS2.zip'},
+    'UKS2_Python': {'page_origin_prefix': '#uks2-', 'cloud_url': 'python/UKS2_Python.zip'},
+}
+
+#: Cloud storage folders which are laid out differently in the teaching packs
+CLOUD_TO_SOURCE_PREFIXES = (
+    ('general_resources/', ''),
+    ('python/lesson_plans/', 'UKS2_Python/UKS2_lesson_plans/'),
+    ('python/resource_sheets/', 'UKS2_Python/UKS2_Resource_sheets/'),
+    ('python/assessment/', 'UKS2_Python/UKS2_Assessment/'),
+    ('python/program_solutions/', 'UKS2_Python/'),
+    ('python/', 'UKS2_Python/'),
+)
+
+_index = None
+
+
+def link_title(link):
+    title = link.replace('_', ' ').title()
+    if (title[0] == 'K') | (title[1] == 'k'):
+        title = title[:4].upper() + title[4:]
+    return title
+
+
+def source_path(url):
+    '''Path of a material, relative to the teaching packs, for its cloud storage url.'''
+    for cloud_prefix, source_prefix in CLOUD_TO_SOURCE_PREFIXES:
+        if url.startswith(cloud_prefix):
+            return source_prefix + url[len(cloud_prefix):]
+    return url
+
+
+def file_hash(path):
+    sha = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def pdf_data_hash(pdf_data):
+    return hashlib.sha1(json.dumps(pdf_data, sort_keys=True)).hexdigest()
+
+
+def key_stage(page_origin):
+    for name, bundle in KEY_STAGE_BUNDLES.items():
+        if page_origin.startswith(bundle['page_origin_prefix']):
+            return name
+    return None
+
+
+def build_index(pdf_data=PDF_DATA, source_dir=None, hash_files=True):
+    '''Resolves titles, related links and (optionally) file sizes and hashes for every material.'''
+    source_dir = source_dir or app_settings.MATERIALS_SOURCE_DIR
+    materials = {}
+    for name, data in pdf_data.items():
+        links = data['links']
+        if links is not None:
+            links = [(link, link_title(link)) for link in links]
+
+        material = {
+            'title': data['title'],
+            'description': data['description'],
+            'url': data['url'],
+            'page_origin': data['page_origin'],
+            'links': links,
+            'video': data.get('video'),
+            'video_download_link': data.get('video_download_link'),
+            'key_stage': key_stage(data['page_origin']),
+            'source': source_path(data['url']),
+            'size': None,
+            'hash': None,
+        }
+
+        path = os.path.join(source_dir, material['source'])
+        if hash_files and os.path.isfile(path):
+            material['size'] = os.path.getsize(path)
+            material['hash'] = file_hash(path)
+
+        materials[name] = material
+
+    return {
+        'pdf_data_hash': pdf_data_hash(pdf_data),
+        'materials': materials,
+        'bundles': {},
+    }
+
+
+def bundle_sources(index, name):
+    '''Sorted (source path, hash) pairs of the materials that go in a key stage bundle.'''
+    return sorted(set((material['source'], material['hash'])
+                      for material in index['materials'].values()
+                      if material['key_stage'] == name and material['hash'] is not None))
+
+
+def write_bundle(path, source_dir, sources):
+    tmp_path = path + '.tmp'
+    with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED) as bundle:
+        for source, _ in sources:
+            bundle.write(os.path.join(source_dir, source), source)
+    os.rename(tmp_path, path)
+
+
+def load_index(build_dir=None):
+    path = os.path.join(build_dir or app_settings.MATERIALS_BUILD_DIR, INDEX_FILENAME)
+    if not os.path.isfile(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def build(pdf_data=PDF_DATA, source_dir=None, build_dir=None):
+    '''Writes the materials index and zip bundles, only rezipping key stages whose sources changed.
+
+    Returns the names of the bundles that were regenerated.
+    '''
+    source_dir = source_dir or app_settings.MATERIALS_SOURCE_DIR
+    build_dir = build_dir or app_settings.MATERIALS_BUILD_DIR
+    if not os.path.isdir(build_dir):
+        os.makedirs(build_dir)
+
+    previous = load_index(build_dir) or {'bundles': {}}
+    index = build_index(pdf_data, source_dir)
+
+    rebuilt = []
+    for name in sorted(KEY_STAGE_BUNDLES):
+        sources = bundle_sources(index, name)
+        source_hash = hashlib.sha1(json.dumps(sources)).hexdigest()
+        filename = name + '.zip'
+        path = os.path.join(build_dir, filename)
+
+        old = previous['bundles'].get(name)
+        if old is None or old['source_hash'] != source_hash or not os.path.isfile(path):
+            write_bundle(path, source_dir, sources)
+            rebuilt.append(name)
+
+        index['bundles'][name] = {
+            'filename': filename,
+            'source_hash': source_hash,
+            'size': os.path.getsize(path),
+            'files': [source for source, _ in sources],
+        }
+
+    tmp_path = os.path.join(build_dir, INDEX_FILENAME + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(index, f, sort_keys=True, indent=2)
+    os.rename(tmp_path, os.path.join(build_dir, INDEX_FILENAME))
+
+    global _index
+    _index = None
+
+    return rebuilt
+
+
+def get_index():
+    '''The materials index, read once per process.
+
+    Falls back to resolving titles and links in memory if the index has not been built or was
+    built from a different PDF_DATA.
+    '''
+    global _index
+    if _index is None:
+        index = load_index()
+        if index is None or index['pdf_data_hash'] != pdf_data_hash(PDF_DATA):
+            index = build_index(hash_files=False)
+        _index = index
+    return _index
+
+
+def get_material(pdf_name):
+    return get_index()['materials'][pdf_name]
+
+
+def get_bundle_path(name):
+    '''Path of a built key stage bundle, or None if it has not been built.'''
+    bundle = get_index()['bundles'].get(name)
+    if bundle is None:
+        return None
+    path = os.path.join(app_settings.MATERIALS_BUILD_DIR, bundle['filename'])
+    return path if os.path.isfile(path) else None
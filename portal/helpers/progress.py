@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+# Code for Life
+#
+# Copyright (C) 2016, Ocado Innovation Limited
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ADDITIONAL TERMS – Section 7 GNU General Public Licence
+#
+# This licence does not grant any right, title or interest in any “Ocado” logos,
+# trade names or the trademark “Ocado” or any other trademarks or domain names
+# owned by Ocado Innovation Limited or the Ocado group of companies or any other
+# distinctive brand features of “Ocado” as may be secured from time to time. You
+# must not distribute any modification of this program using the trademark
+# “Ocado” or claim any affiliation or association with Ocado or its employees.
+#
+# You are not authorised to use the name Ocado (or any of its trade names) or
+# the names of any author or contributor in advertising or for publicity purposes
+# pertaining to the distribution of this program, without the prior written
+# authorisation of Ocado.
+#
+# Any propagation, distribution or conveyance of this program must include this
+# copyright notice and these terms. You must not misrepresent the origins of this
+# program; modified versions of the program must be marked as such and not
+# identified as the original program.
+from django.apps import apps
+from django.db.models import Case, Count, F, Max, Sum, When
+
+from portal.models import Student, StudentLevelProgress, StudentProgress, ClassProgress
+
+
+def _completed(score):
+    # The game only submits a score above 0 for a solved level. Failed runs are submitted with 0
+    # and attempts left by reloading the level are finished without a score. Only the scores of
+    # finished attempts are passed in, both when rebuilding and when adding an attempt.
+    return (score or 0) > 0
+
+
+def _attempt_model():
+    # game.models imports portal.models, so it can't be imported from here
+    return apps.get_model('game', 'Attempt')
+
+
+def rebuild_student_progress(student_id, rebuild_class=True):
+    '''Works out a student's progress from all their attempts.'''
+    class_id = Student.objects.filter(id=student_id).values_list('class_field_id', flat=True).first()
+    levels = (_attempt_model().objects.filter(student_id=student_id).values('level_id')
+              .annotate(attempts=Count('id'), best_score=Max('score'),
+                        best_finished_score=Max(Case(When(finish_time__isnull=False, then=F('score')))),
+                        started=Max('start_time'), finished=Max('finish_time')))
+    StudentLevelProgress.objects.filter(student_id=student_id).delete()
+    StudentLevelProgress.objects.bulk_create([
+        StudentLevelProgress(student_id=student_id, level_id=level['level_id'],
+                             best_score=level['best_score'] or 0,
+                             completed=_completed(level['best_finished_score']))
+        for level in levels])
+    activity = [time for level in levels for time in (level['started'], level['finished']) if time is not None]
+    StudentProgress.objects.update_or_create(student_id=student_id, defaults={
+        'class_field_id': class_id,
+        'attempts': sum(level['attempts'] for level in levels),
+        'levels_attempted': len(levels),
+        'levels_completed': sum(1 for level in levels if _completed(level['best_finished_score'])),
+        'total_score': sum(level['best_score'] or 0 for level in levels),
+        'last_activity': max(activity) if activity else None,
+    })
+    if rebuild_class and class_id is not None:
+        rebuild_class_progress(class_id)
+
+
+def rebuild_class_progress(class_id):
+    '''Adds up the progress of a class's students.'''
+    totals = StudentProgress.objects.filter(class_field_id=class_id).aggregate(
+        students_started=Count('id'), attempts=Sum('attempts'), levels_attempted=Sum('levels_attempted'),
+        levels_completed=Sum('levels_completed'), total_score=Sum('total_score'),
+        last_activity=Max('last_activity'))
+    ClassProgress.objects.update_or_create(klass_id=class_id, defaults={
+        'students_started': totals['students_started'],
+        'attempts': totals['attempts'] or 0,
+        'levels_attempted': totals['levels_attempted'] or 0,
+        'levels_completed': totals['levels_completed'] or 0,
+        'total_score': totals['total_score'] or 0,
+        'last_activity': totals['last_activity'],
+    })
+
+
+def record_attempt(attempt, created):
+    '''Adds a saved attempt to its student's progress and their class's.
+
+    Only what the attempt changes is worked out, from the student's progress on its level, and
+    added to the student's and class's totals in place. Re-saving an attempt that changes none
+    of them costs one query.'''
+    if attempt.student_id is None:
+        return
+    score = attempt.score or 0
+    completed = _completed(attempt.score if attempt.finish_time is not None else None)
+    level, level_created = StudentLevelProgress.objects.get_or_create(
+        student_id=attempt.student_id, level_id=attempt.level_id,
+        defaults={'best_score': score, 'completed': completed})
+    changes = {'attempts': 1 if created else 0}
+    if level_created:
+        changes.update(levels_attempted=1, levels_completed=int(completed), total_score=score)
+    else:
+        changes.update(levels_attempted=0, levels_completed=int(completed and not level.completed),
+                       total_score=max(score - level.best_score, 0))
+        if changes['levels_completed'] or changes['total_score']:
+            level.best_score += changes['total_score']
+            level.completed = level.completed or completed
+            level.save()
+    if not any(changes.values()):
+        return
+
+    updates = dict((field, F(field) + change) for field, change in changes.items() if change)
+    updates['last_activity'] = attempt.finish_time or attempt.start_time
+    if not StudentProgress.objects.filter(student_id=attempt.student_id).update(**updates):
+        # The student's first attempt, or one from before progress was kept
+        rebuild_student_progress(attempt.student_id)
+        return
+    if not ClassProgress.objects.filter(klass__student_progress__student_id=attempt.student_id).update(**updates):
+        class_id = StudentProgress.objects.filter(student_id=attempt.student_id) \
+            .values_list('class_field_id', flat=True).first()
+        if class_id is not None:
+            rebuild_class_progress(class_id)
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+# Code for Life
+#
+# Copyright (C) 2016, Ocado Innovation Limited
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ADDITIONAL TERMS – Section 7 GNU General Public Licence
+#
+# This licence does not grant any right, title or interest in any “Ocado” logos,
+# trade names or the trademark “Ocado” or any other trademarks or domain names
+# owned by Ocado Innovation Limited or the Ocado group of companies or any other
+# distinctive brand features of “Ocado” as may be secured from time to time. You
+# must not distribute any modification of this program using the trademark
+# “Ocado” or claim any affiliation or association with Ocado or its employees.
+#
+# You are not authorised to use the name Ocado (or any of its trade names) or
+# the names of any author or contributor in advertising or for publicity purposes
+# pertaining to the distribution of this program, without the prior written
+# authorisation of Ocado.
+#
+# Any propagation, distribution or conveyance of this program must include this
+# copyright notice and these terms. You must not misrepresent the origins of this
+# program; modified versions of the program must be marked as such and not
+# identified as the original program.
+import hashlib
+import json
+import re
+
+from django.core.cache import cache
+
+from portal import app_settings, presence
+from portal.models import Class, Student
+
+SNAPSHOT_CACHE_KEY = 'class-roster-%d-%s'
+VERSION = re.compile(r'^[0-9a-f]{16}$')
+LOGIN_ROSTER_CACHE_KEY = 'class-login-roster-%s'
+
+
+def _roster(klass):
+    return list(Student.objects.filter(class_field=klass)
+                .values_list('id', 'new_user_id', 'new_user__first_name'))
+
+
+def _state(roster):
+    logged_in = presence.active_user_ids([user_id for _, user_id, _ in roster])
+    return dict((str(student_id), {'name': name, 'logged_in': user_id in logged_in})
+                for student_id, user_id, name in roster)
+
+
+def _version(state):
+    return hashlib.sha1(json.dumps(state, sort_keys=True)).hexdigest()[:16]
+
+
+def roster_changes(klass, since=None):
+    '''Returns the students of the class and whether they are logged in, as a version token
+    and either every student or, if since is a version seen recently, only what changed.
+
+    Answers straight away, so polling doesn't hold a worker; the page polls again a while
+    later, less often while nothing changes.'''
+    if since is not None and not VERSION.match(since):
+        since = None
+    state = _state(_roster(klass))
+    version = _version(state)
+    if version == since:
+        return {'version': version, 'full': False, 'changed': {}, 'removed': []}
+
+    cache.set(SNAPSHOT_CACHE_KEY % (klass.id, version), state, app_settings.ROSTER_SNAPSHOT_TIMEOUT)
+    previous = cache.get(SNAPSHOT_CACHE_KEY % (klass.id, since)) if since else None
+    if previous is None:
+        return {'version': version, 'full': True, 'students': state}
+    return {
+        'version': version,
+        'full': False,
+        'changed': dict((student_id, student) for student_id, student in state.items()
+                        if previous.get(student_id) != student),
+        'removed': [student_id for student_id in previous if student_id not in state],
+    }
+
+
+def _login_roster(access_code):
+    klass = Class.objects.filter(access_code=access_code).values_list('id', flat=True).first()
+    if klass is None:
+        return None
+    usernames = {}
+    for username, name in (Student.objects.filter(class_field_id=klass)
+                           .values_list('new_user__username', 'new_user__first_name')):
+        key = name.lower()
+        # Students sharing a name can't tell the login form which of them they are
+        usernames[key] = None if key in usernames else username
+    return klass, usernames
+
+
+def find_student_login(access_code, name):
+    '''Returns the id of the class with the access code and the username of its student with
+    the name, or None if there is no such class or not exactly one such student.
+
+    Both are matched case-insensitively. The class's names are cached for
+    LOGIN_ROSTER_CACHE_TIMEOUT, so a class logging in together costs one query.'''
+    access_code = access_code.strip().upper()
+    key = LOGIN_ROSTER_CACHE_KEY % access_code
+    roster = cache.get(key)
+    if roster is None:
+        roster = _login_roster(access_code)
+        if roster is None:
+            return None
+        cache.set(key, roster, app_settings.LOGIN_ROSTER_CACHE_TIMEOUT)
+    class_id, usernames = roster
+    username = usernames.get(name.lower())
+    if username is None:
+        return None
+    return class_id, username
+
+
+def forget_login_rosters(classes):
+    '''Drops the cached login names of the classes, given as a queryset.'''
+    cache.delete_many([LOGIN_ROSTER_CACHE_KEY % access_code
+                       for access_code in classes.values_list('access_code', flat=True)])
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+# Code for Life
+#
+# Copyright (C) 2016, Ocado Innovation Limited
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ADDITIONAL TERMS – Section 7 GNU General Public Licence
+#
+# This licence does not grant any right, title or interest in any “Ocado” logos,
+# trade names or the trademark “Ocado” or any other trademarks or domain names
+# owned by Ocado Innovation Limited or the Ocado group of companies or any other
+# distinctive brand features of “Ocado” as may be secured from time to time. You
+# must not distribute any modification of this program using the trademark
+# “Ocado” or claim any affiliation or association with Ocado or its employees.
+#
+# You are not authorised to use the name Ocado (or any of its trade names) or
+# the names of any author or contributor in advertising or for publicity purposes
+# pertaining to the distribution of this program, without the prior written
+# authorisation of Ocado.
+#
+# Any propagation, distribution or conveyance of this program must include this
+# copyright notice and these terms. You must not misrepresent the origins of this
+# program; modified versions of the program must be marked as such and not
+# identified as the original program.
+import time
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+
+from portal.emailMessages import emailVerificationNeededEmail
+from portal.helpers.emails import render_email, render_message_email, VERIFICATION_EMAIL
+
+
+class Command(BaseCommand):
+    help = 'Times rendering verification emails in full and from the prepared message.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', dest='count', type=int, default=10000,
+                            help='Number of emails to render each way.')
+        parser.add_argument('--host', dest='host', default=settings.CODEFORLIFE_WEBSITE,
+                            help='Host to build the links for; must be in ALLOWED_HOSTS.')
+
+    def handle(self, *args, **options):
+        request = RequestFactory().get('/', HTTP_HOST=options['host'])
+        tokens = [uuid4().hex[:30] for _ in range(options['count'])]
+
+        def in_full(token):
+            message = emailVerificationNeededEmail(request, token)
+            return render_email(VERIFICATION_EMAIL, ['teacher@example.com'], message['subject'], message['message'])
+
+        def prepared(token):
+            return render_message_email(VERIFICATION_EMAIL, ['teacher@example.com'], emailVerificationNeededEmail,
+                                        request, token=token)
+
+        for name, render in (('In full', in_full), ('Prepared', prepared)):
+            start = time.time()
+            for token in tokens:
+                render(token)
+            elapsed = time.time() - start
+            self.stdout.write('%s: %d emails in %.2fs (%.1f per second)'
+                              % (name, len(tokens), elapsed, len(tokens) / elapsed))
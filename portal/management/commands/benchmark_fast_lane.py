@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+# Code for Life
+#
+# Copyright (C) 2016, Ocado Innovation Limited
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ADDITIONAL TERMS – Section 7 GNU General Public Licence
+#
+# This licence does not grant any right, title or interest in any “Ocado” logos,
+# trade names or the trademark “Ocado” or any other trademarks or domain names
+# owned by Ocado Innovation Limited or the Ocado group of companies or any other
+# distinctive brand features of “Ocado” as may be secured from time to time. You
+# must not distribute any modification of this program using the trademark
+# “Ocado” or claim any affiliation or association with Ocado or its employees.
+#
+# You are not authorised to use the name Ocado (or any of its trade names) or
+# the names of any author or contributor in advertising or for publicity purposes
+# pertaining to the distribution of this program, without the prior written
+# authorisation of Ocado.
+#
+# Any propagation, distribution or conveyance of this program must include this
+# copyright notice and these terms. You must not misrepresent the origins of this
+# program; modified versions of the program must be marked as such and not
+# identified as the original program.
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.urlresolvers import NoReverseMatch, reverse
+from django.test import Client
+
+from portal import app_settings
+
+
+class Command(BaseCommand):
+    help = 'Times requests to endpoints through the full middleware and through the fast lane.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*',
+                            help='Paths to request. Defaults to the fast lane URLs that take no arguments.')
+        parser.add_argument('--count', dest='count', type=int, default=200,
+                            help='Number of requests to time each way.')
+        parser.add_argument('--post', dest='data', default=None,
+                            help='JSON to POST rather than making GET requests.')
+        parser.add_argument('--username', dest='username', default=None)
+        parser.add_argument('--password', dest='password', default=None)
+
+    def default_paths(self):
+        paths = []
+        for name in app_settings.FAST_LANE_URLS:
+            try:
+                paths.append(reverse(name))
+            except NoReverseMatch:
+                pass
+        return paths
+
+    def handle(self, *args, **options):
+        client = Client()
+        if options['username']:
+            client.login(username=options['username'], password=options['password'])
+
+        def request(path):
+            if options['data'] is None:
+                return client.get(path)
+            return client.post(path, options['data'], content_type='application/json')
+
+        fast_lane_urls = app_settings.FAST_LANE_URLS
+        try:
+            for path in options['paths'] or self.default_paths():
+                timings = []
+                for urls in ((), fast_lane_urls):
+                    app_settings.FAST_LANE_URLS = urls
+                    request(path)
+                    start = time.time()
+                    for _ in range(options['count']):
+                        request(path)
+                    timings.append((time.time() - start) * 1000 / options['count'])
+                self.stdout.write('%s: %.2fms through the full middleware, %.2fms through the fast lane'
+                                  % (path, timings[0], timings[1]))
+        finally:
+            app_settings.FAST_LANE_URLS = fast_lane_urls
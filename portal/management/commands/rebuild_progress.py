@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+# Code for Life
+#
+# Copyright (C) 2016, Ocado Innovation Limited
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ADDITIONAL TERMS – Section 7 GNU General Public Licence
+#
+# This licence does not grant any right, title or interest in any “Ocado” logos,
+# trade names or the trademark “Ocado” or any other trademarks or domain names
+# owned by Ocado Innovation Limited or the Ocado group of companies or any other
+# distinctive brand features of “Ocado” as may be secured from time to time. You
+# must not distribute any modification of this program using the trademark
+# “Ocado” or claim any affiliation or association with Ocado or its employees.
+#
+# You are not authorised to use the name Ocado (or any of its trade names) or
+# the names of any author or contributor in advertising or for publicity purposes
+# pertaining to the distribution of this program, without the prior written
+# authorisation of Ocado.
+#
+# Any propagation, distribution or conveyance of this program must include this
+# copyright notice and these terms. You must not misrepresent the origins of this
+# program; modified versions of the program must be marked as such and not
+# identified as the original program.
+from django.core.management.base import BaseCommand
+
+from portal.helpers.progress import rebuild_student_progress, rebuild_class_progress
+from portal.models import Student, Class
+
+
+class Command(BaseCommand):
+    help = ('Works out the Rapid Router progress of every student and class from their attempts. '
+            'Needed once after the progress tables are added; after that they are kept up to date as students play.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', dest='batch_size', type=int, default=500,
+                            help='Number of students to load at a time.')
+
+    def handle(self, *args, **options):
+        last_id = 0
+        students = 0
+        while True:
+            batch = list(Student.objects.filter(pk__gt=last_id, attempts__isnull=False).distinct()
+                         .order_by('pk').values_list('pk', flat=True)[:options['batch_size']])
+            if not batch:
+                break
+            for student_id in batch:
+                rebuild_student_progress(student_id, rebuild_class=False)
+            students += len(batch)
+            last_id = batch[-1]
+        classes = 0
+        for class_id in Class.objects.values_list('pk', flat=True).iterator():
+            rebuild_class_progress(class_id)
+            classes += 1
+        self.stdout.write('%d students and %d classes updated' % (students, classes))
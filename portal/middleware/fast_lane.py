@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+# Code for Life
+#
+# Copyright (C) 2016, Ocado Innovation Limited
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ADDITIONAL TERMS – Section 7 GNU General Public Licence
+#
+# This licence does not grant any right, title or interest in any “Ocado” logos,
+# trade names or the trademark “Ocado” or any other trademarks or domain names
+# owned by Ocado Innovation Limited or the Ocado group of companies or any other
+# distinctive brand features of “Ocado” as may be secured from time to time. You
+# must not distribute any modification of this program using the trademark
+# “Ocado” or claim any affiliation or association with Ocado or its employees.
+#
+# You are not authorised to use the name Ocado (or any of its trade names) or
+# the names of any author or contributor in advertising or for publicity purposes
+# pertaining to the distribution of this program, without the prior written
+# authorisation of Ocado.
+#
+# Any propagation, distribution or conveyance of this program must include this
+# copyright notice and these terms. You must not misrepresent the origins of this
+# program; modified versions of the program must be marked as such and not
+# identified as the original program.
+'''A fast lane through the middleware for machine endpoints.
+
+Requests for the URLs named in FAST_LANE_URLS, such as event telemetry and the school typeahead,
+return JSON and never render a page. The CMS middlewares are installed through the wrappers
+here, which pass those requests straight through.
+
+The message middleware can't be wrapped: django_autoconfig installs it for
+django.contrib.messages whatever the portal asks for. It only touches the session or cookies
+when a message is added or read, so it costs the fast lane next to nothing.
+'''
+from django.core.urlresolvers import Resolver404, resolve
+from django.utils.module_loading import import_string
+
+from portal import app_settings
+
+HOOKS = ('process_request', 'process_view', 'process_template_response', 'process_response',
+         'process_exception')
+
+
+def is_fast_lane(request):
+    '''Whether the request is for one of the FAST_LANE_URLS.'''
+    fast_lane = getattr(request, 'fast_lane', None)
+    if fast_lane is None:
+        try:
+            fast_lane = resolve(request.path_info).url_name in app_settings.FAST_LANE_URLS
+        except Resolver404:
+            fast_lane = False
+        request.fast_lane = fast_lane
+    return fast_lane
+
+
+def _skip_fast_lane(hook, name):
+    if name in ('process_template_response', 'process_response'):
+        def run(request, response):
+            return response if is_fast_lane(request) else hook(request, response)
+    else:
+        def run(request, *args):
+            return None if is_fast_lane(request) else hook(request, *args)
+    return run
+
+
+class FastLaneSkipped(object):
+    '''Runs the middleware named by ``middleware`` for every request outside the fast lane.'''
+    middleware = None
+
+    def __init__(self):
+        middleware = import_string(self.middleware)()
+        # Django only calls the hooks a middleware has, so only add the ones the wrapped one has
+        for name in HOOKS:
+            if hasattr(middleware, name):
+                setattr(self, name, _skip_fast_lane(getattr(middleware, name), name))
+
+
+class CurrentUserMiddleware(FastLaneSkipped):
+    middleware = 'cms.middleware.user.CurrentUserMiddleware'
+
+
+class CurrentPageMiddleware(FastLaneSkipped):
+    middleware = 'cms.middleware.page.CurrentPageMiddleware'
+
+
+class ToolbarMiddleware(FastLaneSkipped):
+    middleware = 'cms.middleware.toolbar.ToolbarMiddleware'
+
+
+class LanguageCookieMiddleware(FastLaneSkipped):
+    middleware = 'cms.middleware.language.LanguageCookieMiddleware'
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+# Code for Life
+#
+# Copyright (C) 2016, Ocado Innovation Limited
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ADDITIONAL TERMS – Section 7 GNU General Public Licence
+#
+# This licence does not grant any right, title or interest in any “Ocado” logos,
+# trade names or the trademark “Ocado” or any other trademarks or domain names
+# owned by Ocado Innovation Limited or the Ocado group of companies or any other
+# distinctive brand features of “Ocado” as may be secured from time to time. You
+# must not distribute any modification of this program using the trademark
+# “Ocado” or claim any affiliation or association with Ocado or its employees.
+#
+# You are not authorised to use the name Ocado (or any of its trade names) or
+# the names of any author or contributor in advertising or for publicity purposes
+# pertaining to the distribution of this program, without the prior written
+# authorisation of Ocado.
+#
+# Any propagation, distribution or conveyance of this program must include this
+# copyright notice and these terms. You must not misrepresent the origins of this
+# program; modified versions of the program must be marked as such and not
+# identified as the original program.
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.http import HttpResponse
+from django.middleware.csrf import get_token, rotate_token
+from django.utils.cache import patch_vary_headers
+from django.utils import translation
+from django.utils.encoding import force_bytes
+
+from portal import app_settings
+from portal.utils import anonymous_page_cache_key
+
+CSRF_TOKEN_PLACEHOLDER = b'__PORTAL_PAGE_CACHE_CSRF_TOKEN__'
+CSRF_TOKEN = re.compile(r'^[a-zA-Z0-9]{32}$')
+
+# Cached pages depend on the session and the language, so caches downstream must too
+VARY_HEADERS = ('Cookie', 'Accept-Language')
+
+
+class AnonymousPageCacheMiddleware(object):
+    '''Serves the public pages to logged out visitors from the cache.
+
+    Sits before the session middleware, so a hit skips the session, CMS and sekizai work and the
+    template rendering altogether. Only GET requests without a query string or a session cookie
+    are cached; anyone with a session might be logged in or have messages waiting.
+
+    The teach and play pages show a captcha once an IP has had too many failed logins. A cached
+    page never does, but the login views still insist on the captcha, so the visitor gets it on
+    their next attempt.
+    '''
+
+    def __init__(self):
+        self._paths = None
+
+    def cached_paths(self):
+        if self._paths is None:
+            self._paths = frozenset(reverse(name) for name in app_settings.ANONYMOUS_PAGE_CACHE_URLS)
+        return self._paths
+
+    def is_cacheable(self, request):
+        return (request.method == 'GET' and
+                not request.META.get('QUERY_STRING') and
+                settings.SESSION_COOKIE_NAME not in request.COOKIES and
+                request.path in self.cached_paths())
+
+    def csrf_token(self, request):
+        # Visitors keep a well formed token they already have; anyone else gets a new one
+        token = request.COOKIES.get(settings.CSRF_COOKIE_NAME, '')
+        if CSRF_TOKEN.match(token):
+            request.META['CSRF_COOKIE'] = token
+        else:
+            rotate_token(request)
+        return force_bytes(get_token(request))
+
+    def process_request(self, request):
+        if not self.is_cacheable(request):
+            return None
+
+        language = translation.get_language_from_request(request)
+        request.anonymous_page_cache_key = anonymous_page_cache_key(request.get_host(), language, request.path)
+        cached = cache.get(request.anonymous_page_cache_key)
+        if cached is None:
+            return None
+
+        content, content_type = cached
+        if CSRF_TOKEN_PLACEHOLDER in content:
+            content = content.replace(CSRF_TOKEN_PLACEHOLDER, self.csrf_token(request))
+
+        request.anonymous_page_cache_hit = True
+        translation.activate(language)
+        response = HttpResponse(content, content_type=content_type)
+        response['Content-Language'] = language
+        patch_vary_headers(response, VARY_HEADERS)
+        return response
+
+    def process_response(self, request, response):
+        key = getattr(request, 'anonymous_page_cache_key', None)
+        if key is None or getattr(request, 'anonymous_page_cache_hit', False):
+            return response
+
+        if (response.status_code != 200 or response.streaming or
+                settings.SESSION_COOKIE_NAME in response.cookies):
+            return response
+
+        patch_vary_headers(response, VARY_HEADERS)
+        content = response.content
+        token = request.META.get('CSRF_COOKIE')
+        if token:
+            content = content.replace(force_bytes(token), CSRF_TOKEN_PLACEHOLDER)
+        cache.set(key, (content, response['Content-Type']), app_settings.ANONYMOUS_PAGE_CACHE_TIMEOUT)
+        return response
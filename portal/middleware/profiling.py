@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+# Code for Life
+#
+# Copyright (C) 2016, Ocado Innovation Limited
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ADDITIONAL TERMS – Section 7 GNU General Public Licence
+#
+# This licence does not grant any right, title or interest in any “Ocado” logos,
+# trade names or the trademark “Ocado” or any other trademarks or domain names
+# owned by Ocado Innovation Limited or the Ocado group of companies or any other
+# distinctive brand features of “Ocado” as may be secured from time to time. You
+# must not distribute any modification of this program using the trademark
+# “Ocado” or claim any affiliation or association with Ocado or its employees.
+#
+# You are not authorised to use the name Ocado (or any of its trade names) or
+# the names of any author or contributor in advertising or for publicity purposes
+# pertaining to the distribution of this program, without the prior written
+# authorisation of Ocado.
+#
+# Any propagation, distribution or conveyance of this program must include this
+# copyright notice and these terms. You must not misrepresent the origins of this
+# program; modified versions of the program must be marked as such and not
+# identified as the original program.
+import json
+import logging
+import random
+
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.urlresolvers import Resolver404, resolve
+
+from portal import app_settings, profiling
+
+LOGGER = logging.getLogger('portal.profiling')
+
+
+class ProfilingMiddleware(object):
+    '''Profiles a sample of requests: PROFILING_SAMPLE_RATE of them.
+
+    Each profiled request is logged to the portal.profiling logger as JSON, with its time, its
+    queries, cache calls and the time spent rendering templates, rate limiting and sending
+    emails, and is added to the per-view summary staff can see at /admin/profiling/. It sits
+    outside every other middleware so their work is counted too. Streaming responses are only
+    timed up to the point their content starts being sent.
+    '''
+
+    def __init__(self):
+        if app_settings.PROFILING_SAMPLE_RATE <= 0:
+            raise MiddlewareNotUsed
+        profiling.install()
+
+    def process_request(self, request):
+        if random.random() < app_settings.PROFILING_SAMPLE_RATE:
+            request.profile = profiling.Profile()
+            request.profile.start()
+
+    def process_response(self, request, response):
+        profile = getattr(request, 'profile', None)
+        if profile is None or profile.finished is not None:
+            return response
+        profile.stop()
+
+        view = _view_name(request)
+        record = profile.as_dict()
+        record.update(view=view, path=request.path, method=request.method, status=response.status_code)
+        LOGGER.info(json.dumps(record, sort_keys=True), extra={'profile': record})
+        if view is not None:
+            profiling.add_to_summary(view, record)
+        return response
+
+
+def _view_name(request):
+    # Requests answered before their URL is resolved, like page cache hits, haven't got a match
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return None
+    return match.view_name
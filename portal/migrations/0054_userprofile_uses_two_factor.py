@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+# The tables of the device types django_otp and two_factor know of. Read directly rather than
+# through the live models or device_classes(), which can be ahead of this migration. The
+# django_otp version in use ships South migrations only, so its apps are unmigrated: migrate
+# creates their tables before running any migrations, and they can't be depended on.
+DEVICE_TABLES = ('otp_totp_totpdevice', 'otp_static_staticdevice', 'two_factor_phonedevice')
+
+
+def populate_uses_two_factor(apps, schema_editor):
+    UserProfile = apps.get_model('portal', 'UserProfile')
+    connection = schema_editor.connection
+    tables = connection.introspection.table_names()
+    enabled = set()
+    with connection.cursor() as cursor:
+        for table in DEVICE_TABLES:
+            if table not in tables:
+                continue
+            cursor.execute('SELECT user_id FROM %s WHERE name = %%s AND confirmed = %%s'
+                           % connection.ops.quote_name(table), ['default', True])
+            enabled.update(user_id for user_id, in cursor.fetchall())
+    enabled = sorted(enabled)
+    for start in range(0, len(enabled), 500):
+        UserProfile.objects.filter(user_id__in=enabled[start:start + 500]).update(uses_two_factor=True)
+
+
+def reverse(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0053_refactor_teacher_student_1'),
+        ('two_factor', '0002_auto_20150110_0810'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='uses_two_factor',
+            field=models.BooleanField(default=False, db_index=True),
+        ),
+        migrations.RunPython(populate_uses_two_factor, reverse),
+    ]
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from uuid import uuid4
+
+from django.db import models, migrations
+from django.db.models import Count
+
+
+def make_tokens_unique(apps, schema_editor):
+    EmailVerification = apps.get_model('portal', 'EmailVerification')
+    duplicated = (EmailVerification.objects.values('token').annotate(count=Count('id'))
+                  .filter(count__gt=1).values_list('token', flat=True))
+    for token in list(duplicated):
+        for verification in EmailVerification.objects.filter(token=token).order_by('id')[1:]:
+            verification.token = uuid4().hex[:30]
+            verification.save()
+
+
+def populate_email_verified(apps, schema_editor):
+    UserProfile = apps.get_model('portal', 'UserProfile')
+    UserProfile.objects.filter(user__email_verifications__verified=True).update(email_verified=True)
+
+
+def reverse(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0055_queuedemail'),
+    ]
+
+    operations = [
+        migrations.RunPython(make_tokens_unique, reverse),
+        migrations.AlterField(
+            model_name='emailverification',
+            name='token',
+            field=models.CharField(max_length=30, unique=True),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='email_verified',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(populate_email_verified, reverse),
+    ]
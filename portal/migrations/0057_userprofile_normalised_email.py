@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+def populate_normalised_email(apps, schema_editor):
+    UserProfile = apps.get_model('portal', 'UserProfile')
+    profiles = UserProfile.objects.values_list('id', 'user__email')
+    for profile_id, email in profiles.iterator():
+        UserProfile.objects.filter(id=profile_id).update(normalised_email=(email or '').strip().lower())
+
+
+def reverse(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0056_email_verification_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='normalised_email',
+            field=models.CharField(max_length=254, blank=True, db_index=True),
+        ),
+        migrations.RunPython(populate_normalised_email, reverse),
+    ]
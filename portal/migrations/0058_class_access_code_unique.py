@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import random
+import string
+
+from django.db import models, migrations
+
+
+def normalise_access_codes(apps, schema_editor):
+    Class = apps.get_model('portal', 'Class')
+    seen = set()
+    for class_id, access_code in Class.objects.order_by('id').values_list('id', 'access_code').iterator():
+        normalised = (access_code or '').strip().upper()
+        while not normalised or normalised in seen:
+            # Older classes sharing a code (or missing one) get a fresh code, as
+            # generate_access_code would have given them.
+            normalised = (''.join(random.choice(string.ascii_uppercase) for _ in range(2)) +
+                          ''.join(random.choice(string.digits) for _ in range(3)))
+            if Class.objects.filter(access_code__iexact=normalised).exclude(id=class_id).exists():
+                normalised = ''
+        seen.add(normalised)
+        if normalised != access_code:
+            Class.objects.filter(id=class_id).update(access_code=normalised)
+
+
+def reverse(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0057_userprofile_normalised_email'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalise_access_codes, reverse),
+        migrations.AlterField(
+            model_name='class',
+            name='access_code',
+            field=models.CharField(max_length=5, unique=True),
+        ),
+    ]
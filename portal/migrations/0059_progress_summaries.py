@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0058_class_access_code_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClassProgress',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('students_started', models.PositiveIntegerField(default=0)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('levels_attempted', models.PositiveIntegerField(default=0)),
+                ('levels_completed', models.PositiveIntegerField(default=0)),
+                ('total_score', models.FloatField(default=0)),
+                ('last_activity', models.DateTimeField(null=True)),
+                ('klass', models.OneToOneField(related_name='progress', to='portal.Class')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StudentLevelProgress',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('level_id', models.IntegerField()),
+                ('best_score', models.FloatField(default=0)),
+                ('completed', models.BooleanField(default=False)),
+                ('student', models.ForeignKey(related_name='level_progress', to='portal.Student')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StudentProgress',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('levels_attempted', models.PositiveIntegerField(default=0)),
+                ('levels_completed', models.PositiveIntegerField(default=0)),
+                ('total_score', models.FloatField(default=0)),
+                ('last_activity', models.DateTimeField(null=True)),
+                ('class_field', models.ForeignKey(related_name='student_progress', to='portal.Class', null=True)),
+                ('student', models.OneToOneField(related_name='progress', to='portal.Student')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='studentlevelprogress',
+            unique_together=set([('student', 'level_id')]),
+        ),
+    ]
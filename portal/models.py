@@ -42,16 +42,21 @@ import datetime
 from django.contrib.auth.models import User
 from django.db import models
 from django_countries.fields import CountryField
-from django.core.cache import cache
 from django.utils import timezone
 
-from online_status.status import CACHE_USERS
+from portal import presence
 
 
 class UserProfile(models.Model):
     user = models.OneToOneField(User)
     can_view_aggregated_data = models.BooleanField(default=False)
     developer = models.BooleanField(default=False)
+    # Kept in step with the user's 2FA devices by portal.handlers
+    uses_two_factor = models.BooleanField(default=False, db_index=True)
+    # Set by portal.handlers once any of the user's EmailVerifications is verified
+    email_verified = models.BooleanField(default=False)
+    # Lower-cased copy of user.email for indexed lookups, kept in step by portal.handlers
+    normalised_email = models.CharField(max_length=254, blank=True, db_index=True)
 
     awaiting_email_verification = models.BooleanField(default=False)
 
@@ -132,7 +137,7 @@ class Teacher(models.Model):
 class Class(models.Model):
     name = models.CharField(max_length=200)
     teacher = models.ForeignKey(Teacher, related_name='class_teacher')
-    access_code = models.CharField(max_length=5)
+    access_code = models.CharField(max_length=5, unique=True)
     classmates_data_viewable = models.BooleanField(default=False)
     always_accept_requests = models.BooleanField(default=False)
     accept_requests_until = models.DateTimeField(null=True)
@@ -145,15 +150,10 @@ class Class(models.Model):
         return students.count() != 0
 
     def get_logged_in_students(self):
-        ONLINE = 1
-
         """This gets all the students who are logged in."""
-        users_status = cache.get(CACHE_USERS)
-        online_users_status = filter(lambda status: status.status == ONLINE, users_status)
-        online_user_ids = map(lambda status: status.user.id, online_users_status)
-
-        # Query all logged in users based on id list
-        return Student.objects.filter(class_field=self).filter(new_user__id__in=online_user_ids)
+        students = Student.objects.filter(class_field=self)
+        user_ids = presence.active_user_ids(students.values_list('new_user_id', flat=True))
+        return students.filter(new_user_id__in=user_ids)
 
     class Meta:
         verbose_name_plural = "classes"
@@ -214,7 +214,7 @@ class Guardian(models.Model):
 
 class EmailVerification(models.Model):
     user = models.ForeignKey(User, related_name='email_verifications', null=True, blank=True)
-    token = models.CharField(max_length=30)
+    token = models.CharField(max_length=30, unique=True)
     email = models.CharField(max_length=200, null=True, default=None, blank=True)
     expiry = models.DateTimeField()
     verified = models.BooleanField(default=False)
@@ -234,4 +234,62 @@ class FrontPageNews(models.Model):
         return self.title
 
 
+class QueuedEmail(models.Model):
+    """An email waiting in the outbox, or already sent from it, see portal.helpers.emails."""
+    sender = models.CharField(max_length=254)
+    recipients = models.TextField()  # one address per line
+    subject = models.CharField(max_length=255)
+    text_body = models.TextField()
+    html_body = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    send_after = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    sent = models.DateTimeField(null=True, blank=True)
+    failed = models.BooleanField(default=False)
+
+    class Meta:
+        index_together = [['sent', 'failed', 'send_after']]
+
+    def __unicode__(self):
+        return self.subject
+
+    @property
+    def recipient_list(self):
+        return self.recipients.splitlines()
+
+
+class StudentLevelProgress(models.Model):
+    """A student's best score on a Rapid Router level, see portal.helpers.progress."""
+    student = models.ForeignKey(Student, related_name='level_progress')
+    level_id = models.IntegerField()
+    best_score = models.FloatField(default=0)
+    completed = models.BooleanField(default=False)
+
+    class Meta:
+        unique_together = [['student', 'level_id']]
+
+
+class StudentProgress(models.Model):
+    """How far a student has got with Rapid Router, kept up to date as they play."""
+    student = models.OneToOneField(Student, related_name='progress')
+    class_field = models.ForeignKey(Class, related_name='student_progress', null=True)
+    attempts = models.PositiveIntegerField(default=0)
+    levels_attempted = models.PositiveIntegerField(default=0)
+    levels_completed = models.PositiveIntegerField(default=0)
+    total_score = models.FloatField(default=0)  # the sum of the student's best score on each level
+    last_activity = models.DateTimeField(null=True)
+
+
+class ClassProgress(models.Model):
+    """The progress of a class's students, added up."""
+    klass = models.OneToOneField(Class, related_name='progress')
+    students_started = models.PositiveIntegerField(default=0)
+    attempts = models.PositiveIntegerField(default=0)
+    levels_attempted = models.PositiveIntegerField(default=0)
+    levels_completed = models.PositiveIntegerField(default=0)
+    total_score = models.FloatField(default=0)
+    last_activity = models.DateTimeField(null=True)
+
+
 from . import handlers  # noqa
@@ -38,21 +38,19 @@ from functools import wraps
 from django.http import HttpResponseRedirect
 from django.core.urlresolvers import reverse_lazy
 
-from portal.utils import using_two_factor
+from portal.roles import get_user_role
 
 
 def logged_in_as_teacher(u):
-    if not hasattr(u, 'userprofile') or not hasattr(u.userprofile, 'teacher'):
-        return False
-    return u.is_verified() or not using_two_factor(u)
+    return get_user_role(u).is_teacher
 
 
 def logged_in_as_student(u):
-    return hasattr(u, 'userprofile') and hasattr(u.userprofile, 'student')
+    return get_user_role(u).student is not None
 
 
 def not_logged_in(u):
-    return not hasattr(u, 'userprofile')
+    return get_user_role(u).profile is None
 
 
 def not_fully_logged_in(u):
@@ -62,9 +60,7 @@ def not_fully_logged_in(u):
 def teacher_verified(view_func):
     @wraps(view_func)
     def wrapped(request, *args, **kwargs):
-        u = request.user
-        if (not hasattr(u, 'userprofile') or not hasattr(u.userprofile, 'teacher') or
-                (not u.is_verified() and using_two_factor(u))):
+        if not get_user_role(request.user).is_teacher:
             return HttpResponseRedirect(reverse_lazy('teach'))
 
         return view_func(request, *args, **kwargs)
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+# Code for Life
+#
+# Copyright (C) 2016, Ocado Innovation Limited
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ADDITIONAL TERMS – Section 7 GNU General Public Licence
+#
+# This licence does not grant any right, title or interest in any “Ocado” logos,
+# trade names or the trademark “Ocado” or any other trademarks or domain names
+# owned by Ocado Innovation Limited or the Ocado group of companies or any other
+# distinctive brand features of “Ocado” as may be secured from time to time. You
+# must not distribute any modification of this program using the trademark
+# “Ocado” or claim any affiliation or association with Ocado or its employees.
+#
+# You are not authorised to use the name Ocado (or any of its trade names) or
+# the names of any author or contributor in advertising or for publicity purposes
+# pertaining to the distribution of this program, without the prior written
+# authorisation of Ocado.
+#
+# Any propagation, distribution or conveyance of this program must include this
+# copyright notice and these terms. You must not misrepresent the origins of this
+# program; modified versions of the program must be marked as such and not
+# identified as the original program.
+import time
+
+from django.core.cache import cache
+
+from portal import app_settings
+
+# Each user's last-seen time lives under its own key and is only rewritten once it is
+# PRESENCE_UPDATE_INTERVAL old, so a class full of students playing costs one cache write
+# per student per interval instead of a rewrite of one shared list on every request.
+LAST_SEEN_CACHE_KEY = 'presence-last-seen-%s'
+
+
+def record_seen(user_id, now=None):
+    '''Notes that the user has just made a request. Returns whether that needed a write.'''
+    now = time.time() if now is None else now
+    key = LAST_SEEN_CACHE_KEY % user_id
+    last_seen = cache.get(key)
+    if last_seen is not None and now - last_seen < app_settings.PRESENCE_UPDATE_INTERVAL:
+        return False
+    cache.set(key, now, app_settings.PRESENCE_OFFLINE_AFTER)
+    return True
+
+
+def forget(user_id):
+    '''Takes the user offline straight away, as when they log out.'''
+    cache.delete(LAST_SEEN_CACHE_KEY % user_id)
+
+
+def last_seen(user_ids):
+    '''Maps each of the given users that is still online to the time they were last seen.'''
+    keys = dict((LAST_SEEN_CACHE_KEY % user_id, user_id) for user_id in user_ids)
+    return dict((keys[key], seen) for key, seen in cache.get_many(keys.keys()).items())
+
+
+def active_user_ids(user_ids, now=None):
+    '''Returns the set of the given users seen within PRESENCE_IDLE_AFTER.'''
+    now = time.time() if now is None else now
+    return set(user_id for user_id, seen in last_seen(user_ids).items()
+               if now - seen <= app_settings.PRESENCE_IDLE_AFTER)
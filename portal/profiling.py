@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+# Code for Life
+#
+# Copyright (C) 2016, Ocado Innovation Limited
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ADDITIONAL TERMS – Section 7 GNU General Public Licence
+#
+# This licence does not grant any right, title or interest in any “Ocado” logos,
+# trade names or the trademark “Ocado” or any other trademarks or domain names
+# owned by Ocado Innovation Limited or the Ocado group of companies or any other
+# distinctive brand features of “Ocado” as may be secured from time to time. You
+# must not distribute any modification of this program using the trademark
+# “Ocado” or claim any affiliation or association with Ocado or its employees.
+#
+# You are not authorised to use the name Ocado (or any of its trade names) or
+# the names of any author or contributor in advertising or for publicity purposes
+# pertaining to the distribution of this program, without the prior written
+# authorisation of Ocado.
+#
+# Any propagation, distribution or conveyance of this program must include this
+# copyright notice and these terms. You must not misrepresent the origins of this
+# program; modified versions of the program must be marked as such and not
+# identified as the original program.
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache as default_cache, caches
+from django.db import connections
+
+from portal import app_settings
+
+# The profile of the request being handled on this thread, if it was picked to be profiled.
+# Everything timed below checks it first, so the hooks cost one attribute lookup otherwise.
+_local = threading.local()
+
+SUMMARY_CACHE_KEY = 'profiling-summary'
+# Most repeated queries kept per view for the summary
+SUMMARY_DUPLICATES = 10
+
+CACHE_READS = ('get', 'get_many')
+CACHE_WRITES = ('set', 'set_many', 'add')
+
+# SQLite can't show the query as run, so its queries are logged as the query and its parameters
+_SQLITE = re.compile(r"^QUERY = u?(['\"])(.*)\1 - PARAMS = \(.*\)$", re.DOTALL)
+_PLACEHOLDER = re.compile(r'%s')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_LIST = re.compile(r'\((?:\s*\?\s*,)+\s*\?\s*\)')
+
+
+def sql_shape(sql):
+    '''The query with its values taken out, so the same query for different rows looks the same.'''
+    sqlite = _SQLITE.match(sql)
+    if sqlite:
+        sql = _PLACEHOLDER.sub('?', sqlite.group(2))
+    sql = _NUMBER.sub('?', _STRING.sub('?', sql))
+    return _LIST.sub('(...)', sql)
+
+
+def repeated_queries(queries, more_than=1):
+    '''[(shape, count)] of the shapes run more than ``more_than`` times, most repeated first.'''
+    counts = Counter(sql_shape(query['sql']) for query in queries)
+    return [(shape, count) for shape, count in counts.most_common() if count > more_than]
+
+
+class Profile(object):
+    '''What one request spent its time on.'''
+
+    def __init__(self):
+        self.started = time.time()
+        self.finished = None
+        self.timings = defaultdict(float)
+        self.cache = {'gets': 0, 'hits': 0, 'sets': 0}
+        self.queries = []
+        self._depth = defaultdict(int)
+        self._entered = {}
+        self._cache_methods = []
+        self._cache_depth = 0
+        self._connections = []
+
+    def enter(self, name):
+        self._depth[name] += 1
+        if self._depth[name] == 1:
+            self._entered[name] = time.time()
+
+    def exit(self, name):
+        # Only the outermost of nested calls is added, so recursion isn't counted twice
+        self._depth[name] -= 1
+        if not self._depth[name]:
+            self.timings[name] += time.time() - self._entered.pop(name)
+
+    def start(self):
+        for connection in connections.all():
+            self._connections.append((connection, connection.force_debug_cursor, len(connection.queries_log)))
+            connection.force_debug_cursor = True
+        for alias in settings.CACHES:
+            self._count_cache_calls(caches[alias])
+        _local.profile = self
+
+    def stop(self):
+        _local.profile = None
+        self.finished = time.time()
+        for cache, name in self._cache_methods:
+            del cache.__dict__[name]
+        for connection, force_debug_cursor, logged in self._connections:
+            connection.force_debug_cursor = force_debug_cursor
+            self.queries.extend(list(connection.queries_log)[logged:])
+        self._cache_methods = self._connections = []
+
+    def _count_cache_calls(self, cache):
+        # The cache objects are per thread, so wrapping their methods only affects this request
+        # Backends build some calls out of others (LocMemCache.get_many calls get), so only the
+        # outermost call is counted
+        def counted(name, method):
+            @wraps(method)
+            def call(*args, **kwargs):
+                self._cache_depth += 1
+                try:
+                    result = method(*args, **kwargs)
+                finally:
+                    self._cache_depth -= 1
+                if self._cache_depth:
+                    return result
+                if name == 'get':
+                    self.cache['gets'] += 1
+                    self.cache['hits'] += result is not None
+                elif name == 'get_many':
+                    self.cache['gets'] += len(args[0])
+                    self.cache['hits'] += len(result)
+                elif name == 'set_many':
+                    self.cache['sets'] += len(args[0])
+                else:
+                    self.cache['sets'] += 1
+                return result
+            return call
+
+        for name in CACHE_READS + CACHE_WRITES:
+            if name not in cache.__dict__:
+                setattr(cache, name, counted(name, getattr(cache, name)))
+                self._cache_methods.append((cache, name))
+
+    def as_dict(self):
+        total = (self.finished or time.time()) - self.started
+        record = {
+            'total_ms': _ms(total),
+            'sql': {
+                'count': len(self.queries),
+                'ms': _ms(sum(float(query['time']) for query in self.queries)),
+            },
+            'cache': dict(self.cache),
+            'duplicate_queries': [{'sql': shape, 'count': count} for shape, count in repeated_queries(self.queries)],
+        }
+        for name in ('template', 'ratelimit', 'send_email'):
+            record[name + '_ms'] = _ms(self.timings[name])
+        return record
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2)
+
+
+def current():
+    '''The profile of the request on this thread, or None if it isn't being profiled.'''
+    return getattr(_local, 'profile', None)
+
+
+class timed(object):
+    '''Adds the time spent in a block, or in calls to a function, to the current profile.
+
+        with timed('send_email'):
+            ...
+
+        @timed('send_email')
+        def send_email(...):
+    '''
+
+    def __init__(self, name):
+        self.name = name
+        self.profile = None
+
+    def __enter__(self):
+        self.profile = current()
+        if self.profile is not None:
+            self.profile.enter(self.name)
+
+    def __exit__(self, *exc_info):
+        if self.profile is not None:
+            self.profile.exit(self.name)
+
+    def __call__(self, function):
+        name = self.name
+
+        @wraps(function)
+        def call(*args, **kwargs):
+            with timed(name):
+                return function(*args, **kwargs)
+        return call
+
+
+_installed = []
+
+
+def install():
+    '''Times template rendering and rate limiting, which live outside the portal. Idempotent.
+
+    This patches Template.render and the ratelimit backend for the whole process, not just the
+    sampled requests, since swapping class attributes per request would race between threads.
+    Outside a sampled request the wrappers only check that there is no current profile. The
+    middleware only calls this when PROFILING_SAMPLE_RATE is above 0.'''
+    if _installed:
+        return
+    from django.template.base import Template
+    from ratelimit import decorators
+
+    Template.render = timed('template')(Template.render)
+    decorators.backend.limits = timed('ratelimit')(decorators.backend.limits)
+    decorators.backend.increment = timed('ratelimit')(decorators.backend.increment)
+    _installed.append(True)
+
+
+def add_to_summary(view, record):
+    '''Add a profiled request to the per-view totals shown to staff.
+
+    Concurrent requests can overwrite each other's additions, which sampling makes rare and
+    which only costs a request from the counts.'''
+    summary = default_cache.get(SUMMARY_CACHE_KEY) or {}
+    totals = summary.setdefault(view, {'requests': 0, 'total_ms': 0, 'max_ms': 0, 'queries': 0, 'sql_ms': 0,
+                                       'template_ms': 0, 'duplicates': {}})
+    totals['requests'] += 1
+    totals['total_ms'] += record['total_ms']
+    totals['max_ms'] = max(totals['max_ms'], record['total_ms'])
+    totals['queries'] += record['sql']['count']
+    totals['sql_ms'] += record['sql']['ms']
+    totals['template_ms'] += record['template_ms']
+    duplicates = totals['duplicates']
+    for duplicate in record['duplicate_queries']:
+        duplicates[duplicate['sql']] = max(duplicates.get(duplicate['sql'], 0), duplicate['count'])
+    totals['duplicates'] = dict(Counter(duplicates).most_common(SUMMARY_DUPLICATES))
+    default_cache.set(SUMMARY_CACHE_KEY, summary, app_settings.PROFILING_SUMMARY_TIMEOUT)
+
+
+def slowest_views():
+    '''[(view, totals)] of the profiled views, slowest on average first.'''
+    summary = default_cache.get(SUMMARY_CACHE_KEY) or {}
+    return sorted(summary.items(), key=lambda item: -item[1]['total_ms'] / item[1]['requests'])
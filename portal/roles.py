@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+# Code for Life
+#
+# Copyright (C) 2016, Ocado Innovation Limited
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ADDITIONAL TERMS – Section 7 GNU General Public Licence
+#
+# This licence does not grant any right, title or interest in any “Ocado” logos,
+# trade names or the trademark “Ocado” or any other trademarks or domain names
+# owned by Ocado Innovation Limited or the Ocado group of companies or any other
+# distinctive brand features of “Ocado” as may be secured from time to time. You
+# must not distribute any modification of this program using the trademark
+# “Ocado” or claim any affiliation or association with Ocado or its employees.
+#
+# You are not authorised to use the name Ocado (or any of its trade names) or
+# the names of any author or contributor in advertising or for publicity purposes
+# pertaining to the distribution of this program, without the prior written
+# authorisation of Ocado.
+#
+# Any propagation, distribution or conveyance of this program must include this
+# copyright notice and these terms. You must not misrepresent the origins of this
+# program; modified versions of the program must be marked as such and not
+# identified as the original program.
+from collections import namedtuple
+
+from portal.utils import using_two_factor
+
+#: Relations loaded along with the user by portal.backends.ModelBackend
+USER_ROLE_RELATIONS = (
+    'userprofile__teacher',
+    'userprofile__student__class_field',
+    'new_teacher',
+    'new_student',
+)
+
+_UserRole = namedtuple('UserRole', ['user', 'profile', 'teacher', 'student', 'class_field',
+                                    'is_authenticated', 'is_two_factor_verified'])
+
+
+class UserRole(_UserRole):
+    '''What a user is allowed to do on the portal, worked out once per request.
+
+    ``is_two_factor_verified`` is True for users without 2FA, and for users with 2FA once they
+    have entered a token.
+    '''
+    __slots__ = ()
+
+    @classmethod
+    def for_user(cls, user):
+        if not user.is_authenticated():
+            return cls(user, None, None, None, None, False, False)
+
+        profile = getattr(user, 'userprofile', None)
+        teacher = getattr(profile, 'teacher', None)
+        student = getattr(profile, 'student', None)
+        class_field = student.class_field if student is not None else None
+        is_two_factor_verified = ((hasattr(user, 'is_verified') and user.is_verified()) or
+                                  not using_two_factor(user))
+
+        return cls(user, profile, teacher, student, class_field, True, is_two_factor_verified)
+
+    @property
+    def is_logged_in(self):
+        return self.is_authenticated and self.is_two_factor_verified
+
+    @property
+    def is_teacher(self):
+        return self.teacher is not None and self.is_two_factor_verified
+
+    @property
+    def is_student(self):
+        return self.student is not None and self.is_logged_in
+
+    @property
+    def is_school_student(self):
+        return self.is_student and self.class_field is not None
+
+    @property
+    def is_independent_student(self):
+        return self.is_student and self.class_field is None
+
+    @property
+    def is_school_user(self):
+        return self.is_teacher or self.is_school_student
+
+    @property
+    def is_developer(self):
+        return self.profile is not None and self.profile.developer
+
+    @property
+    def status(self):
+        if self.is_teacher:
+            return 'TEACHER'
+        elif self.is_school_student:
+            return 'SCHOOL_STUDENT'
+        elif self.is_logged_in:
+            return 'INDEPENDENT_STUDENT'
+        return 'UNTRACKED'
+
+
+def get_user_role(user):
+    '''The role of a user, computed on first use and kept on the user object for the request.'''
+    role = getattr(user, '_portal_user_role', None)
+    if role is None:
+        role = UserRole.for_user(user)
+        user._portal_user_role = role
+    return role
@@ -111,8 +111,39 @@ $(function() {
         openConfirmationBox('deleteClass');
         return false;
     });
+
+    pollPresence();
 });
 
+// Keeps the logged in blobs up to date, reloading the page if the students themselves change.
+// Polls every PRESENCE_POLL_MIN seconds, backing off to PRESENCE_POLL_MAX while nothing changes.
+var PRESENCE_POLL_MIN = 5;
+var PRESENCE_POLL_MAX = 60;
+
+function pollPresence(version, delay) {
+    $.getJSON(PRESENCE_URL, version ? {version: version} : {}).done(function(data) {
+        var students = data.full ? data.students : data.changed;
+        var rosterChanged = !data.full && data.removed.length > 0;
+        $.each(students, function(id, student) {
+            var blob = $('.presence[data-student-id="' + id + '"]');
+            if (blob.length == 0) {
+                rosterChanged = true;
+            }
+            blob.attr('src', student.logged_in ? LOGGED_IN_BLOB : LOGGED_OUT_BLOB);
+            blob.attr('title', student.logged_in ? 'Student logged in' : 'Student logged out');
+        });
+        if (rosterChanged) {
+            window.location.reload();
+            return;
+        }
+        var next = data.version == version ? Math.min((delay || PRESENCE_POLL_MIN) * 2, PRESENCE_POLL_MAX)
+                                           : PRESENCE_POLL_MIN;
+        setTimeout(function() { pollPresence(data.version, next); }, next * 1000);
+    }).fail(function() {
+        setTimeout(function() { pollPresence(version, PRESENCE_POLL_MAX); }, PRESENCE_POLL_MAX * 1000);
+    });
+}
+
 function postSelectedStudents(path) {
     runIfStudentsSelected(function(selectedStudents) {
         post(path, {
@@ -38,6 +38,7 @@ from django.conf import settings
 from django import template
 from django.template.defaultfilters import stringfilter
 from portal.utils import using_two_factor
+from portal.roles import get_user_role
 from portal import beta
 
 register = template.Library()
@@ -53,11 +54,11 @@ def has_2FA(u):
 
 @register.filter(name='is_logged_in')
 def is_logged_in(u):
-    return u.is_authenticated() and (not using_two_factor(u) or (hasattr(u, 'is_verified') and u.is_verified()))
+    return get_user_role(u).is_logged_in
 
 @register.filter
 def is_developer(u):
-    return not u.is_anonymous() and u.userprofile.developer
+    return get_user_role(u).is_developer
 
 @register.filter
 def has_beta_access(request):
@@ -66,11 +67,11 @@ def has_beta_access(request):
 @register.filter(name='make_into_username')
 def make_into_username(u):
     username = ''
-    if hasattr(u, 'userprofile'):
-        if hasattr(u.userprofile, 'student'):
-            username = u.first_name
-        elif hasattr(u.userprofile, 'teacher'):
-            username = u.userprofile.teacher.title + ' ' + u.last_name
+    role = get_user_role(u)
+    if role.student is not None:
+        username = u.first_name
+    elif role.teacher is not None:
+        username = role.teacher.title + ' ' + u.last_name
 
     return username
 
@@ -82,21 +83,23 @@ def truncate(s, max_length=20):
 
 @register.filter(name='is_logged_in_as_teacher')
 def is_logged_in_as_teacher(u):
-    return is_logged_in(u) and u.userprofile and hasattr(u.userprofile, 'teacher')
+    return get_user_role(u).is_teacher
 
 @register.filter(name='has_teacher_finished_onboarding')
 def has_teacher_finished_onboarding(u):
-    teacher = u.userprofile.teacher
-    class_ = teacher.class_()
-    return is_logged_in_as_teacher(u) and teacher.has_school() and class_ is not None and class_.has_students()
+    role = get_user_role(u)
+    if not role.is_teacher or not role.teacher.has_school():
+        return False
+    class_ = role.teacher.class_()
+    return class_ is not None and class_.has_students()
 
 @register.filter(name='is_logged_in_as_student')
 def is_logged_in_as_student(u):
-    return is_logged_in(u) and u.userprofile and hasattr(u.userprofile, 'student')
+    return get_user_role(u).is_student
 
 @register.filter(name='is_logged_in_as_school_user')
 def is_logged_in_as_school_user(u):
-    return is_logged_in(u) and u.userprofile and ((hasattr(u.userprofile, 'student') and u.userprofile.student.class_field != None) or hasattr(u.userprofile, 'teacher'))
+    return get_user_role(u).is_school_user
 
 @register.filter(name='make_title_caps')
 def make_title_caps(s):
@@ -108,16 +111,7 @@ def make_title_caps(s):
 
 @register.filter(name='get_user_status')
 def get_user_status(u):
-    if is_logged_in_as_school_user(u):
-        if is_logged_in_as_teacher(u):
-            return 'TEACHER'
-        else:
-            return 'SCHOOL_STUDENT'
-    elif is_logged_in(u):
-        return 'INDEPENDENT_STUDENT'
-    else:
-        return 'UNTRACKED'
-    return 'UNTRACKED'
+    return get_user_role(u).status
 
 @register.filter(name='cloud_storage')
 @stringfilter
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+# Code for Life
+#
+# Copyright (C) 2016, Ocado Innovation Limited
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ADDITIONAL TERMS – Section 7 GNU General Public Licence
+#
+# This licence does not grant any right, title or interest in any “Ocado” logos,
+# trade names or the trademark “Ocado” or any other trademarks or domain names
+# owned by Ocado Innovation Limited or the Ocado group of companies or any other
+# distinctive brand features of “Ocado” as may be secured from time to time. You
+# must not distribute any modification of this program using the trademark
+# “Ocado” or claim any affiliation or association with Ocado or its employees.
+#
+# You are not authorised to use the name Ocado (or any of its trade names) or
+# the names of any author or contributor in advertising or for publicity purposes
+# pertaining to the distribution of this program, without the prior written
+# authorisation of Ocado.
+#
+# Any propagation, distribution or conveyance of this program must include this
+# copyright notice and these terms. You must not misrepresent the origins of this
+# program; modified versions of the program must be marked as such and not
+# identified as the original program.
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from portal.forms.registration import TeacherPasswordResetForm
+from portal.forms.teach import TeacherEditAccountForm, TeacherLoginForm, TeacherSignupForm
+from portal.models import UserProfile
+from utils.teacher import signup_teacher_directly
+
+
+class TestEmailLookup(TestCase):
+    def setUp(self):
+        self.email, self.password = signup_teacher_directly(email_address='Mixed.Case@Example.com')
+        self.user = User.objects.get(username=self.email)
+
+    def test_column_is_lower_cased(self):
+        self.assertEqual(UserProfile.objects.get(user=self.user).normalised_email, 'mixed.case@example.com')
+
+    def test_column_follows_email_changes(self):
+        self.user.email = 'New@Example.com'
+        self.user.save()
+        self.assertEqual(UserProfile.objects.get(user=self.user).normalised_email, 'new@example.com')
+
+    def test_login_ignores_case(self):
+        form = TeacherLoginForm({'email': 'mixed.case@example.COM', 'password': self.password})
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.user, self.user)
+
+    def test_signup_rejects_email_in_other_case(self):
+        form = TeacherSignupForm({'email': 'MIXED.CASE@example.com'})
+        form.is_valid()
+        self.assertIn('email', form.errors)
+
+    def test_edit_account(self):
+        other_email, _ = signup_teacher_directly()
+        data = {'title': 'Mr', 'first_name': 'Test', 'last_name': 'Teacher', 'current_password': self.password}
+        data['email'] = other_email.upper()
+        self.assertFalse(TeacherEditAccountForm(self.user, data).is_valid())
+        data['email'] = self.email.lower()
+        self.assertTrue(TeacherEditAccountForm(self.user, data).is_valid())
+
+    def test_password_reset(self):
+        form = TeacherPasswordResetForm({'email': 'mixed.case@example.com'})
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.username, self.user.username)
+        self.assertFalse(TeacherPasswordResetForm({'email': 'nobody@example.com'}).is_valid())
+
+    def test_duplicates_resolve_to_the_oldest_account(self):
+        signup_teacher_directly(email_address='MIXED.case@example.com')
+        form = TeacherLoginForm({'email': 'mixed.case@example.com', 'password': self.password})
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.user, self.user)
+        form = TeacherPasswordResetForm({'email': 'mixed.case@example.com'})
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.username, self.user.username)
+
+    def test_profile_save_uses_the_loaded_user(self):
+        profile = UserProfile.objects.select_related('user').get(user=self.user)
+        with self.assertNumQueries(1):
+            profile.save()
+        profile = UserProfile.objects.get(user=self.user)
+        with self.assertNumQueries(1):
+            profile.save(update_fields=['email_verified'])
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+# Code for Life
+#
+# Copyright (C) 2016, Ocado Innovation Limited
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ADDITIONAL TERMS – Section 7 GNU General Public Licence
+#
+# This licence does not grant any right, title or interest in any “Ocado” logos,
+# trade names or the trademark “Ocado” or any other trademarks or domain names
+# owned by Ocado Innovation Limited or the Ocado group of companies or any other
+# distinctive brand features of “Ocado” as may be secured from time to time. You
+# must not distribute any modification of this program using the trademark
+# “Ocado” or claim any affiliation or association with Ocado or its employees.
+#
+# You are not authorised to use the name Ocado (or any of its trade names) or
+# the names of any author or contributor in advertising or for publicity purposes
+# pertaining to the distribution of this program, without the prior written
+# authorisation of Ocado.
+#
+# Any propagation, distribution or conveyance of this program must include this
+# copyright notice and these terms. You must not misrepresent the origins of this
+# program; modified versions of the program must be marked as such and not
+# identified as the original program.
+from datetime import timedelta
+
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import MD5PasswordHasher
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.urlresolvers import reverse
+from django.test import Client, TestCase
+from django.utils import timezone
+from django.utils.six import StringIO
+
+from portal.helpers.emails import generate_token, is_verified
+from portal.models import EmailVerification, UserProfile
+from utils.teacher import signup_teacher_directly
+
+
+class TokenBackend(object):
+    def authenticate(self, token=None, username=None, password=None):
+        if token is not None or password == 'token':
+            return User.objects.get(username=token or username)
+
+
+class CountingHasher(MD5PasswordHasher):
+    algorithm = 'counting'
+    runs = 0
+
+    def encode(self, password, salt):
+        CountingHasher.runs += 1
+        return super(CountingHasher, self).encode(password, salt)
+
+
+class TestEmailVerification(TestCase):
+    def setUp(self):
+        email, self.password = signup_teacher_directly()
+        self.user = User.objects.get(username=email)
+        self.user.email_verifications.all().delete()
+
+    def email_verified(self):
+        return UserProfile.objects.get(user=self.user).email_verified
+
+    def test_verifying_sets_flag(self):
+        self.assertFalse(self.email_verified())
+        verification = generate_token(self.user)
+        response = Client().get(reverse('verify_email', args=[verification.token]))
+        self.assertRedirects(response, reverse('teach'), fetch_redirect_response=False)
+        self.assertTrue(self.email_verified())
+
+    def test_unknown_token(self):
+        response = Client().get(reverse('verify_email', args=['abc123']))
+        self.assertTemplateUsed(response, 'portal/email_verification_failed.html')
+
+    def test_deleting_last_verification_resets_flag(self):
+        generate_token(self.user, preverified=True)
+        self.assertTrue(self.email_verified())
+        self.user.email_verifications.all().delete()
+        self.assertFalse(self.email_verified())
+
+    def test_login_check_needs_no_query(self):
+        generate_token(self.user, preverified=True)
+        user = authenticate(username=self.user.username, password=self.password)
+        with self.assertNumQueries(0):
+            self.assertTrue(is_verified(user))
+
+    def test_wrong_password(self):
+        self.assertIsNone(authenticate(username=self.user.username, password='wrong'))
+
+    def test_wrong_password_is_hashed_once(self):
+        with self.settings(PASSWORD_HASHERS=['portal.tests.test_email_verification.CountingHasher']):
+            self.user.set_password(self.password)
+            self.user.save()
+            for username in (self.user.username, 'nobody'):
+                CountingHasher.runs = 0
+                self.assertIsNone(authenticate(username=username, password='wrong'))
+                self.assertEqual(CountingHasher.runs, 1)
+            self.assertEqual(authenticate(username=self.user.username, password=self.password), self.user)
+
+    def test_other_backends_are_tried(self):
+        backends = ['portal.backends.ModelBackend', 'portal.tests.test_email_verification.TokenBackend']
+        with self.settings(AUTHENTICATION_BACKENDS=backends):
+            self.assertEqual(authenticate(token=self.user.username), self.user)
+            self.assertEqual(authenticate(username=self.user.username, password='token'), self.user)
+
+    def test_purge_expired_tokens(self):
+        expired = generate_token(self.user)
+        expired.expiry = timezone.now() - timedelta(hours=1)
+        expired.save()
+        current = generate_token(self.user)
+        used = generate_token(self.user, preverified=True)
+        used.expiry = timezone.now() - timedelta(hours=1)
+        used.save()
+
+        out = StringIO()
+        call_command('purge_email_verifications', stdout=out)
+        self.assertIn('1 expired tokens deleted', out.getvalue())
+        remaining = EmailVerification.objects.filter(user=self.user).values_list('pk', flat=True)
+        self.assertEqual(sorted(remaining), sorted([current.pk, used.pk]))
+        self.assertTrue(self.email_verified())
@@ -34,10 +34,27 @@
 # copyright notice and these terms. You must not misrepresent the origins of this
 # program; modified versions of the program must be marked as such and not
 # identified as the original program.
+import os
+import shutil
+import smtplib
+import tempfile
+import time
+from datetime import timedelta
+
 from django.test import Client
-from django.test import TestCase
+from django.test import RequestFactory, TestCase
+from django.test.utils import override_settings
 from django.core.urlresolvers import reverse
 from django.core import mail
+from django.core.management import call_command
+from django.core.mail.backends.base import BaseEmailBackend
+from django.utils import timezone
+
+from portal import app_settings
+from portal.emailMessages import emailVerificationNeededEmail, joinRequestPendingEmail
+from portal.helpers.emails import send_batch, send_queued_emails, render_email, render_message_email, \
+    get_compiled_template, VERIFICATION_EMAIL
+from portal.models import QueuedEmail
 
 
 class EmailTest(TestCase):
@@ -46,3 +63,143 @@ class EmailTest(TestCase):
         response = client.get(reverse('send_new_users_report'))
         self.assertEqual(response.status_code, 200)
         self.assertEqual(len(mail.outbox), 1)
+
+
+class FailingBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+
+
+class PickyBackend(BaseEmailBackend):
+    """Refuses mail to bounce@example.com and counts the connections opened."""
+    opened = 0
+    sent = []
+
+    is_open = False
+
+    def open(self):
+        if not self.is_open:
+            self.is_open = True
+            PickyBackend.opened += 1
+
+    def close(self):
+        self.is_open = False
+
+    def send_messages(self, email_messages):
+        for message in email_messages:
+            if 'bounce@example.com' in message.to:
+                raise smtplib.SMTPRecipientsRefused({'bounce@example.com': (550, 'No such user')})
+            PickyBackend.sent.append(message)
+        return len(email_messages)
+
+
+def queue_email(sender, recipients, subject, text_body, html_body=''):
+    return QueuedEmail.objects.create(sender=sender, recipients='\n'.join(recipients), subject=subject,
+                                      text_body=text_body, html_body=html_body)
+
+
+class OutboxTest(TestCase):
+    def setUp(self):
+        self.eager = app_settings.EMAIL_OUTBOX_EAGER
+        app_settings.EMAIL_OUTBOX_EAGER = False
+
+    def tearDown(self):
+        app_settings.EMAIL_OUTBOX_EAGER = self.eager
+
+    def test_views_only_queue(self):
+        client = Client()
+        client.get(reverse('send_new_users_report'))
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(send_queued_emails(), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIsNotNone(QueuedEmail.objects.get().sent)
+        self.assertEqual(send_queued_emails(), (0, 0))
+
+    def test_message_contents(self):
+        queue_email('from@example.com', ['a@example.com', 'b@example.com'], 'Subject', 'Text', '<p>Html</p>')
+        send_queued_emails()
+        message = mail.outbox[0]
+        self.assertEqual(message.to, ['a@example.com', 'b@example.com'])
+        self.assertEqual(message.body, 'Text')
+        self.assertEqual(message.alternatives, [('<p>Html</p>', 'text/html')])
+
+    @override_settings(EMAIL_BACKEND='portal.tests.test_emails.FailingBackend')
+    def test_retries_with_backoff(self):
+        email = queue_email('from@example.com', ['to@example.com'], 'Subject', 'Text')
+        self.assertEqual(send_queued_emails(), (0, 1))
+        email = QueuedEmail.objects.get(pk=email.pk)
+        self.assertEqual(email.attempts, 1)
+        self.assertIn('SMTPServerDisconnected', email.last_error)
+        self.assertGreater(email.send_after, timezone.now())
+        # Not due again until the backoff has passed
+        self.assertEqual(send_queued_emails(), (0, 0))
+
+        for attempt in range(2, app_settings.EMAIL_OUTBOX_MAX_ATTEMPTS + 1):
+            QueuedEmail.objects.filter(pk=email.pk).update(send_after=timezone.now() - timedelta(seconds=1))
+            self.assertEqual(send_queued_emails(), (0, 1))
+        email = QueuedEmail.objects.get(pk=email.pk)
+        self.assertTrue(email.failed)
+        self.assertIsNone(email.sent)
+
+    @override_settings(EMAIL_BACKEND='portal.tests.test_emails.PickyBackend')
+    def test_batch_reports_each_failure(self):
+        PickyBackend.opened = 0
+        PickyBackend.sent = []
+        emails = [queue_email('from@example.com', [to], 'Subject', 'Text')
+                  for to in ['a@example.com', 'bounce@example.com', 'b@example.com']]
+        results = send_batch(emails)
+        self.assertEqual([error is None for _, error in results], [True, False, True])
+        self.assertIsInstance(results[1][1], smtplib.SMTPRecipientsRefused)
+        self.assertEqual([message.to for message in PickyBackend.sent], [['a@example.com'], ['b@example.com']])
+        # Reconnects once, after the failure
+        self.assertEqual(PickyBackend.opened, 2)
+
+    def test_batch_throttle(self):
+        emails = [queue_email('from@example.com', ['to@example.com'], 'Subject', 'Text') for _ in range(3)]
+        start = time.time()
+        send_batch(emails, messages_per_second=20)
+        self.assertGreaterEqual(time.time() - start, 0.1)
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_worker_with_file_stand_in(self):
+        directory = tempfile.mkdtemp()
+        try:
+            email = queue_email('from@example.com', ['to@example.com'], 'Stand-in subject', 'Text')
+            with override_settings(EMAIL_BACKEND='django.core.mail.backends.filebased.EmailBackend',
+                                   EMAIL_FILE_PATH=directory):
+                call_command('send_queued_emails', stdout=open(os.devnull, 'w'))
+            self.assertIsNotNone(QueuedEmail.objects.get(pk=email.pk).sent)
+            files = os.listdir(directory)
+            self.assertEqual(len(files), 1)
+            with open(os.path.join(directory, files[0])) as saved:
+                self.assertIn('Subject: Stand-in subject', saved.read())
+        finally:
+            shutil.rmtree(directory)
+
+
+class RenderingTest(TestCase):
+    def setUp(self):
+        self.request = RequestFactory().get('/', SERVER_NAME='localhost')
+
+    def in_full(self, builder, **fields):
+        message = builder(self.request, **fields)
+        return render_email(VERIFICATION_EMAIL, ['to@example.com'], message['subject'], message['message'])
+
+    def assertSameEmail(self, email, expected):
+        self.assertEqual((email.subject, email.text_body, email.html_body),
+                         (expected.subject, expected.text_body, expected.html_body))
+
+    def test_prepared_matches_full_render(self):
+        for token in ['0123456789abcdef0123456789abcd', 'fedcba9876543210fedcba98765432']:
+            email = render_message_email(VERIFICATION_EMAIL, ['to@example.com'], emailVerificationNeededEmail,
+                                         self.request, token=token)
+            self.assertSameEmail(email, self.in_full(emailVerificationNeededEmail, token=token))
+            self.assertIn(token, email.html_body)
+
+    def test_other_fields_rendered_in_full(self):
+        email = render_message_email(VERIFICATION_EMAIL, ['to@example.com'], joinRequestPendingEmail,
+                                     self.request, pendingAddress='teacher@example.com')
+        self.assertSameEmail(email, self.in_full(joinRequestPendingEmail, pendingAddress='teacher@example.com'))
+
+    def test_templates_compiled_once(self):
+        self.assertIs(get_compiled_template('email.html'), get_compiled_template('email.html'))
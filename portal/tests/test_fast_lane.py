@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+# Code for Life
+#
+# Copyright (C) 2016, Ocado Innovation Limited
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ADDITIONAL TERMS – Section 7 GNU General Public Licence
+#
+# This licence does not grant any right, title or interest in any “Ocado” logos,
+# trade names or the trademark “Ocado” or any other trademarks or domain names
+# owned by Ocado Innovation Limited or the Ocado group of companies or any other
+# distinctive brand features of “Ocado” as may be secured from time to time. You
+# must not distribute any modification of this program using the trademark
+# “Ocado” or claim any affiliation or association with Ocado or its employees.
+#
+# You are not authorised to use the name Ocado (or any of its trade names) or
+# the names of any author or contributor in advertising or for publicity purposes
+# pertaining to the distribution of this program, without the prior written
+# authorisation of Ocado.
+#
+# Any propagation, distribution or conveyance of this program must include this
+# copyright notice and these terms. You must not misrepresent the origins of this
+# program; modified versions of the program must be marked as such and not
+# identified as the original program.
+from django.core.urlresolvers import reverse
+from django.test import TestCase
+
+from portal import app_settings
+
+
+class TestFastLane(TestCase):
+    def test_json_endpoints_skip_page_middleware(self):
+        response = self.client.get(reverse('organisation_fuzzy_lookup'), {'fuzzy_name': 'school'})
+        self.assertEqual(response.status_code, 200)
+        request = response.wsgi_request
+        self.assertTrue(request.fast_lane)
+        self.assertFalse(hasattr(request, 'toolbar'))
+        self.assertTrue(hasattr(request, 'user'))
+
+    def test_pages_get_everything(self):
+        request = self.client.get(reverse('teach')).wsgi_request
+        self.assertFalse(request.fast_lane)
+        self.assertTrue(hasattr(request, 'toolbar'))
+
+    def test_fast_lane_urls_setting(self):
+        original = app_settings.FAST_LANE_URLS
+        app_settings.FAST_LANE_URLS = ()
+        try:
+            request = self.client.get(reverse('organisation_fuzzy_lookup')).wsgi_request
+        finally:
+            app_settings.FAST_LANE_URLS = original
+        self.assertTrue(hasattr(request, 'toolbar'))
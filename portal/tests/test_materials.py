@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+# Code for Life
+#
+# Copyright (C) 2016, Ocado Innovation Limited
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ADDITIONAL TERMS – Section 7 GNU General Public Licence
+#
+# This licence does not grant any right, title or interest in any “Ocado” logos,
+# trade names or the trademark “Ocado” or any other trademarks or domain names
+# owned by Ocado Innovation Limited or the Ocado group of companies or any other
+# distinctive brand features of “Ocado” as may be secured from time to time. You
+# must not distribute any modification of this program using the trademark
+# “Ocado” or claim any affiliation or association with Ocado or its employees.
+#
+# You are not authorised to use the name Ocado (or any of its trade names) or
+# the names of any author or contributor in advertising or for publicity purposes
+# pertaining to the distribution of this program, without the prior written
+# authorisation of Ocado.
+#
+# Any propagation, distribution or conveyance of this program must include this
+# copyright notice and these terms. You must not misrepresent the origins of this
+# program; modified versions of the program must be marked as such and not
+# identified as the original program.
+import os
+import shutil
+import tempfile
+import zipfile
+
+from django.core.urlresolvers import reverse
+from django.test import Client, TestCase
+
+from portal import app_settings
+from portal.helpers import materials
+from utils.teacher import signup_teacher_directly
+
+PDF_DATA = {
+    "ks1_session_1": {
+        "title": "KS1 - Session 1",
+        "description": "Session one.",
+        "links": ["KS1_S1_1"],
+        "url": "KS1/lesson_plans/s1.pdf",
+        "page_origin": "#ks1-sessions"
+    },
+    "KS1_S1_1": {
+        "title": "KS1 - Session 1 - Sheet 1",
+        "description": "Sheet one.",
+        "links": ["ks1_session_1"],
+        "url": "KS1/resource_sheets/s1_1.pdf",
+        "page_origin": "#ks1-resource-sheets"
+    },
+    "uks2_session_1": {
+        "title": "Upper KS2 - Session 1",
+        "description": "Python session one.",
+        "links": None,
+        "url": "python/lesson_plans/UKS2-S1.pdf",
+        "page_origin": "#uks2-sessions"
+    },
+}
+
+
+class TestMaterialsIndex(TestCase):
+    def setUp(self):
+        self.source_dir = tempfile.mkdtemp()
+        self.build_dir = tempfile.mkdtemp()
+        self.old_build_dir = app_settings.MATERIALS_BUILD_DIR
+        app_settings.MATERIALS_BUILD_DIR = self.build_dir
+        for path in ['KS1/lesson_plans/s1.pdf', 'KS1/resource_sheets/s1_1.pdf',
+                     'UKS2_Python/UKS2_lesson_plans/UKS2-S1.pdf']:
+            self.write_source(path, path)
+
+    def tearDown(self):
+        app_settings.MATERIALS_BUILD_DIR = self.old_build_dir
+        materials._index = None
+        shutil.rmtree(self.source_dir)
+        shutil.rmtree(self.build_dir)
+
+    def write_source(self, path, content):
+        path = os.path.join(self.source_dir, path)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'wb') as f:
+            f.write(content)
+
+    def build(self):
+        return materials.build(PDF_DATA, self.source_dir, self.build_dir)
+
+    def test_link_titles(self):
+        self.assertEqual(materials.link_title('ks1_session_1'), 'KS1 Session 1')
+        self.assertEqual(materials.link_title('uks2_assets'), 'UKS2 Assets')
+        self.assertEqual(materials.link_title('levels_guide_51-109'), 'Levels Guide 51-109')
+
+    def test_index_resolves_sources(self):
+        index = materials.build_index(PDF_DATA, self.source_dir)
+        material = index['materials']['uks2_session_1']
+        self.assertEqual(material['source'], 'UKS2_Python/UKS2_lesson_plans/UKS2-S1.pdf')
+        self.assertEqual(material['key_stage'], 'UKS2_Python')
+        self.assertEqual(material['size'], len(material['source']))
+        self.assertEqual(index['materials']['ks1_session_1']['links'], [('KS1_S1_1', 'KS1 S1 1')])
+
+    def test_bundles_only_rebuilt_when_sources_change(self):
+        self.assertEqual(self.build(), ['KS1', 'KS2', 'UKS2_Python'])
+        with zipfile.ZipFile(os.path.join(self.build_dir, 'KS1.zip')) as bundle:
+            self.assertEqual(sorted(bundle.namelist()),
+                             ['KS1/lesson_plans/s1.pdf', 'KS1/resource_sheets/s1_1.pdf'])
+
+        self.assertEqual(self.build(), [])
+
+        self.write_source('KS1/resource_sheets/s1_1.pdf', 'changed')
+        self.assertEqual(self.build(), ['KS1'])
+
+    def test_bundle_download(self):
+        email, password = signup_teacher_directly()
+        c = Client()
+        assert c.login(username=email, password=password)
+        url = reverse('materials_bundle', kwargs={'key_stage': 'KS1'})
+
+        materials._index = None
+        self.assertEqual(c.get(url).status_code, 302)
+
+        materials.build(source_dir=self.source_dir, build_dir=self.build_dir)
+        response = c.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+
+        self.assertEqual(c.get(reverse('materials_bundle', kwargs={'key_stage': 'KS3'})).status_code, 404)
+
+    def test_viewer(self):
+        email, password = signup_teacher_directly()
+        c = Client()
+        assert c.login(username=email, password=password)
+        response = c.get(reverse('materials_viewer', kwargs={'pdf_name': 'ks1_session_1'}))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'KS1 S1 1')
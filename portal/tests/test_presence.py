@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+# Code for Life
+#
+# Copyright (C) 2016, Ocado Innovation Limited
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ADDITIONAL TERMS – Section 7 GNU General Public Licence
+#
+# This licence does not grant any right, title or interest in any “Ocado” logos,
+# trade names or the trademark “Ocado” or any other trademarks or domain names
+# owned by Ocado Innovation Limited or the Ocado group of companies or any other
+# distinctive brand features of “Ocado” as may be secured from time to time. You
+# must not distribute any modification of this program using the trademark
+# “Ocado” or claim any affiliation or association with Ocado or its employees.
+#
+# You are not authorised to use the name Ocado (or any of its trade names) or
+# the names of any author or contributor in advertising or for publicity purposes
+# pertaining to the distribution of this program, without the prior written
+# authorisation of Ocado.
+#
+# Any propagation, distribution or conveyance of this program must include this
+# copyright notice and these terms. You must not misrepresent the origins of this
+# program; modified versions of the program must be marked as such and not
+# identified as the original program.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.test import Client, TestCase
+
+from portal import app_settings, presence
+from utils.classes import create_class_directly
+from utils.student import create_school_student_directly
+from utils.teacher import signup_teacher_directly
+
+
+class TestPresence(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_writes_are_coalesced(self):
+        self.assertTrue(presence.record_seen(1, now=1000))
+        self.assertFalse(presence.record_seen(1, now=1000 + app_settings.PRESENCE_UPDATE_INTERVAL - 1))
+        self.assertEqual(presence.last_seen([1]), {1: 1000})
+        self.assertTrue(presence.record_seen(1, now=1000 + app_settings.PRESENCE_UPDATE_INTERVAL))
+
+    def test_idle_users_are_not_active(self):
+        presence.record_seen(1, now=1000)
+        presence.record_seen(2, now=1000 + app_settings.PRESENCE_IDLE_AFTER)
+        now = 1001 + app_settings.PRESENCE_IDLE_AFTER
+        self.assertEqual(presence.active_user_ids([1, 2, 3], now=now), set([2]))
+
+    def test_logged_in_students(self):
+        email, _ = signup_teacher_directly()
+        klass, _, access_code = create_class_directly(email)
+        _, _, online = create_school_student_directly(access_code)
+        create_school_student_directly(access_code)
+        presence.record_seen(online.new_user.pk)
+        self.assertEqual(list(klass.get_logged_in_students()), [online])
+
+    def test_middleware_records_requests(self):
+        email, password = signup_teacher_directly()
+        c = Client()
+        c.login(username=email, password=password)
+        c.get(reverse('teacher_home'))
+        user = User.objects.get(username=email)
+        self.assertIn(user.pk, presence.active_user_ids([user.pk]))
+
+    def test_logout_clears_presence(self):
+        email, password = signup_teacher_directly()
+        c = Client()
+        c.login(username=email, password=password)
+        c.get(reverse('teacher_home'))
+        user = User.objects.get(username=email)
+        c.logout()
+        self.assertEqual(presence.active_user_ids([user.pk]), set())
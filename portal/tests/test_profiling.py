@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+# Code for Life
+#
+# Copyright (C) 2016, Ocado Innovation Limited
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ADDITIONAL TERMS – Section 7 GNU General Public Licence
+#
+# This licence does not grant any right, title or interest in any “Ocado” logos,
+# trade names or the trademark “Ocado” or any other trademarks or domain names
+# owned by Ocado Innovation Limited or the Ocado group of companies or any other
+# distinctive brand features of “Ocado” as may be secured from time to time. You
+# must not distribute any modification of this program using the trademark
+# “Ocado” or claim any affiliation or association with Ocado or its employees.
+#
+# You are not authorised to use the name Ocado (or any of its trade names) or
+# the names of any author or contributor in advertising or for publicity purposes
+# pertaining to the distribution of this program, without the prior written
+# authorisation of Ocado.
+#
+# Any propagation, distribution or conveyance of this program must include this
+# copyright notice and these terms. You must not misrepresent the origins of this
+# program; modified versions of the program must be marked as such and not
+# identified as the original program.
+import json
+import logging
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.urlresolvers import reverse
+from django.template import Context, Template
+from django.test import TestCase
+from django.test.client import Client
+
+from portal import app_settings, profiling
+from portal.middleware.profiling import ProfilingMiddleware
+from utils.organisation import create_organisation_directly
+from utils.teacher import signup_teacher_directly
+
+
+class RecordingHandler(logging.Handler):
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(json.loads(record.getMessage()))
+
+
+class TestProfiling(TestCase):
+    def setUp(self):
+        cache.delete(profiling.SUMMARY_CACHE_KEY)
+        self.original_rate = app_settings.PROFILING_SAMPLE_RATE
+        app_settings.PROFILING_SAMPLE_RATE = 1
+        self.handler = RecordingHandler()
+        self.logger = logging.getLogger('portal.profiling')
+        self.original_handlers, self.logger.handlers = self.logger.handlers, [self.handler]
+        # A new client so its handler loads the middleware with profiling on
+        self.client = Client()
+
+    def tearDown(self):
+        app_settings.PROFILING_SAMPLE_RATE = self.original_rate
+        self.logger.handlers = self.original_handlers
+
+    def test_off_by_default(self):
+        app_settings.PROFILING_SAMPLE_RATE = 0
+        self.assertRaises(MiddlewareNotUsed, ProfilingMiddleware)
+
+    def test_sql_shape(self):
+        self.assertEqual(profiling.sql_shape("QUERY = u'SELECT * FROM t WHERE a = %s' - PARAMS = (12,)"),
+                         "SELECT * FROM t WHERE a = ?")
+        self.assertEqual(profiling.sql_shape("SELECT * FROM t WHERE a = 12 AND b = 'it''s' AND c IN (1, 2, 3)"),
+                         "SELECT * FROM t WHERE a = ? AND b = ? AND c IN (...)")
+        queries = [{'sql': 'SELECT 1 FROM t WHERE id = %d' % i, 'time': '0.001'} for i in range(3)]
+        self.assertEqual(profiling.repeated_queries(queries), [('SELECT ? FROM t WHERE id = ?', 3)])
+        self.assertEqual(profiling.repeated_queries(queries, more_than=3), [])
+
+    def test_timed_counts_nested_calls_once(self):
+        @profiling.timed('work')
+        def work(depth):
+            if depth:
+                work(depth - 1)
+
+        work(2)  # Nothing is being profiled, so nothing to add to
+
+        profile = profiling.Profile()
+        profile.start()
+        try:
+            work(2)
+            cache.set('profiled', 1)
+            cache.get('profiled')
+            cache.get('missing')
+            # LocMemCache builds these out of get and set, which mustn't be counted again
+            cache.get_many(['profiled', 'missing'])
+            cache.set_many({'a': 1, 'b': 2})
+            Template('{{ a }}').render(Context({'a': 1}))
+        finally:
+            profile.stop()
+        record = profile.as_dict()
+        self.assertGreater(profile.timings['work'], 0)
+        self.assertFalse(profile._depth['work'])
+        self.assertEqual(record['cache'], {'gets': 4, 'hits': 2, 'sets': 3})
+        self.assertNotIn('get', profiling.caches['default'].__dict__)
+
+    def test_profiled_request(self):
+        email, password = signup_teacher_directly()
+        create_organisation_directly(email)
+        self.client.login(username=email, password=password)
+        response = self.client.get(reverse('teacher_classes'))
+        self.assertEqual(response.status_code, 200)
+
+        record = self.handler.records[-1]
+        self.assertEqual(record['view'], 'teacher_classes')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['sql']['count'], 0)
+        self.assertGreater(record['template_ms'], 0)
+        self.assertIn('ratelimit_ms', record)
+        self.assertIn('send_email_ms', record)
+
+        views = dict(profiling.slowest_views())
+        self.assertEqual(views['teacher_classes']['requests'], 1)
+
+    def test_summary_is_staff_only(self):
+        email, password = signup_teacher_directly()
+        create_organisation_directly(email)
+        self.client.login(username=email, password=password)
+        response = self.client.get(reverse('profiling_summary'))
+        self.assertEqual(response.status_code, 302)
+
+        User.objects.filter(email=email).update(is_staff=True)
+        self.client.get(reverse('teacher_classes'))
+        response = self.client.get(reverse('profiling_summary'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'teacher_classes')
+        self.assertContains(response, 'Duplicate queries')
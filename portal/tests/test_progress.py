@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+# Code for Life
+#
+# Copyright (C) 2016, Ocado Innovation Limited
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ADDITIONAL TERMS – Section 7 GNU General Public Licence
+#
+# This licence does not grant any right, title or interest in any “Ocado” logos,
+# trade names or the trademark “Ocado” or any other trademarks or domain names
+# owned by Ocado Innovation Limited or the Ocado group of companies or any other
+# distinctive brand features of “Ocado” as may be secured from time to time. You
+# must not distribute any modification of this program using the trademark
+# “Ocado” or claim any affiliation or association with Ocado or its employees.
+#
+# You are not authorised to use the name Ocado (or any of its trade names) or
+# the names of any author or contributor in advertising or for publicity purposes
+# pertaining to the distribution of this program, without the prior written
+# authorisation of Ocado.
+#
+# Any propagation, distribution or conveyance of this program must include this
+# copyright notice and these terms. You must not misrepresent the origins of this
+# program; modified versions of the program must be marked as such and not
+# identified as the original program.
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from game.models import Attempt, Level
+
+from portal import handlers
+from portal.models import StudentProgress, ClassProgress
+from utils.classes import create_class_directly
+from utils.student import create_school_student_directly
+from utils.teacher import signup_teacher_directly
+
+
+class TestProgress(TestCase):
+    def setUp(self):
+        email, _ = signup_teacher_directly()
+        self.klass, _, access_code = create_class_directly(email)
+        _, _, self.student = create_school_student_directly(access_code)
+        _, _, self.classmate = create_school_student_directly(access_code)
+        self.level, self.other_level = Level.objects.order_by('id')[:2]
+
+    def play(self, student, level, score):
+        '''Saves attempts the way the game does when a level is finished.'''
+        attempt = Attempt.objects.create(student=student, level=level, score=None)
+        attempt.score = score
+        attempt.finish_time = timezone.now()
+        attempt.save()
+        return attempt
+
+    def progress(self, student):
+        return StudentProgress.objects.get(student=student)
+
+    def test_student_progress(self):
+        self.play(self.student, self.level, 10)
+        self.play(self.student, self.level, 5)
+        Attempt.objects.create(student=self.student, level=self.other_level, score=None)
+        progress = self.progress(self.student)
+        self.assertEqual((progress.attempts, progress.levels_attempted, progress.levels_completed), (3, 2, 1))
+        self.assertEqual(progress.total_score, 10)
+
+        self.play(self.student, self.other_level, 20)
+        progress = self.progress(self.student)
+        self.assertEqual((progress.attempts, progress.levels_attempted, progress.levels_completed), (4, 2, 2))
+        self.assertEqual(progress.total_score, 30)
+        self.assertIsNotNone(progress.last_activity)
+
+    def test_resaving_an_attempt_is_cheap(self):
+        attempt = self.play(self.student, self.level, 10)
+        attempt.is_best_attempt = True
+        # The attempt, its level's progress and the savepoint around the progress
+        with self.assertNumQueries(4):
+            attempt.save()
+
+    def test_resaving_a_student_is_cheap(self):
+        self.play(self.student, self.level, 10)
+        with CaptureQueriesContext(connection) as queries:
+            self.student.save()
+        self.assertFalse([query for query in queries if 'studentprogress' in query['sql']])
+
+    def test_failed_or_abandoned_attempts_are_not_completions(self):
+        self.play(self.student, self.level, 0)
+        attempt = Attempt.objects.create(student=self.student, level=self.other_level, score=None)
+        attempt.finish_time = timezone.now()
+        attempt.save()
+        progress = self.progress(self.student)
+        self.assertEqual((progress.attempts, progress.levels_attempted, progress.levels_completed), (2, 2, 0))
+
+    def test_unfinished_scores_agree_with_rebuild(self):
+        Attempt.objects.create(student=self.student, level=self.level, score=10)
+        self.play(self.student, self.other_level, 20)
+        fields = ('attempts', 'levels_attempted', 'levels_completed', 'total_score')
+        incremental = [getattr(self.progress(self.student), field) for field in fields]
+        self.assertEqual(incremental, [2, 2, 1, 30])
+        StudentProgress.objects.all().delete()
+        call_command('rebuild_progress', stdout=open('/dev/null', 'w'))
+        self.assertEqual([getattr(self.progress(self.student), field) for field in fields], incremental)
+
+    def test_progress_errors_dont_stop_attempts_saving(self):
+        original = handlers.record_attempt
+
+        def broken(attempt, created):
+            StudentProgress.objects.filter(student=self.student).update(attempts=1)
+            raise ValueError
+        handlers.record_attempt = broken
+        try:
+            self.play(self.student, self.level, 10)
+        finally:
+            handlers.record_attempt = original
+        self.assertEqual(Attempt.objects.filter(student=self.student).count(), 1)
+        # The failed update was rolled back
+        self.assertFalse(StudentProgress.objects.filter(student=self.student, attempts=1).exists())
+
+    def test_class_progress(self):
+        self.play(self.student, self.level, 10)
+        self.play(self.classmate, self.level, 4)
+        self.play(self.classmate, self.other_level, 6)
+        progress = ClassProgress.objects.get(klass=self.klass)
+        self.assertEqual((progress.students_started, progress.attempts, progress.levels_attempted), (2, 3, 3))
+        self.assertEqual(progress.total_score, 20)
+
+        self.classmate.delete()
+        progress = ClassProgress.objects.get(klass=self.klass)
+        self.assertEqual((progress.students_started, progress.attempts, progress.total_score), (1, 1, 10))
+
+    def test_moving_class(self):
+        self.play(self.student, self.level, 10)
+        email, _ = signup_teacher_directly()
+        other_class, _, _ = create_class_directly(email)
+        self.student.class_field = other_class
+        self.student.save()
+        self.assertEqual(ClassProgress.objects.get(klass=self.klass).students_started, 0)
+        self.assertEqual(ClassProgress.objects.get(klass=other_class).total_score, 10)
+
+    def test_rebuild(self):
+        self.play(self.student, self.level, 10)
+        StudentProgress.objects.all().delete()
+        ClassProgress.objects.all().delete()
+        call_command('rebuild_progress', stdout=open('/dev/null', 'w'))
+        self.assertEqual(self.progress(self.student).total_score, 10)
+        self.assertEqual(ClassProgress.objects.get(klass=self.klass).students_started, 1)
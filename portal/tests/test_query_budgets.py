@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+# Code for Life
+#
+# Copyright (C) 2016, Ocado Innovation Limited
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ADDITIONAL TERMS – Section 7 GNU General Public Licence
+#
+# This licence does not grant any right, title or interest in any “Ocado” logos,
+# trade names or the trademark “Ocado” or any other trademarks or domain names
+# owned by Ocado Innovation Limited or the Ocado group of companies or any other
+# distinctive brand features of “Ocado” as may be secured from time to time. You
+# must not distribute any modification of this program using the trademark
+# “Ocado” or claim any affiliation or association with Ocado or its employees.
+#
+# You are not authorised to use the name Ocado (or any of its trade names) or
+# the names of any author or contributor in advertising or for publicity purposes
+# pertaining to the distribution of this program, without the prior written
+# authorisation of Ocado.
+#
+# Any propagation, distribution or conveyance of this program must include this
+# copyright notice and these terms. You must not misrepresent the origins of this
+# program; modified versions of the program must be marked as such and not
+# identified as the original program.
+import json
+
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.test import TestCase
+from django.test.client import Client
+
+from portal import presence
+from portal.models import School
+from utils.classes import create_class_directly
+from utils.organisation import create_organisation_directly, join_teacher_to_organisation
+from utils.queries import QueryBudget
+from utils.student import create_school_student_directly
+from utils.teacher import signup_teacher_directly
+
+# Each view is requested with SMALL and then LARGE of the rows it lists, and must run the same
+# number of queries both times, within its budget.
+SMALL = 2
+LARGE = 12
+
+
+class TestQueryBudgets(TestCase):
+    def setUp(self):
+        cache.clear()
+        email, password = signup_teacher_directly()
+        self.school_name, self.postcode = create_organisation_directly(email, name='Budget School')
+        self.klass, _, self.access_code = create_class_directly(email)
+        self.client = Client()
+        self.client.login(username=email, password=password)
+
+    def count_queries(self, budget, request):
+        with QueryBudget(self, budget) as queries:
+            response = request()
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def assertConstantQueries(self, budget, seed, request):
+        seed(SMALL)
+        request()  # The first request after logging in fills caches the others share
+        small = self.count_queries(budget, request)
+        seed(LARGE - SMALL)
+        large = self.count_queries(budget, request)
+        self.assertEqual(small, large, '%d queries with %d rows, %d with %d' % (small, SMALL, large, LARGE))
+
+    def add_students(self, count):
+        for _ in range(count):
+            _, _, student = create_school_student_directly(self.access_code)
+            if student.id % 2:
+                presence.record_seen(student.new_user_id)
+
+    def add_schools(self, count):
+        for _ in range(count):
+            email, _ = signup_teacher_directly()
+            name, postcode = create_organisation_directly(email, name='Budget Academy %d' % School.objects.count())
+            # Every school has teachers besides its admin
+            colleague, _ = signup_teacher_directly()
+            join_teacher_to_organisation(colleague, name, postcode)
+
+    def add_colleague_classes(self, count):
+        for _ in range(count):
+            email, _ = signup_teacher_directly()
+            join_teacher_to_organisation(email, self.school_name, self.postcode)
+            create_class_directly(email)
+            # Classes in other schools aren't offered
+            email, _ = signup_teacher_directly()
+            create_organisation_directly(email)
+            create_class_directly(email)
+
+    def test_teacher_class(self):
+        url = reverse('teacher_class', args=[self.access_code])
+        self.assertConstantQueries(8, self.add_students, lambda: self.client.get(url))
+
+    def test_organisation_fuzzy_lookup(self):
+        url = reverse('organisation_fuzzy_lookup')
+
+        self.assertConstantQueries(4, self.add_schools, lambda: self.client.get(url, {'fuzzy_name': 'budget'}))
+        schools = json.loads(self.client.get(url, {'fuzzy_name': 'academy'}).content)
+        self.assertEqual(len(schools), LARGE)
+        self.assertTrue(all(school['admin_domain'].endswith('@codeforlife.com') for school in schools))
+
+    def test_teacher_move_students(self):
+        url = reverse('teacher_move_students', args=[self.access_code])
+        self.assertConstantQueries(8, self.add_colleague_classes, lambda: self.client.post(url))
+        response = self.client.post(url)
+        self.assertEqual(len(response.context['form'].fields['new_class'].choices), LARGE)
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+# Code for Life
+#
+# Copyright (C) 2016, Ocado Innovation Limited
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ADDITIONAL TERMS – Section 7 GNU General Public Licence
+#
+# This licence does not grant any right, title or interest in any “Ocado” logos,
+# trade names or the trademark “Ocado” or any other trademarks or domain names
+# owned by Ocado Innovation Limited or the Ocado group of companies or any other
+# distinctive brand features of “Ocado” as may be secured from time to time. You
+# must not distribute any modification of this program using the trademark
+# “Ocado” or claim any affiliation or association with Ocado or its employees.
+#
+# You are not authorised to use the name Ocado (or any of its trade names) or
+# the names of any author or contributor in advertising or for publicity purposes
+# pertaining to the distribution of this program, without the prior written
+# authorisation of Ocado.
+#
+# Any propagation, distribution or conveyance of this program must include this
+# copyright notice and these terms. You must not misrepresent the origins of this
+# program; modified versions of the program must be marked as such and not
+# identified as the original program.
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.urlresolvers import reverse
+from django.test import Client, TestCase
+
+from portal.backends import ModelBackend
+from portal.roles import get_user_role
+from portal.templatetags import app_tags
+from utils.classes import create_class_directly
+from utils.student import create_school_student_directly
+from utils.teacher import signup_teacher_directly
+
+
+class TestUserRole(TestCase):
+    def user_pk(self, username):
+        return User.objects.get(username=username).pk
+
+    def test_teacher_role_loaded_in_one_query(self):
+        email, _ = signup_teacher_directly()
+        pk = self.user_pk(email)
+        with self.assertNumQueries(1):
+            user = ModelBackend().get_user(pk)
+            role = get_user_role(user)
+            self.assertTrue(role.is_teacher)
+            self.assertFalse(role.is_student)
+            self.assertEqual(app_tags.get_user_status(user), 'TEACHER')
+            self.assertEqual(app_tags.make_into_username(user), 'Mr Teacher')
+            self.assertEqual(user.new_teacher, role.teacher)
+
+    def test_school_student_role_loaded_in_one_query(self):
+        email, _ = signup_teacher_directly()
+        klass, _, access_code = create_class_directly(email)
+        _, _, student = create_school_student_directly(access_code)
+        pk = self.user_pk(student.new_user.username)
+        with self.assertNumQueries(1):
+            user = ModelBackend().get_user(pk)
+            role = get_user_role(user)
+            self.assertTrue(role.is_school_student)
+            self.assertTrue(app_tags.is_logged_in_as_school_user(user))
+            self.assertEqual(role.class_field, klass)
+
+    def test_anonymous_role(self):
+        role = get_user_role(AnonymousUser())
+        self.assertFalse(role.is_logged_in)
+        self.assertEqual(role.status, 'UNTRACKED')
+
+    def test_role_is_immutable(self):
+        role = get_user_role(AnonymousUser())
+        with self.assertRaises(AttributeError):
+            role.teacher = None
+
+    def test_request_role(self):
+        email, password = signup_teacher_directly()
+        c = Client()
+        assert c.login(username=email, password=password)
+        response = c.get(reverse('current_user'))
+        self.assertRedirects(response, reverse('teacher_home'), fetch_redirect_response=False)
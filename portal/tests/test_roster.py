@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+# Code for Life
+#
+# Copyright (C) 2016, Ocado Innovation Limited
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ADDITIONAL TERMS – Section 7 GNU General Public Licence
+#
+# This licence does not grant any right, title or interest in any “Ocado” logos,
+# trade names or the trademark “Ocado” or any other trademarks or domain names
+# owned by Ocado Innovation Limited or the Ocado group of companies or any other
+# distinctive brand features of “Ocado” as may be secured from time to time. You
+# must not distribute any modification of this program using the trademark
+# “Ocado” or claim any affiliation or association with Ocado or its employees.
+#
+# You are not authorised to use the name Ocado (or any of its trade names) or
+# the names of any author or contributor in advertising or for publicity purposes
+# pertaining to the distribution of this program, without the prior written
+# authorisation of Ocado.
+#
+# Any propagation, distribution or conveyance of this program must include this
+# copyright notice and these terms. You must not misrepresent the origins of this
+# program; modified versions of the program must be marked as such and not
+# identified as the original program.
+import json
+
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.test import Client, TestCase
+
+from portal import presence
+from portal.forms.play import StudentLoginForm
+from portal.models import Class, Student
+from utils.classes import create_class_directly
+from utils.student import create_school_student_directly
+from utils.teacher import signup_teacher_directly
+
+
+class TestClassPresence(TestCase):
+    def setUp(self):
+        cache.clear()
+        email, password = signup_teacher_directly()
+        _, _, self.access_code = create_class_directly(email)
+        _, _, self.student = create_school_student_directly(self.access_code)
+        self.client = Client()
+        self.client.login(username=email, password=password)
+
+    def poll(self, **params):
+        response = self.client.get(reverse('teacher_class_presence', args=[self.access_code]), params)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def test_full_then_delta(self):
+        data = self.poll()
+        self.assertTrue(data['full'])
+        student_id = str(self.student.id)
+        self.assertFalse(data['students'][student_id]['logged_in'])
+
+        unchanged = self.poll(version=data['version'])
+        self.assertEqual(unchanged['version'], data['version'])
+        self.assertEqual(unchanged['changed'], {})
+
+        presence.record_seen(self.student.new_user.pk)
+        changed = self.poll(version=data['version'])
+        self.assertFalse(changed['full'])
+        self.assertNotEqual(changed['version'], data['version'])
+        self.assertTrue(changed['changed'][student_id]['logged_in'])
+        self.assertEqual(changed['removed'], [])
+
+    def test_removed_student(self):
+        data = self.poll()
+        student_id = str(self.student.id)
+        self.student.delete()
+        changed = self.poll(version=data['version'])
+        self.assertEqual(changed['removed'], [student_id])
+
+    def test_unknown_version_gets_everything(self):
+        self.assertTrue(self.poll(version='unknown')['full'])
+        self.assertTrue(self.poll(version='0123456789abcdef')['full'])
+        # Not a version, so never made into a cache key
+        self.assertTrue(self.poll(version='x' * 300 + ' \n')['full'])
+
+    def test_other_teachers_class(self):
+        email, password = signup_teacher_directly()
+        c = Client()
+        c.login(username=email, password=password)
+        response = c.get(reverse('teacher_class_presence', args=[self.access_code]))
+        self.assertEqual(response.status_code, 404)
+
+
+class TestStudentLogin(TestCase):
+    def setUp(self):
+        cache.clear()
+        email, _ = signup_teacher_directly()
+        _, _, self.access_code = create_class_directly(email)
+        self.name, self.password, self.student = create_school_student_directly(self.access_code)
+
+    def form(self, name=None, access_code=None, password=None):
+        form = StudentLoginForm(data={'name': name or self.name,
+                                      'access_code': access_code or self.access_code,
+                                      'password': password or self.password})
+        form.is_valid()
+        return form
+
+    def test_login_matches_case_insensitively(self):
+        form = self.form(name=' %s ' % self.name.upper(), access_code=self.access_code.lower())
+        self.assertEqual(form.errors, {})
+        self.assertEqual(form.user.pk, self.student.new_user.pk)
+        self.assertEqual(form.student, self.student)
+
+    def test_class_logging_in_reads_cached_names(self):
+        self.form()
+        with self.assertNumQueries(1):
+            form = self.form()
+        self.assertEqual(form.errors, {})
+
+    def test_wrong_details(self):
+        self.assertFalse(self.form(password='wrong').is_valid())
+        self.assertFalse(self.form(name='nobody').is_valid())
+        self.assertFalse(self.form(access_code='ZZ999').is_valid())
+
+    def test_new_and_renamed_students(self):
+        self.form()
+        name, password, _ = create_school_student_directly(self.access_code)
+        self.assertEqual(self.form(name=name, password=password).errors, {})
+
+        user = self.student.new_user
+        user.first_name = 'Renamed'
+        user.save()
+        self.assertFalse(self.form().is_valid())
+        self.assertEqual(self.form(name='renamed').errors, {})
+
+    def test_students_sharing_a_name(self):
+        klass = Class.objects.get(access_code=self.access_code)
+        Student.objects.schoolFactory(klass, self.name, self.password)
+        self.assertFalse(self.form().is_valid())
+
+    def test_moved_student(self):
+        self.form()
+        email, _ = signup_teacher_directly()
+        _, _, other_code = create_class_directly(email)
+        # Moving a student with update() skips the signals that clear the cached names
+        Student.objects.filter(pk=self.student.pk).update(
+            class_field=Class.objects.get(access_code=other_code))
+        self.assertFalse(self.form().is_valid())
+        self.assertEqual(self.form(access_code=other_code).errors, {})
+
+    def test_access_codes_are_stored_upper_case(self):
+        klass = Class.objects.get(access_code=self.access_code)
+        klass.access_code = klass.access_code.lower()
+        klass.save()
+        self.assertEqual(Class.objects.get(pk=klass.pk).access_code, self.access_code)
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+# Code for Life
+#
+# Copyright (C) 2016, Ocado Innovation Limited
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ADDITIONAL TERMS – Section 7 GNU General Public Licence
+#
+# This licence does not grant any right, title or interest in any “Ocado” logos,
+# trade names or the trademark “Ocado” or any other trademarks or domain names
+# owned by Ocado Innovation Limited or the Ocado group of companies or any other
+# distinctive brand features of “Ocado” as may be secured from time to time. You
+# must not distribute any modification of this program using the trademark
+# “Ocado” or claim any affiliation or association with Ocado or its employees.
+#
+# You are not authorised to use the name Ocado (or any of its trade names) or
+# the names of any author or contributor in advertising or for publicity purposes
+# pertaining to the distribution of this program, without the prior written
+# authorisation of Ocado.
+#
+# Any propagation, distribution or conveyance of this program must include this
+# copyright notice and these terms. You must not misrepresent the origins of this
+# program; modified versions of the program must be marked as such and not
+# identified as the original program.
+import game.messages as messages
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.test import Client, TestCase
+from django.utils import translation
+
+from game.models import Episode, Level
+from portal.helpers.level_titles import get_level_title, level_titles
+from portal.views.teacher.solutions_level_selector import fetch_episode_data, \
+    fetch_episode_data_from_database
+from utils.teacher import signup_teacher_directly
+
+
+class TestSolutionsLevelSelector(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_episode_data_loaded_in_two_queries(self):
+        with self.assertNumQueries(2):
+            episode_data = fetch_episode_data_from_database(early_access=True)
+
+        self.assertEqual(len(episode_data), Episode.objects.count())
+        first_episode = episode_data[0]
+        self.assertEqual(first_episode['id'], 1)
+        self.assertEqual([level['name'] for level in first_episode['levels']],
+                         [int(level.name) for level in Episode.objects.get(pk=1).levels])
+
+    def test_in_development_episodes_hidden_without_early_access(self):
+        last = Episode.objects.get(pk=1)
+        while last.next_episode is not None:
+            last = last.next_episode
+        last.in_development = True
+        last.save()
+
+        self.assertNotIn(last.id, [e['id'] for e in fetch_episode_data_from_database(early_access=False)])
+        self.assertIn(last.id, [e['id'] for e in fetch_episode_data_from_database(early_access=True)])
+
+    def test_cache_invalidated_by_level_save(self):
+        fetch_episode_data(early_access=False)
+        with self.assertNumQueries(0):
+            fetch_episode_data(early_access=False)
+
+        level = Level.objects.get(name='1')
+        level.episode = Episode.objects.get(pk=2)
+        level.save()
+
+        episode_data = fetch_episode_data(early_access=False)
+        self.assertNotIn(1, [level['name'] for level in episode_data[0]['levels']])
+        self.assertIn(1, [level['name'] for level in episode_data[1]['levels']])
+
+    def test_cached_per_language(self):
+        fetch_episode_data(early_access=False)
+        with translation.override('fr'):
+            with self.assertNumQueries(2):
+                fetch_episode_data(early_access=False)
+            with self.assertNumQueries(0):
+                fetch_episode_data(early_access=False)
+
+    def test_custom_level_save_keeps_cache(self):
+        fetch_episode_data(early_access=False)
+        Level.objects.create(name='custom', path='[]')
+        with self.assertNumQueries(0):
+            fetch_episode_data(early_access=False)
+
+
+class TestLevelTitles(TestCase):
+    def test_titles_match_messages(self):
+        self.assertEqual(get_level_title(1), messages.title_level1())
+        self.assertEqual(get_level_title('12'), messages.title_level12())
+        self.assertIs(level_titles(), level_titles())
+
+    def test_unknown_levels_have_no_title(self):
+        self.assertEqual(get_level_title(9999), '')
+        self.assertEqual(get_level_title('custom'), '')
+
+    def test_default_solution_shows_title(self):
+        email, password = signup_teacher_directly()
+        c = Client()
+        assert c.login(username=email, password=password)
+        response = c.get(reverse('default_solution', kwargs={'levelName': '1'}))
+        self.assertContains(response, get_level_title(1))
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+# Code for Life
+#
+# Copyright (C) 2016, Ocado Innovation Limited
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ADDITIONAL TERMS – Section 7 GNU General Public Licence
+#
+# This licence does not grant any right, title or interest in any “Ocado” logos,
+# trade names or the trademark “Ocado” or any other trademarks or domain names
+# owned by Ocado Innovation Limited or the Ocado group of companies or any other
+# distinctive brand features of “Ocado” as may be secured from time to time. You
+# must not distribute any modification of this program using the trademark
+# “Ocado” or claim any affiliation or association with Ocado or its employees.
+#
+# You are not authorised to use the name Ocado (or any of its trade names) or
+# the names of any author or contributor in advertising or for publicity purposes
+# pertaining to the distribution of this program, without the prior written
+# authorisation of Ocado.
+#
+# Any propagation, distribution or conveyance of this program must include this
+# copyright notice and these terms. You must not misrepresent the origins of this
+# program; modified versions of the program must be marked as such and not
+# identified as the original program.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils.six import StringIO
+from django_otp.plugins.otp_static.models import StaticDevice
+
+from portal.backends import ModelBackend
+from portal.models import Teacher, UserProfile
+from portal.utils import two_factor_cache_key, using_two_factor
+from utils.teacher import signup_teacher_directly
+
+
+class TestTwoFactorStatus(TestCase):
+    def setUp(self):
+        email, _ = signup_teacher_directly()
+        self.user = User.objects.get(username=email)
+
+    def uses_two_factor(self):
+        return UserProfile.objects.get(user=self.user).uses_two_factor
+
+    def test_flag_follows_devices(self):
+        self.assertFalse(self.uses_two_factor())
+        device = StaticDevice.objects.create(user=self.user, name='default')
+        self.assertTrue(self.uses_two_factor())
+        self.assertTrue(cache.get(two_factor_cache_key(self.user)))
+        device.delete()
+        self.assertFalse(self.uses_two_factor())
+        self.assertFalse(cache.get(two_factor_cache_key(self.user)))
+
+    def test_only_default_device_counts(self):
+        StaticDevice.objects.create(user=self.user, name='backup')
+        self.assertFalse(self.uses_two_factor())
+
+    def test_no_query_when_profile_loaded(self):
+        StaticDevice.objects.create(user=self.user, name='default')
+        user = ModelBackend().get_user(self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(using_two_factor(user))
+
+    def test_sync_command(self):
+        StaticDevice.objects.create(user=self.user, name='default')
+        UserProfile.objects.filter(user=self.user).update(uses_two_factor=False)
+        cache.clear()
+        out = StringIO()
+        call_command('sync_two_factor', batch_size=1, stdout=out)
+        self.assertTrue(self.uses_two_factor())
+        self.assertTrue(cache.get(two_factor_cache_key(self.user)))
+        self.assertIn('1 using 2FA', out.getvalue())
+
+    def test_aggregated_teacher_count(self):
+        StaticDevice.objects.create(user=self.user, name='default')
+        signup_teacher_directly()
+        self.assertEqual(Teacher.objects.filter(new_user__userprofile__uses_two_factor=True).count(), 1)
@@ -35,8 +35,12 @@
 # program; modified versions of the program must be marked as such and not
 # identified as the original program.
 
+from django.core.cache import cache
 from django.core.urlresolvers import reverse
 from django.test import TestCase, Client
+from django.utils import timezone
+from portal.models import FrontPageNews
+from portal.views.home import get_news
 from utils.teacher import signup_teacher_directly
 from utils.classes import create_class_directly
 
@@ -57,3 +61,64 @@ class TestTeacherViews(TestCase):
         url = reverse('teacher_print_reminder_cards', args=[self.class_access_code])
         response = c.get(url)
         self.assertEqual(response.status_code, 200)
+
+
+class TestHomeViews(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def add_news(self, title):
+        return FrontPageNews.objects.create(title=title, text='Text', link='http://example.com',
+                                            link_text='Link', added_dstamp=timezone.now())
+
+    def test_news_cached_until_changed(self):
+        story = self.add_news('First story')
+        self.assertEqual(get_news()[0]['title'], 'First story')
+        with self.assertNumQueries(0):
+            get_news()
+
+        self.add_news('Second story')
+        self.assertEqual([s['title'] for s in get_news()[:2]], ['Second story', 'First story'])
+
+        story.delete()
+        self.assertNotIn('First story', [s['title'] for s in get_news()])
+
+    def test_home_page_shows_news(self):
+        self.add_news('Big announcement')
+        response = Client().get(reverse('home'))
+        self.assertContains(response, 'Big announcement')
+
+    def test_anonymous_pages_served_from_cache(self):
+        Client().get(reverse('home'))
+        with self.assertNumQueries(0):
+            response = Client().get(reverse('home'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Accept-Language', response['Vary'])
+        self.assertIn('Cookie', response['Vary'])
+
+        self.add_news('Breaking news')
+        self.assertContains(Client().get(reverse('home')), 'Breaking news')
+
+    def test_cached_pages_get_the_visitors_csrf_token(self):
+        Client().get(reverse('teach'))
+
+        c = Client()
+        response = c.get(reverse('teach'))
+        token = response.cookies['csrftoken'].value
+        self.assertContains(response, "value='%s'" % token, count=2)
+        self.assertEqual(c.get(reverse('teach')).cookies['csrftoken'].value, token)
+        self.assertContains(c.get(reverse('teach')), "value='%s'" % token, count=2)
+
+        c.cookies['csrftoken'] = 'not a token'
+        response = c.get(reverse('teach'))
+        token = response.cookies['csrftoken'].value
+        self.assertNotEqual(token, 'not a token')
+        self.assertContains(response, "value='%s'" % token, count=2)
+
+    def test_logged_in_pages_not_cached(self):
+        email, password = signup_teacher_directly()
+        Client().get(reverse('home'))
+
+        c = Client()
+        assert c.login(username=email, password=password)
+        self.assertContains(c.get(reverse('home')), 'Mr Teacher')
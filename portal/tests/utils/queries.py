@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+# Code for Life
+#
+# Copyright (C) 2016, Ocado Innovation Limited
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ADDITIONAL TERMS – Section 7 GNU General Public Licence
+#
+# This licence does not grant any right, title or interest in any “Ocado” logos,
+# trade names or the trademark “Ocado” or any other trademarks or domain names
+# owned by Ocado Innovation Limited or the Ocado group of companies or any other
+# distinctive brand features of “Ocado” as may be secured from time to time. You
+# must not distribute any modification of this program using the trademark
+# “Ocado” or claim any affiliation or association with Ocado or its employees.
+#
+# You are not authorised to use the name Ocado (or any of its trade names) or
+# the names of any author or contributor in advertising or for publicity purposes
+# pertaining to the distribution of this program, without the prior written
+# authorisation of Ocado.
+#
+# Any propagation, distribution or conveyance of this program must include this
+# copyright notice and these terms. You must not misrepresent the origins of this
+# program; modified versions of the program must be marked as such and not
+# identified as the original program.
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from portal.profiling import repeated_queries
+
+#: Times the same query may run in one request before it counts as an N+1 pattern
+MAX_REPEATS = 3
+
+
+class QueryBudget(CaptureQueriesContext):
+    '''Fails the test if the block runs more than ``budget`` queries, or runs any one query, with
+    its values taken out, more than ``max_repeats`` times.'''
+
+    def __init__(self, test, budget, max_repeats=MAX_REPEATS):
+        super(QueryBudget, self).__init__(connection)
+        self.test = test
+        self.budget = budget
+        self.max_repeats = max_repeats
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        super(QueryBudget, self).__exit__(exc_type, exc_value, traceback)
+        if exc_type is not None:
+            return
+        queries = '\n'.join(query['sql'] for query in self.captured_queries)
+        self.test.assertLessEqual(len(self), self.budget, '%d queries run, over the budget of %d:\n%s'
+                                  % (len(self), self.budget, queries))
+        repeated = repeated_queries(self.captured_queries, more_than=self.max_repeats)
+        self.test.assertFalse(repeated, 'Queries run more than %d times:\n%s' % (
+            self.max_repeats, '\n'.join('%d x %s' % (count, shape) for shape, count in repeated)))
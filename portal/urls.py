@@ -42,7 +42,7 @@ from django.views.generic import RedirectView
 from two_factor.views import DisableView, BackupTokensView, SetupCompleteView, SetupView, \
     ProfileView, QRGeneratorView
 
-from portal.views.admin import aggregated_data, schools_map, admin_login
+from portal.views.admin import aggregated_data, schools_map, admin_login, profiling_summary
 from portal.permissions import teacher_verified
 from portal.views.email import verify_email
 from portal.views.home import teach, play, contact, current_user, logout_view, home_view
@@ -52,12 +52,13 @@ from portal.views.organisation import organisation_fuzzy_lookup, organisation_ma
 from portal.views.play import student_details, student_edit_account, student_join_organisation
 from portal.views.registration import custom_2FA_login, password_reset_check_and_confirm, \
     student_password_reset, teacher_password_reset
-from portal.views.teacher.teach import teacher_classes, teacher_class, \
+from portal.views.teacher.teach import teacher_classes, teacher_class, teacher_class_presence, \
     teacher_move_class, teacher_move_students, teacher_move_students_to_class, \
     teacher_delete_students, teacher_dismiss_students, teacher_edit_class, teacher_delete_class, \
     teacher_student_reset, teacher_edit_student, teacher_edit_account, teacher_disable_2FA, \
     teacher_print_reminder_cards, teacher_accept_student_request, teacher_reject_student_request, \
-    teacher_class_password_reset, materials_home, materials_viewer, teacher_level_solutions, default_solution
+    teacher_class_password_reset, materials_home, materials_viewer, materials_bundle, teacher_level_solutions, \
+    default_solution
 from portal.views.teacher.home import teacher_home
 from portal.views.teacher.solutions_level_selector import levels
 
@@ -106,6 +107,7 @@ urlpatterns = patterns(
     url(r'^admin/login/$', admin_login, name='admin_login'),
     url(r'^admin/map/$', schools_map, name='map'),
     url(r'^admin/data/$', aggregated_data, name='aggregated_data'),
+    url(r'^admin/profiling/$', profiling_summary, name='profiling_summary'),
 
     url(r'^mail/weekly', send_new_users_report, name='send_new_users_report'),
 
@@ -120,6 +122,7 @@ urlpatterns = patterns(
         name='teacher_lesson_plans_python'),
 
     url(r'^teach/materials/$', materials_home, name='materials_home'),
+    url(r'^teach/materials/bundle/(?P<key_stage>[a-zA-Z0-9_]+)/$', materials_bundle, name='materials_bundle'),
     url(r'^teach/materials/(?P<pdf_name>[a-zA-Z0-9\/\-_]+)$', materials_viewer, name='materials_viewer'),
 
     url(r'^teach/home/$', teacher_home, name='teacher_home'),
@@ -145,6 +148,8 @@ urlpatterns = patterns(
 
     url(r'^teach/classes/$', teacher_classes, name='teacher_classes'),
     url(r'^teach/class/(?P<access_code>[A-Z0-9]+)/$', teacher_class, name='teacher_class'),
+    url(r'^teach/class/(?P<access_code>[A-Z0-9]+)/presence/$', teacher_class_presence,
+        name='teacher_class_presence'),
     url(r'^teach/class/(?P<access_code>[A-Z0-9]+)/password_reset/$', teacher_class_password_reset,
         name='teacher_class_password_reset'),
     url(r'^teach/class/move/(?P<access_code>[A-Z0-9]+)/$', teacher_move_class,
@@ -34,19 +34,33 @@
 # copyright notice and these terms. You must not misrepresent the origins of this
 # program; modified versions of the program must be marked as such and not
 # identified as the original program.
+import hashlib
+import time
 
 from django.core.cache import cache
+from django.utils.translation import get_language
 
+from django_otp import device_classes
 from two_factor.utils import default_device
 
+from portal import __version__
+
+
+def _two_factor_cache_key(user_id):
+    return 'using-two-factor-%s' % user_id
+
 
 def two_factor_cache_key(user):
     '''Cache key for using_two_factor.'''
-    return 'using-two-factor-%s' % user.pk
+    return _two_factor_cache_key(user.pk)
 
 
 def _using_two_factor(user):
     '''Returns whether the user is using 2fa or not.'''
+    profile = getattr(user, 'userprofile', None)
+    if profile is not None:
+        return profile.uses_two_factor
+    # Users created outside the portal (e.g. admins) have no profile to hold the flag
     return default_device(user)
 
 
@@ -55,6 +69,11 @@ def using_two_factor(user):
     if hasattr(user, 'using_two_factor_cache'):
         # First try local memory, as we call this a lot in one request
         return user.using_two_factor_cache
+    profile = getattr(user, '_userprofile_cache', None)
+    if profile is not None:
+        # The profile was loaded along with the user, so the flag is free
+        user.using_two_factor_cache = profile.uses_two_factor
+        return profile.uses_two_factor
     cache_key = two_factor_cache_key(user)
     val = cache.get(cache_key)
     if val is not None:
@@ -67,3 +86,85 @@ def using_two_factor(user):
     cache.set(cache_key, val, None)  # Cache forever
     user.using_two_factor_cache = val
     return val
+
+
+def two_factor_user_ids(user_ids):
+    '''Returns the subset of user_ids with a confirmed default 2fa device.'''
+    result = set()
+    for model in device_classes():
+        devices = model.objects.filter(user_id__in=user_ids, name='default', confirmed=True)
+        result.update(devices.values_list('user_id', flat=True))
+    return result
+
+
+def sync_two_factor_status(user_ids):
+    '''Brings UserProfile.uses_two_factor and the using_two_factor cache up to date for the
+    given users, using one query per device type whatever the number of users.
+
+    Returns the ids of those users that are using 2fa.'''
+    from portal.models import UserProfile
+
+    user_ids = list(user_ids)
+    enabled = two_factor_user_ids(user_ids)
+    profiles = UserProfile.objects.filter(user_id__in=user_ids)
+    profiles.filter(user_id__in=enabled).exclude(uses_two_factor=True).update(uses_two_factor=True)
+    profiles.exclude(user_id__in=enabled).exclude(uses_two_factor=False).update(uses_two_factor=False)
+    cache.set_many(dict((_two_factor_cache_key(user_id), user_id in enabled) for user_id in user_ids), None)
+    return enabled
+
+
+def normalise_email(email):
+    '''Form of an email address that UserProfile.normalised_email is looked up by.'''
+    return (email or '').strip().lower()
+
+
+FRONT_PAGE_NEWS_CACHE_KEY = 'front_page_news'
+
+
+EPISODE_DATA_VERSION_KEY = 'episode_data_version'
+
+ANONYMOUS_PAGE_VERSION_KEY = 'anonymous_page_version'
+
+
+def _new_cache_version():
+    # Time based so a version evicted from the cache is never reused
+    return int(time.time() * 1000)
+
+
+def get_cache_version(version_key):
+    '''Current version of a group of cache keys, bumped to invalidate them all at once.'''
+    version = cache.get(version_key)
+    if version is None:
+        cache.add(version_key, _new_cache_version(), None)
+        version = cache.get(version_key)
+    return version
+
+
+def bump_cache_version(version_key):
+    try:
+        cache.incr(version_key)
+    except ValueError:
+        cache.set(version_key, _new_cache_version(), None)
+
+
+def episode_data_cache_key(early_access):
+    '''Versioned cache key for the episode and level data of the solutions navigator, which
+    includes the level titles in the active language.'''
+    key = 'episode_data_early_access' if early_access else 'episode_data'
+    return '%s-%s-%s' % (key, get_language(), get_cache_version(EPISODE_DATA_VERSION_KEY))
+
+
+def bump_episode_data_version():
+    '''Invalidates all cached episode data.'''
+    bump_cache_version(EPISODE_DATA_VERSION_KEY)
+
+
+def anonymous_page_cache_key(host, language, path):
+    '''Versioned cache key for a page rendered for logged out visitors.'''
+    page = hashlib.md5(('%s:%s:%s' % (host, language, path)).encode('utf-8')).hexdigest()
+    return 'anonymous-page-%s-%s-%s' % (__version__, get_cache_version(ANONYMOUS_PAGE_VERSION_KEY), page)
+
+
+def bump_anonymous_page_version():
+    '''Invalidates all cached anonymous pages.'''
+    bump_cache_version(ANONYMOUS_PAGE_VERSION_KEY)
@@ -39,21 +39,21 @@ from datetime import timedelta
 
 from django.shortcuts import render
 from rest_framework.reverse import reverse_lazy
-from django.db.models import Avg, Count, Q
-from django_otp import device_classes
+from django.db.models import Avg, Count
 from django.contrib.auth import views as auth_views
 from django.contrib.auth.models import User
 from django.contrib.auth.decorators import permission_required, login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages as messages
 from django_recaptcha_field import create_form_subclass_with_recaptcha
 from django.utils import timezone
 
 from recaptcha import RecaptchaClient
 
-from portal import app_settings
+from portal import app_settings, profiling
 from portal.forms.admin_login import AdminLoginForm
 from portal.helpers.location import lookup_coord
-from portal.models import UserProfile, Teacher, School, Class, Student
+from portal.models import UserProfile, Teacher, School, Class, Student, StudentProgress
 from ratelimit.decorators import ratelimit
 
 block_limit = 5
@@ -139,13 +139,9 @@ def aggregated_data(request):
                        Teacher.objects.exclude(pending_join_request=None).count(), ""])
 
     table_data.append(["Number of teachers with unverified email address",
-                      Teacher.objects.exclude(new_user__email_verifications__verified=True).count(), ""])
+                      Teacher.objects.filter(new_user__userprofile__email_verified=False).count(), ""])
 
-    otp_model_names = [model._meta.model_name for model in device_classes()]
-    otp_query = Q()
-    for model_name in otp_model_names:
-        otp_query = otp_query | Q(**{"new_user__%s__name" % model_name: 'default'})
-    two_factor_teachers = Teacher.objects.filter(otp_query).distinct().count()
+    two_factor_teachers = Teacher.objects.filter(new_user__userprofile__uses_two_factor=True).count()
     table_data.append(["Number of teachers setup with 2FA", two_factor_teachers, ""])
     num_of_classes_per_teacher = Teacher.objects.annotate(num_classes=Count('class_teacher'))
     stats_classes_per_teacher = num_of_classes_per_teacher.aggregate(Avg('num_classes'))
@@ -209,7 +205,7 @@ def aggregated_data(request):
                        independent_students.count(), ""])
 
     table_data.append(["Number of independent students with unverified email address",
-                       Student.objects.exclude(new_user__email_verifications__verified=True).count(), ""])
+                       Student.objects.filter(new_user__userprofile__email_verified=False).count(), ""])
 
     table_data.append(["Number of school students",
                        Student.objects.exclude(class_field=None).count(), ""])
@@ -224,8 +220,7 @@ def aggregated_data(request):
     """
     table_data = []
 
-    students_with_attempts = Student.objects.annotate(num_attempts=Count('attempts')) \
-                                            .exclude(num_attempts=0)
+    students_with_attempts = StudentProgress.objects.filter(attempts__gt=0)
     table_data.append(["Number of students who have started RR",
                        students_with_attempts.count(), ""])
 
@@ -396,3 +391,35 @@ def schools_map(request):
     return render(request, 'portal/admin/map.html', {
         'schools': School.objects.all()
     })
+
+
+@staff_member_required
+def profiling_summary(request):
+    views = profiling.slowest_views()
+
+    slowest_data = []
+    duplicate_data = []
+    for view, totals in views:
+        requests = totals['requests']
+        slowest_data.append([view, requests, totals['total_ms'] / requests, totals['max_ms'],
+                             float(totals['queries']) / requests, totals['sql_ms'] / requests,
+                             totals['template_ms'] / requests])
+        for sql, count in sorted(totals['duplicates'].items(), key=lambda item: -item[1]):
+            duplicate_data.append([view, count, sql])
+
+    tables = [
+        {'title': "Slowest views",
+         'description': "Averages over the requests profiled by the profiling middleware, slowest first.",
+         'header': ['View', 'Requests', 'Mean ms', 'Max ms', 'Mean queries', 'Mean SQL ms', 'Mean template ms'],
+         'data': slowest_data},
+        {'title': "Duplicate queries",
+         'description': "Queries run more than once in a request, with values taken out, and the most times "
+                        "one request ran them.",
+         'header': ['View', 'Times', 'Query'],
+         'data': duplicate_data},
+    ]
+
+    return render(request, 'portal/admin/aggregated_data.html', {
+        'title': "Profiled views",
+        'tables': tables,
+    })
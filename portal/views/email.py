@@ -51,13 +51,11 @@ from portal.app_settings import CONTACT_FORM_EMAILS
 
 
 def verify_email(request, token):
-    verifications = EmailVerification.objects.filter(token=token)
-
-    if len(verifications) != 1:
+    try:
+        verification = EmailVerification.objects.select_related('user').get(token=token)
+    except EmailVerification.DoesNotExist:
         return render(request, 'portal/email_verification_failed.html')
 
-    verification = verifications[0]
-
     if verification.verified or (verification.expiry - timezone.now()) < timedelta():
         return render(request, 'portal/email_verification_failed.html')
 
@@ -46,13 +46,11 @@ from portal.models import EmailVerification
 
 
 def verify_email_new(request, token):
-    verifications = EmailVerification.objects.filter(token=token)
+    verification = EmailVerification.objects.select_related('user').filter(token=token).first()
 
-    if has_verification_failed(verifications):
+    if has_verification_failed(verification):
         return render(request, 'redesign/email_verification_failed_new.html')
 
-    verification = verifications[0]
-
     verification.verified = True
     verification.save()
 
@@ -75,5 +73,5 @@ def verify_email_new(request, token):
     return HttpResponseRedirect(reverse_lazy('home_new'))
 
 
-def has_verification_failed(verifications):
-    return len(verifications) != 1 or verifications[0].verified or (verifications[0].expiry - timezone.now()) < timedelta()
+def has_verification_failed(verification):
+    return verification is None or verification.verified or (verification.expiry - timezone.now()) < timedelta()
@@ -52,7 +52,7 @@ from portal.forms.teach import TeacherSignupForm, TeacherLoginForm
 from portal.forms.play import StudentLoginForm, IndependentStudentLoginForm, StudentSignupForm
 from portal.helpers.emails import send_email, send_verification_email, is_verified, CONTACT_EMAIL
 from portal.app_settings import CONTACT_FORM_EMAILS
-from portal.utils import using_two_factor
+from portal.utils import using_two_factor, FRONT_PAGE_NEWS_CACHE_KEY
 from portal import app_settings, emailMessages
 from ratelimit.decorators import ratelimit
 
@@ -314,12 +314,12 @@ def contact(request):
 
 
 def current_user(request):
-    if not hasattr(request.user, 'userprofile'):
+    role = request.user_role
+    if role.profile is None:
         return HttpResponseRedirect(reverse_lazy('home'))
-    u = request.user
-    if hasattr(request.user, 'new_student'):
+    if role.student is not None:
         return HttpResponseRedirect(reverse_lazy('student_details'))
-    elif hasattr(request.user, 'new_teacher'):
+    elif role.teacher is not None:
         return HttpResponseRedirect(reverse_lazy('teacher_home'))
     else:
         # default to homepage and logout if something goes wrong
@@ -333,11 +333,12 @@ def logout_view(request):
 
 
 def get_news():
-    key = "front_page_cache"
-    results = cache.get(key)
+    '''The latest news stories as plain dicts, cached until a story is changed.'''
+    results = cache.get(FRONT_PAGE_NEWS_CACHE_KEY)
     if results is None:
-        results = FrontPageNews.objects.order_by('-added_dstamp')
-        cache.set(key, results, 600)
+        results = list(FrontPageNews.objects.order_by('-added_dstamp')
+                       .values('title', 'text', 'link', 'link_text')[:app_settings.FRONT_PAGE_NEWS_ITEMS])
+        cache.set(FRONT_PAGE_NEWS_CACHE_KEY, results, None)
     return results
 
 
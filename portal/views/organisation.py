@@ -50,7 +50,7 @@ from portal import app_settings, emailMessages
 from portal.models import School, Teacher, Class
 from portal.forms.organisation import OrganisationJoinForm, OrganisationForm
 from portal.permissions import logged_in_as_teacher
-from portal.helpers.emails import send_email, NOTIFICATION_EMAIL
+from portal.helpers.emails import send_email, render_email, queue_emails, NOTIFICATION_EMAIL
 from portal.helpers.location import lookup_coord
 
 from ratelimit.decorators import ratelimit
@@ -72,9 +72,14 @@ def organisation_fuzzy_lookup(request):
         for part in fuzzy_name.split():
             schools = schools.filter(Q(name__icontains=part) | Q(postcode__icontains=part))
 
+        # Each school's first admin, looked up together rather than school by school
+        admins = {}
+        for teacher in Teacher.objects.filter(school__in=schools, is_admin=True) \
+                .select_related('new_user').order_by('id'):
+            admins.setdefault(teacher.school_id, teacher)
+
         for school in schools:
-            admins = Teacher.objects.filter(school=school, is_admin=True)
-            admin = admins.first()
+            admin = admins.get(school.id)
             if admin:
                 email = admin.new_user.email
                 admin_domain = '*********' + email[email.find('@'):]
@@ -147,8 +152,9 @@ def organisation_create(request):
 
                 emailMessage = emailMessages.joinRequestPendingEmail(request, teacher.new_user.email)
 
-                for admin in Teacher.objects.filter(school=school, is_admin=True):
-                    send_email(NOTIFICATION_EMAIL, [admin.new_user.email], emailMessage['subject'], emailMessage['message'])
+                admin_emails = Teacher.objects.filter(school=school, is_admin=True).values_list('new_user__email', flat=True)
+                queue_emails([render_email(NOTIFICATION_EMAIL, [admin_email], emailMessage['subject'], emailMessage['message'])
+                              for admin_email in admin_emails])
 
                 emailMessage = emailMessages.joinRequestSentEmail(request, school.name)
                 send_email(NOTIFICATION_EMAIL, [teacher.new_user.email], emailMessage['subject'], emailMessage['message'])
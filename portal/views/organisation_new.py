@@ -50,7 +50,7 @@ from portal import app_settings, emailMessages
 from portal.models import School, Teacher, Class
 from portal.forms.organisation import OrganisationJoinForm, OrganisationForm
 from portal.permissions import logged_in_as_teacher
-from portal.helpers.emails import send_email, NOTIFICATION_EMAIL
+from portal.helpers.emails import send_email, render_email, queue_emails, NOTIFICATION_EMAIL
 from portal.helpers.location import lookup_coord
 
 from ratelimit.decorators import ratelimit
@@ -72,15 +72,19 @@ def organisation_fuzzy_lookup_new(request):
         for part in fuzzy_name.split():
             schools = schools.filter(Q(name__icontains=part) | Q(postcode__icontains=part))
 
+        # Each school's first admin, looked up together rather than school by school
+        admins = {}
+        for teacher in Teacher.objects.filter(school__in=schools, is_admin=True) \
+                .select_related('new_user').order_by('id'):
+            admins.setdefault(teacher.school_id, teacher)
+
         for school in schools:
-            search_school(school, school_data)
+            search_school(school, admins.get(school.id), school_data)
 
     return HttpResponse(json.dumps(school_data), content_type="application/json")
 
 
-def search_school(school, school_data):
-    admins = Teacher.objects.filter(school=school, is_admin=True)
-    admin = admins.first()
+def search_school(school, admin, school_data):
     if admin:
         email = admin.new_user.email
         admin_domain = '*********' + email[email.find('@'):]
@@ -168,8 +172,9 @@ def compute_output_join_form(OrganisationJoinFormWithCaptcha, OrganisationJoinFo
 
 
 def send_pending_requests_emails(school, email_message):
-    for admin in Teacher.objects.filter(school=school, is_admin=True):
-        send_email(NOTIFICATION_EMAIL, [admin.new_user.email], email_message['subject'], email_message['message'])
+    admin_emails = Teacher.objects.filter(school=school, is_admin=True).values_list('new_user__email', flat=True)
+    queue_emails([render_email(NOTIFICATION_EMAIL, [admin_email], email_message['subject'], email_message['message'])
+                  for admin_email in admin_emails])
 
 
 def process_join_form(request, teacher, InputOrganisationJoinForm, OutputOrganisationJoinForm):
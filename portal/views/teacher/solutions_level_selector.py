@@ -35,27 +35,32 @@
 # program; modified versions of the program must be marked as such and not
 # identified as the original program.
 from __future__ import division
-import game.messages as messages
 from django.template import RequestContext
-from django.utils.safestring import mark_safe
 
-from game.models import Episode
+from game.models import Episode, Level
 from django.core.cache import cache
+from django.db.models import Prefetch
 from game import app_settings
 from portal.permissions import logged_in_as_teacher
+from portal.utils import episode_data_cache_key
+from portal.helpers.level_titles import get_level_title
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.core.urlresolvers import reverse_lazy
 from django.shortcuts import render, get_object_or_404
 
 
 def fetch_episode_data_from_database(early_access):
+    level_names = Prefetch('level_set', queryset=Level.objects.only('id', 'name', 'episode'))
+    episodes = dict((episode.id, episode) for episode in Episode.objects.prefetch_related(level_names))
+
     episode_data = []
-    episode = Episode.objects.get(pk=1)
+    episode = episodes.get(1)
     while episode is not None:
         if episode.in_development and not early_access:
             break
 
-        levels, minName, maxName = min_max_levels(episode.levels)
+        episode_levels = sorted(episode.level_set.all(), key=lambda level: int(level.name))
+        levels, minName, maxName = min_max_levels(episode_levels)
 
         e = {"id": episode.id,
              "name": episode.name,
@@ -65,7 +70,7 @@ def fetch_episode_data_from_database(early_access):
              "random_levels_enabled": episode.r_random_levels_enabled}
 
         episode_data.append(e)
-        episode = episode.next_episode
+        episode = episodes.get(episode.next_episode_id)
     return episode_data
 
 
@@ -90,25 +95,14 @@ def min_max_levels(episode_levels):
 
 
 def fetch_episode_data(early_access):
-    key = "episode_data"
-    if early_access:
-        key = "episode_data_early_access"
+    key = episode_data_cache_key(early_access)
     data = cache.get(key)
     if data is None:
         data = fetch_episode_data_from_database(early_access)
-        cache.set(key, data)
+        cache.set(key, data, None)
     return data
 
 
-def get_level_title(i):
-    title = 'title_level' + str(i)
-    try:
-        titleCall = getattr(messages, title)
-        return mark_safe(titleCall())
-    except AttributeError:
-        return ""
-
-
 @login_required(login_url=reverse_lazy('teach'))
 @user_passes_test(logged_in_as_teacher, login_url=reverse_lazy('teach'))
 def levels(request):
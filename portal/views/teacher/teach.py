@@ -35,12 +35,13 @@
 # program; modified versions of the program must be marked as such and not
 # identified as the original program.
 import json
+import os
 from functools import partial, wraps
 from datetime import timedelta
 
 from django.conf import settings
 from django.shortcuts import render, get_object_or_404
-from django.http import HttpResponse, HttpResponseRedirect, Http404
+from django.http import HttpResponse, HttpResponseRedirect, Http404, FileResponse
 from django.core.urlresolvers import reverse_lazy
 from django.contrib import messages as messages
 from django.contrib.auth import logout, update_session_auth_hash
@@ -62,9 +63,11 @@ from portal.models import Teacher, Class, Student
 from portal.forms.teach import TeacherEditAccountForm, ClassCreationForm, ClassEditForm, ClassMoveForm, TeacherEditStudentForm, TeacherSetStudentPass, TeacherAddExternalStudentForm, TeacherMoveStudentsDestinationForm, TeacherMoveStudentDisambiguationForm, BaseTeacherMoveStudentsDisambiguationFormSet, TeacherDismissStudentsForm, BaseTeacherDismissStudentsFormSet, StudentCreationForm
 from portal.permissions import logged_in_as_teacher
 from portal.helpers.generators import get_random_username, generate_new_student_name, generate_access_code, generate_password
-from portal.helpers.emails import send_email, send_verification_email, NOTIFICATION_EMAIL
-from portal import emailMessages
-from portal.views.teacher.pdfs import PDF_DATA
+from portal.helpers.emails import send_email, send_verification_email, verification_emails, queue_emails, \
+    NOTIFICATION_EMAIL
+from portal import emailMessages, presence
+from portal.helpers import materials, roster
+from portal.helpers.level_titles import get_level_title
 from portal.templatetags.app_tags import cloud_storage
 
 
@@ -77,58 +80,52 @@ def materials_home(request):
 @login_required(login_url=reverse_lazy('teach'))
 @user_passes_test(logged_in_as_teacher, login_url=reverse_lazy('teach'))
 def materials_viewer(request, pdf_name):
-
-    def _getLinks():
-        links = PDF_DATA[pdf_name]['links']
-        link_titles = []
-        for link in links:
-            link = link.replace('_', ' ').title()
-
-            if (link[0] == 'K') | (link[1] == 'k'):
-                link = link[:4].upper() + link[4:]
-
-            link_titles.append(link)
-
-        return zip(links, link_titles)
-
     try:
-        title = PDF_DATA[pdf_name]['title']
-        description = PDF_DATA[pdf_name]['description']
-        url = cloud_storage(PDF_DATA[pdf_name]['url'])
-        page_origin = PDF_DATA[pdf_name]['page_origin']
-
+        material = materials.get_material(pdf_name)
     except KeyError:
         raise Http404
 
-    if PDF_DATA[pdf_name]['links'] is not None:
-        links = _getLinks()
-    else:
-        links = None
-
-    if 'video' in PDF_DATA[pdf_name]:
-        video_link = PDF_DATA[pdf_name]['video']
-        video_download_link = cloud_storage(PDF_DATA[pdf_name]['video_download_link'])
+    if material['video'] is not None:
+        video_link = material['video']
+        video_download_link = cloud_storage(material['video_download_link'])
     else:
         video_link = None
         video_download_link = None
 
     return render(request, 'portal/teach/materials/viewer.html',
-                  {'title': title,
-                   'description': description,
-                   'url': url,
-                   'links': links,
+                  {'title': material['title'],
+                   'description': material['description'],
+                   'url': cloud_storage(material['url']),
+                   'links': material['links'],
                    'video_link': video_link,
                    'video_download_link': video_download_link,
-                   'page_origin': page_origin})
+                   'page_origin': material['page_origin']})
+
+
+@login_required(login_url=reverse_lazy('teach'))
+@user_passes_test(logged_in_as_teacher, login_url=reverse_lazy('teach'))
+def materials_bundle(request, key_stage):
+    if key_stage not in materials.KEY_STAGE_BUNDLES:
+        raise Http404
+
+    path = materials.get_bundle_path(key_stage)
+    if path is None:
+        return HttpResponseRedirect(cloud_storage(materials.KEY_STAGE_BUNDLES[key_stage]['cloud_url']))
+
+    response = FileResponse(open(path, 'rb'), content_type='application/zip')
+    response['Content-Length'] = os.path.getsize(path)
+    response['Content-Disposition'] = 'attachment; filename="%s"' % os.path.basename(path)
+    return response
 
 
 @login_required(login_url=reverse_lazy('teach'))
 @user_passes_test(logged_in_as_teacher, login_url=reverse_lazy('teach'))
 def default_solution(request, levelName):
+    context = {'levelName': levelName, 'level_title': get_level_title(levelName)}
     if(int(levelName) >= 80 and int(levelName) <= 91):
-        return render(request, 'portal/teach/teacher_solutionPY.html', {'levelName': levelName})
+        return render(request, 'portal/teach/teacher_solutionPY.html', context)
     else:
-        return render(request, 'portal/teach/teacher_solution.html', {'levelName': levelName})
+        return render(request, 'portal/teach/teacher_solution.html', context)
 
 
 @login_required(login_url=reverse_lazy('teach'))
@@ -180,14 +177,12 @@ def create_class(form, teacher):
 @user_passes_test(logged_in_as_teacher, login_url=reverse_lazy('teach'))
 def teacher_class(request, access_code):
     klass = get_object_or_404(Class, access_code=access_code)
-    students = Student.objects.filter(class_field=klass).order_by('new_user__first_name')
+    students = list(Student.objects.filter(class_field=klass).select_related('new_user')
+                    .order_by('new_user__first_name'))
     # Check which students are logged in
-    logged_in_students = klass.get_logged_in_students()
+    logged_in_user_ids = presence.active_user_ids([student.new_user_id for student in students])
     for student in students:
-        if logged_in_students.filter(id=student.id).exists():
-            student.logged_in = True
-        else:
-            student.logged_in = False
+        student.logged_in = student.new_user_id in logged_in_user_ids
 
     # check user authorised to see class
     if request.user.new_teacher != klass.teacher:
@@ -220,6 +215,19 @@ def teacher_class(request, access_code):
                    'num_students': len(students)})
 
 
+@login_required(login_url=reverse_lazy('teach'))
+@user_passes_test(logged_in_as_teacher, login_url=reverse_lazy('teach'))
+def teacher_class_presence(request, access_code):
+    klass = get_object_or_404(Class, access_code=access_code)
+
+    # check user authorised to see class
+    if request.user.new_teacher != klass.teacher:
+        raise Http404
+
+    changes = roster.roster_changes(klass, since=request.GET.get('version'))
+    return HttpResponse(json.dumps(changes), content_type="application/json")
+
+
 @login_required(login_url=reverse_lazy('teach'))
 @user_passes_test(logged_in_as_teacher, login_url=reverse_lazy('teach'))
 def teacher_class_password_reset(request, access_code):
@@ -284,11 +292,9 @@ def teacher_move_students(request, access_code):
 
     transfer_students = request.POST.get('transfer_students', '[]')
 
-    # get teachers in the same school
-    teachers = Teacher.objects.filter(school=klass.teacher.school)
-
     # get classes in same school
-    classes = [c for c in Class.objects.all() if ((c.teacher in teachers) and (c != klass))]
+    classes = Class.objects.filter(teacher__school=klass.teacher.school_id).exclude(id=klass.id) \
+        .select_related('teacher__new_user').order_by('id')
 
     form = TeacherMoveStudentsDestinationForm(classes)
 
@@ -389,6 +395,7 @@ def teacher_dismiss_students(request, access_code):
     if request.method == 'POST' and 'submit_dismiss' in request.POST:
         formset = TeacherDismissStudentsFormSet(request.POST)
         if formset.is_valid():
+            emails = []
             for data in formset.cleaned_data:
                 student = get_object_or_404(Student, class_field=klass, new_user__first_name__iexact=data['orig_name'])
                 student.class_field = None
@@ -398,7 +405,8 @@ def teacher_dismiss_students(request, access_code):
                 student.save()
                 student.new_user.save()
 
-                send_verification_email(request, student.new_user)
+                emails.extend(verification_emails(request, student.new_user))
+            queue_emails(emails)
 
             messages.success(request, 'The students have been removed successfully from the class.')
             return HttpResponseRedirect(reverse_lazy('teacher_class', kwargs={'access_code': access_code}))
@@ -150,12 +150,9 @@ def teacher_class_new(request, access_code):
 
 def check_logged_in_students(klass, students):
     # Check which students are logged in
-    logged_in_students = klass.get_logged_in_students()
+    logged_in_ids = set(klass.get_logged_in_students().values_list('id', flat=True))
     for student in students:
-        if logged_in_students.filter(id=student.id).exists():
-            student.logged_in = True
-        else:
-            student.logged_in = False
+        student.logged_in = student.id in logged_in_ids
 
 
 def check_user_is_authorised(request, klass):
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+# Code for Life
+#
+# Copyright (C) 2016, Ocado Innovation Limited
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ADDITIONAL TERMS – Section 7 GNU General Public Licence
+#
+# This licence does not grant any right, title or interest in any “Ocado” logos,
+# trade names or the trademark “Ocado” or any other trademarks or domain names
+# owned by Ocado Innovation Limited or the Ocado group of companies or any other
+# distinctive brand features of “Ocado” as may be secured from time to time. You
+# must not distribute any modification of this program using the trademark
+# “Ocado” or claim any affiliation or association with Ocado or its employees.
+#
+# You are not authorised to use the name Ocado (or any of its trade names) or
+# the names of any author or contributor in advertising or for publicity purposes
+# pertaining to the distribution of this program, without the prior written
+# authorisation of Ocado.
+#
+# Any propagation, distribution or conveyance of this program must include this
+# copyright notice and these terms. You must not misrepresent the origins of this
+# program; modified versions of the program must be marked as such and not
+# identified as the original program.
+from collections import defaultdict
+from datetime import timedelta
+
+from django.core.cache import cache
+
+from reports.models import HitsPerLevelPerDay
+from reports.rollup import high_water_mark
+
+GRANULARITIES = ('day', 'week', 'month')
+LEVEL_HITS_CACHE_KEY = 'reports-level-hits-%d-%s-%s-%s'
+LEVEL_HITS_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def _period(day, granularity):
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def level_hits(start, end, granularity='day'):
+    '''Hits per level from the start date up to and including the end date, added up by day,
+    by week (starting on Mondays) or by month, as {level: [(period start, hits), ...]}.
+
+    Answers are cached until the hits rollup next reads new events.'''
+    if granularity not in GRANULARITIES:
+        raise ValueError('Unknown granularity: %s' % granularity)
+    key = LEVEL_HITS_CACHE_KEY % (high_water_mark(), start.isoformat(), end.isoformat(), granularity)
+    hits = cache.get(key)
+    if hits is None:
+        totals = defaultdict(lambda: defaultdict(int))
+        rows = HitsPerLevelPerDay.objects.filter(date__gte=start, date__lte=end).values_list('date', 'level', 'hits')
+        for day, level, count in rows.iterator():
+            totals[level][_period(day, granularity)] += count
+        hits = dict((level, sorted(periods.items())) for level, periods in totals.items())
+        cache.set(key, hits, LEVEL_HITS_CACHE_TIMEOUT)
+    return hits
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+# Code for Life
+#
+# Copyright (C) 2016, Ocado Innovation Limited
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ADDITIONAL TERMS – Section 7 GNU General Public Licence
+#
+# This licence does not grant any right, title or interest in any “Ocado” logos,
+# trade names or the trademark “Ocado” or any other trademarks or domain names
+# owned by Ocado Innovation Limited or the Ocado group of companies or any other
+# distinctive brand features of “Ocado” as may be secured from time to time. You
+# must not distribute any modification of this program using the trademark
+# “Ocado” or claim any affiliation or association with Ocado or its employees.
+#
+# You are not authorised to use the name Ocado (or any of its trade names) or
+# the names of any author or contributor in advertising or for publicity purposes
+# pertaining to the distribution of this program, without the prior written
+# authorisation of Ocado.
+#
+# Any propagation, distribution or conveyance of this program must include this
+# copyright notice and these terms. You must not misrepresent the origins of this
+# program; modified versions of the program must be marked as such and not
+# identified as the original program.
+from django.conf import settings
+
+#: Most events accepted by one call to the batch event endpoint
+REPORTS_MAX_BATCH_SIZE = getattr(settings, 'REPORTS_MAX_BATCH_SIZE', 1000)
+
+#: Events inserted per query when saving a batch
+REPORTS_BULK_CREATE_SIZE = getattr(settings, 'REPORTS_BULK_CREATE_SIZE', 500)
+
+#: Directory events are appended to for compact_event_log to load later, or None to save them straight away
+REPORTS_EVENT_LOG_DIR = getattr(settings, 'REPORTS_EVENT_LOG_DIR', None)
+
+#: Size in bytes at which an event log segment is sealed and a new one started
+REPORTS_EVENT_LOG_SEGMENT_BYTES = getattr(settings, 'REPORTS_EVENT_LOG_SEGMENT_BYTES', 16 * 1024 * 1024)
+
+#: Age in seconds at which an event log segment is sealed when the next events are written
+REPORTS_EVENT_LOG_SEGMENT_SECONDS = getattr(settings, 'REPORTS_EVENT_LOG_SEGMENT_SECONDS', 60)
+
+#: Longest time in seconds events written to the event log may go without being synced to disk
+REPORTS_EVENT_LOG_FSYNC_INTERVAL = getattr(settings, 'REPORTS_EVENT_LOG_FSYNC_INTERVAL', 1)
+
+#: Event types counted as hits on a level by rollup_hits, or None to count every event naming a level
+REPORTS_LEVEL_HIT_EVENT_TYPES = getattr(settings, 'REPORTS_LEVEL_HIT_EVENT_TYPES', None)
+
+#: Seconds rollup_hits leaves events alone for, so that events still being saved aren't skipped
+REPORTS_ROLLUP_LAG = getattr(settings, 'REPORTS_ROLLUP_LAG', 30)
+
+#: Months of events kept in the event table before event_retention moves them to monthly archive tables
+REPORTS_EVENT_ARCHIVE_AFTER_MONTHS = getattr(settings, 'REPORTS_EVENT_ARCHIVE_AFTER_MONTHS', 3)
+
+#: Months of events kept before event_retention drops their archive tables, or None to keep them
+REPORTS_EVENT_RETENTION_MONTHS = getattr(settings, 'REPORTS_EVENT_RETENTION_MONTHS', None)
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+# Code for Life
+#
+# Copyright (C) 2016, Ocado Innovation Limited
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ADDITIONAL TERMS – Section 7 GNU General Public Licence
+#
+# This licence does not grant any right, title or interest in any “Ocado” logos,
+# trade names or the trademark “Ocado” or any other trademarks or domain names
+# owned by Ocado Innovation Limited or the Ocado group of companies or any other
+# distinctive brand features of “Ocado” as may be secured from time to time. You
+# must not distribute any modification of this program using the trademark
+# “Ocado” or claim any affiliation or association with Ocado or its employees.
+#
+# You are not authorised to use the name Ocado (or any of its trade names) or
+# the names of any author or contributor in advertising or for publicity purposes
+# pertaining to the distribution of this program, without the prior written
+# authorisation of Ocado.
+#
+# Any propagation, distribution or conveyance of this program must include this
+# copyright notice and these terms. You must not misrepresent the origins of this
+# program; modified versions of the program must be marked as such and not
+# identified as the original program.
+'''Write-behind storage for events.
+
+With REPORTS_EVENT_LOG_DIR set, events are appended to JSON-lines segment files in that directory
+rather than saved straight away, and the compact_event_log command loads them into the database
+later. Each process writes its own segment, named ``<name>.jsonl.open`` while it is being written
+and renamed to ``<name>.jsonl`` once sealed. Segments are sealed when they reach
+REPORTS_EVENT_LOG_SEGMENT_BYTES or REPORTS_EVENT_LOG_SEGMENT_SECONDS, even if the process has been
+idle since, or when the process exits. A segment whose events the database refuses is renamed to
+``<name>.jsonl.failed`` and left for someone to look at, so it doesn't hold up the others.
+
+Every event is written to the file before the request returns, so events survive the process
+crashing. The file is synced to disk at most every REPORTS_EVENT_LOG_FSYNC_INTERVAL seconds, which
+bounds what a machine crash can lose.
+'''
+import atexit
+import errno
+import fcntl
+import json
+import logging
+import os
+import socket
+import threading
+import time
+
+from django.db import DataError, IntegrityError, transaction
+from django.utils.dateparse import parse_datetime
+
+from reports import app_settings
+from reports.models import Event, CompactedSegment
+from reports.rollup import lock_rollup
+
+logger = logging.getLogger(__name__)
+
+OPEN_SUFFIX = '.jsonl.open'
+SEALED_SUFFIX = '.jsonl'
+FAILED_SUFFIX = '.jsonl.failed'
+
+
+def _record(event):
+    return json.dumps({
+        'dstamp': event.dstamp.isoformat(),
+        'app': event.app,
+        'user': event.user_id,
+        'session': event.session,
+        'event_type': event.event_type,
+        'details': event.details,
+    }, separators=(',', ':'))
+
+
+def _event(record):
+    return Event(dstamp=parse_datetime(record['dstamp']), app=record['app'], user_id=record['user'],
+                 session=record['session'], event_type=record['event_type'], details=record['details'])
+
+
+class SegmentWriter(object):
+    '''Appends events to this process's open segment, sealing it and starting another as needed.
+
+    The open segment is locked while it is written, which is how compact_event_log tells the
+    segment of a live process from one left behind by a crash.'''
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+        self.fd = None
+        self.path = None
+        self.sequence = 0
+
+    def _open(self):
+        self.sequence += 1
+        name = 'events-%d-%s-%d-%d' % (time.time() * 1000, socket.gethostname(), self.pid, self.sequence)
+        self.path = os.path.join(self.directory, name + OPEN_SUFFIX)
+        self.fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        self.opened = time.time()
+        self.synced = self.opened
+        self.size = 0
+        # Seals the segment when it's due even if no more events come, so they get loaded
+        self.timer = threading.Timer(app_settings.REPORTS_EVENT_LOG_SEGMENT_SECONDS, self._expire, (self.sequence,))
+        self.timer.daemon = True
+        self.timer.start()
+
+    def _expire(self, sequence):
+        with self.lock:
+            if self.fd is not None and self.sequence == sequence and os.getpid() == self.pid:
+                self._seal()
+
+    def _seal(self):
+        self.timer.cancel()
+        os.fsync(self.fd)
+        sealed_path = self.path[:-len(OPEN_SUFFIX)] + SEALED_SUFFIX
+        os.rename(self.path, sealed_path)
+        os.close(self.fd)
+        self.fd = None
+
+    def append(self, events):
+        data = ''.join(_record(event) + '\n' for event in events)
+        with self.lock:
+            now = time.time()
+            if self.fd is not None and (self.size >= app_settings.REPORTS_EVENT_LOG_SEGMENT_BYTES or
+                                        now - self.opened >= app_settings.REPORTS_EVENT_LOG_SEGMENT_SECONDS):
+                self._seal()
+            if self.fd is None:
+                self._open()
+            # A single write to a file opened for appending doesn't interleave with other writes,
+            # but it may write less than it was given
+            written = 0
+            while written < len(data):
+                count = os.write(self.fd, data[written:])
+                if not count:
+                    raise IOError(errno.EIO, "Could not write to event log segment", self.path)
+                written += count
+            self.size += written
+            if now - self.synced >= app_settings.REPORTS_EVENT_LOG_FSYNC_INTERVAL:
+                os.fsync(self.fd)
+                self.synced = now
+
+    def close(self):
+        with self.lock:
+            if self.fd is not None and os.getpid() == self.pid:
+                self._seal()
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    '''The segment writer of this process, for the configured directory.'''
+    global _writer
+    with _writer_lock:
+        directory = app_settings.REPORTS_EVENT_LOG_DIR
+        # Forked processes must not share their parent's segment
+        if _writer is None or _writer.pid != os.getpid() or _writer.directory != directory:
+            if _writer is not None and _writer.pid == os.getpid():
+                _writer.close()
+            _writer = SegmentWriter(directory)
+        return _writer
+
+
+@atexit.register
+def _close_writer():
+    if _writer is not None:
+        _writer.close()
+
+
+def store_events(events):
+    '''Saves the events, or appends them to the event log if REPORTS_EVENT_LOG_DIR is set.'''
+    if app_settings.REPORTS_EVENT_LOG_DIR:
+        get_writer().append(events)
+    else:
+        Event.objects.bulk_create(events, batch_size=app_settings.REPORTS_BULK_CREATE_SIZE)
+
+
+def seal_abandoned_segments(directory):
+    '''Seals open segments no process holds a lock on, which are left behind when a process dies.
+    Returns how many were sealed.'''
+    sealed = 0
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(OPEN_SUFFIX):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError, e:
+            if e.errno == errno.ENOENT:
+                continue  # sealed by its writer meanwhile
+            raise
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except IOError:
+                continue  # still being written
+            if os.path.exists(path):
+                os.rename(path, path[:-len(OPEN_SUFFIX)] + SEALED_SUFFIX)
+                sealed += 1
+        finally:
+            os.close(fd)
+    return sealed
+
+
+def sealed_segments(directory):
+    '''The paths of the sealed segments in the directory, oldest first.'''
+    return [os.path.join(directory, name) for name in sorted(os.listdir(directory))
+            if name.endswith(SEALED_SUFFIX)]
+
+
+def _read_events(path):
+    with open(path) as segment:
+        for number, line in enumerate(segment, 1):
+            try:
+                yield _event(json.loads(line))
+            except (ValueError, KeyError):
+                # Only the last line of a segment whose process died mid-write can be incomplete
+                logger.warning("Skipping unreadable line %d of %s" % (number, path))
+
+
+def load_segment(path, batch_size=None):
+    '''Saves the events of a sealed segment and deletes it, returning how many events were saved.
+
+    The segment's name is recorded in the same transaction as its events, so a segment whose
+    deletion was interrupted isn't loaded twice. A segment whose data the database rejects is
+    renamed so it isn't tried again, and None is returned. Other database errors, like a lost
+    connection or a lock timeout, are raised and leave the segment to be tried again. Segments are loaded under the hits rollup's lock,
+    so concurrent compactors load one at a time.'''
+    batch_size = batch_size or app_settings.REPORTS_BULK_CREATE_SIZE
+    name = os.path.basename(path)
+    loaded = 0
+    try:
+        with transaction.atomic():
+            # Held until the events are committed, so the rollup doesn't read past them
+            lock_rollup()
+            if not CompactedSegment.objects.filter(name=name).exists():
+                batch = []
+                for event in _read_events(path):
+                    batch.append(event)
+                    if len(batch) >= batch_size:
+                        Event.objects.bulk_create(batch)
+                        loaded += len(batch)
+                        batch = []
+                Event.objects.bulk_create(batch)
+                loaded += len(batch)
+                CompactedSegment.objects.create(name=name, events=loaded)
+    except IntegrityError:
+        if CompactedSegment.objects.filter(name=name).exists():
+            # Another compact_event_log loaded it first, and will delete it
+            return 0
+        return _quarantine(path)
+    except DataError:
+        return _quarantine(path)
+    os.remove(path)
+    return loaded
+
+
+def _quarantine(path):
+    logger.exception("Could not load event log segment %s" % path)
+    os.rename(path, path[:-len(SEALED_SUFFIX)] + FAILED_SUFFIX)
+    return None
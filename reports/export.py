@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+# Code for Life
+#
+# Copyright (C) 2016, Ocado Innovation Limited
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ADDITIONAL TERMS – Section 7 GNU General Public Licence
+#
+# This licence does not grant any right, title or interest in any “Ocado” logos,
+# trade names or the trademark “Ocado” or any other trademarks or domain names
+# owned by Ocado Innovation Limited or the Ocado group of companies or any other
+# distinctive brand features of “Ocado” as may be secured from time to time. You
+# must not distribute any modification of this program using the trademark
+# “Ocado” or claim any affiliation or association with Ocado or its employees.
+#
+# You are not authorised to use the name Ocado (or any of its trade names) or
+# the names of any author or contributor in advertising or for publicity purposes
+# pertaining to the distribution of this program, without the prior written
+# authorisation of Ocado.
+#
+# Any propagation, distribution or conveyance of this program must include this
+# copyright notice and these terms. You must not misrepresent the origins of this
+# program; modified versions of the program must be marked as such and not
+# identified as the original program.
+'''Streaming exports of events, as gzipped CSV or JSON lines.
+
+Events are read in id order a batch at a time, from any number of querysets (such as those
+Event.objects.between returns for the event table and the archive tables of a range of
+months), so memory use doesn't grow with the size of the export. An interrupted
+export can carry on from the id of the last event it wrote.
+'''
+import csv
+import heapq
+import json
+import zlib
+from cStringIO import StringIO
+
+FORMATS = ('jsonl', 'csv')
+COLUMNS = ('id', 'dstamp', 'app', 'user_id', 'session', 'event_type', 'details')
+
+
+def _keyset(queryset, after_id, batch_size):
+    queryset = queryset.order_by('id').values_list(*COLUMNS)
+    while True:
+        batch = list((queryset if after_id is None else queryset.filter(id__gt=after_id))[:batch_size])
+        for values in batch:
+            yield values
+        if len(batch) < batch_size:
+            return
+        after_id = batch[-1][0]
+
+
+def _flatten(value, prefix, into):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            _flatten(item, '%s.%s' % (prefix, key), into)
+    else:
+        into[prefix] = value
+
+
+def events(querysets, after_id=None, flatten=False, batch_size=1000):
+    '''The events of the querysets with ids above after_id, as dicts in id order.
+
+    With flatten, the details are parsed and each of their values becomes a ``details.<key>``
+    entry of its own.'''
+    for values in heapq.merge(*[_keyset(queryset, after_id, batch_size) for queryset in querysets]):
+        event = dict(zip(COLUMNS, values))
+        event['dstamp'] = event['dstamp'].isoformat()
+        if flatten:
+            try:
+                details = json.loads(event.pop('details') or 'null')
+            except ValueError:
+                details = None
+            _flatten(details, 'details', event)
+        yield event
+
+
+def _jsonl_lines(rows):
+    for row in rows:
+        yield json.dumps(row, sort_keys=True) + '\n'
+
+
+def _csv_lines(rows, columns):
+    buffer = StringIO()
+    writer = csv.DictWriter(buffer, columns, extrasaction='ignore')
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(dict((key, unicode(value).encode('utf-8') if value is not None else '')
+                             for key, value in row.items()))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def export_chunks(querysets, format='jsonl', after_id=None, flatten=False, details_fields=(),
+                  chunk_size=64 * 1024):
+    '''The gzipped export of the events of the querysets, in chunks of roughly chunk_size
+    bytes of uncompressed output.
+
+    CSV exports have a column for each event field, or, if flattened, for each of
+    details_fields instead of the details.'''
+    if format not in FORMATS:
+        raise ValueError('Unknown export format: %s' % format)
+    rows = events(querysets, after_id, flatten)
+    if format == 'csv':
+        columns = list(COLUMNS)
+        if flatten:
+            columns.remove('details')
+            columns.extend('details.' + field for field in details_fields)
+        lines = _csv_lines(rows, columns)
+    else:
+        lines = _jsonl_lines(rows)
+
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    pending = []
+    pending_size = 0
+    for line in lines:
+        pending.append(line)
+        pending_size += len(line)
+        if pending_size >= chunk_size:
+            compressed = compressor.compress(''.join(pending))
+            pending, pending_size = [], 0
+            # Flushing sends every chunk on its way rather than leaving it in the compressor
+            yield compressed + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.compress(''.join(pending)) + compressor.flush()
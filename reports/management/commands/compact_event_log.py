@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+# Code for Life
+#
+# Copyright (C) 2016, Ocado Innovation Limited
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ADDITIONAL TERMS – Section 7 GNU General Public Licence
+#
+# This licence does not grant any right, title or interest in any “Ocado” logos,
+# trade names or the trademark “Ocado” or any other trademarks or domain names
+# owned by Ocado Innovation Limited or the Ocado group of companies or any other
+# distinctive brand features of “Ocado” as may be secured from time to time. You
+# must not distribute any modification of this program using the trademark
+# “Ocado” or claim any affiliation or association with Ocado or its employees.
+#
+# You are not authorised to use the name Ocado (or any of its trade names) or
+# the names of any author or contributor in advertising or for publicity purposes
+# pertaining to the distribution of this program, without the prior written
+# authorisation of Ocado.
+#
+# Any propagation, distribution or conveyance of this program must include this
+# copyright notice and these terms. You must not misrepresent the origins of this
+# program; modified versions of the program must be marked as such and not
+# identified as the original program.
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import InterfaceError, OperationalError, connection
+
+from reports import app_settings
+from reports.eventlog import seal_abandoned_segments, sealed_segments, load_segment
+
+
+class Command(BaseCommand):
+    help = ('Loads sealed event log segments into the database and deletes them. '
+            'Meant to be run periodically while REPORTS_EVENT_LOG_DIR is set.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', dest='batch_size', type=int,
+                            default=app_settings.REPORTS_BULK_CREATE_SIZE,
+                            help='Number of events to insert at a time.')
+        parser.add_argument('--loop', action='store_true', dest='loop', default=False,
+                            help='Keep loading segments as they are sealed.')
+        parser.add_argument('--sleep', dest='sleep', type=float, default=10,
+                            help='Seconds to wait between passes when looping.')
+
+    def handle(self, *args, **options):
+        directory = app_settings.REPORTS_EVENT_LOG_DIR
+        if not directory:
+            raise CommandError('REPORTS_EVENT_LOG_DIR is not set')
+        while True:
+            seal_abandoned_segments(directory)
+            segments = events = failed = 0
+            error = None
+            for path in sealed_segments(directory):
+                try:
+                    loaded = load_segment(path, options['batch_size'])
+                except (OperationalError, InterfaceError) as e:
+                    # The database is unavailable rather than refusing the events, so this segment
+                    # and the rest stay sealed for the next pass
+                    error = e
+                    break
+                if loaded is None:
+                    failed += 1
+                else:
+                    events += loaded
+                    segments += 1
+            self.stdout.write('%d events loaded from %d segments' % (events, segments))
+            if failed:
+                self.stderr.write('%d segments could not be loaded' % failed)
+            if error is not None:
+                if not options['loop']:
+                    raise CommandError('Stopped loading segments: %s' % error)
+                self.stderr.write('Stopped loading segments: %s' % error)
+                connection.close()
+            if not options['loop']:
+                break
+            time.sleep(options['sleep'])
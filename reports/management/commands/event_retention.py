@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+# Code for Life
+#
+# Copyright (C) 2016, Ocado Innovation Limited
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ADDITIONAL TERMS – Section 7 GNU General Public Licence
+#
+# This licence does not grant any right, title or interest in any “Ocado” logos,
+# trade names or the trademark “Ocado” or any other trademarks or domain names
+# owned by Ocado Innovation Limited or the Ocado group of companies or any other
+# distinctive brand features of “Ocado” as may be secured from time to time. You
+# must not distribute any modification of this program using the trademark
+# “Ocado” or claim any affiliation or association with Ocado or its employees.
+#
+# You are not authorised to use the name Ocado (or any of its trade names) or
+# the names of any author or contributor in advertising or for publicity purposes
+# pertaining to the distribution of this program, without the prior written
+# authorisation of Ocado.
+#
+# Any propagation, distribution or conveyance of this program must include this
+# copyright notice and these terms. You must not misrepresent the origins of this
+# program; modified versions of the program must be marked as such and not
+# identified as the original program.
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from reports import app_settings
+from reports.models import EventPartition, local_date
+from reports.partitions import add_months, archive_month, drop_partition, unarchived_months
+
+
+class Command(BaseCommand):
+    help = ('Moves old months of events into monthly archive tables and drops the archive tables '
+            'of expired months. Meant to be run daily.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--archive-after', dest='archive_after', type=int,
+                            default=app_settings.REPORTS_EVENT_ARCHIVE_AFTER_MONTHS,
+                            help='Months of events to keep in the event table.')
+        parser.add_argument('--drop-after', dest='drop_after', type=int,
+                            default=app_settings.REPORTS_EVENT_RETENTION_MONTHS,
+                            help='Months of events to keep at all. Kept forever if not given.')
+        parser.add_argument('--export-dir', dest='export_dir', default=None,
+                            help='Directory to export expired months to before dropping them.')
+
+    def handle(self, *args, **options):
+        this_month = local_date(timezone.now()).replace(day=1)
+
+        for month in unarchived_months(add_months(this_month, -options['archive_after'])):
+            partition = archive_month(month)
+            if partition is not None:
+                self.stdout.write('%s: %d events archived' % (month.strftime('%Y-%m'), partition.events))
+
+        if options['drop_after'] is not None:
+            expired = EventPartition.objects.filter(month__lt=add_months(this_month, -options['drop_after']))
+            for partition in expired.order_by('month'):
+                drop_partition(partition, options['export_dir'])
+                self.stdout.write('%s: %d events dropped' % (partition.month.strftime('%Y-%m'), partition.events))
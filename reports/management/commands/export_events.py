@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+# Code for Life
+#
+# Copyright (C) 2016, Ocado Innovation Limited
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ADDITIONAL TERMS – Section 7 GNU General Public Licence
+#
+# This licence does not grant any right, title or interest in any “Ocado” logos,
+# trade names or the trademark “Ocado” or any other trademarks or domain names
+# owned by Ocado Innovation Limited or the Ocado group of companies or any other
+# distinctive brand features of “Ocado” as may be secured from time to time. You
+# must not distribute any modification of this program using the trademark
+# “Ocado” or claim any affiliation or association with Ocado or its employees.
+#
+# You are not authorised to use the name Ocado (or any of its trade names) or
+# the names of any author or contributor in advertising or for publicity purposes
+# pertaining to the distribution of this program, without the prior written
+# authorisation of Ocado.
+#
+# Any propagation, distribution or conveyance of this program must include this
+# copyright notice and these terms. You must not misrepresent the origins of this
+# program; modified versions of the program must be marked as such and not
+# identified as the original program.
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reports.export import FORMATS, export_chunks
+from reports.models import Event
+from reports.views import parse_time
+
+
+class Command(BaseCommand):
+    help = 'Writes the events posted in a time range as gzipped CSV or JSON lines.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('start', help='Date or time of the first events to export.')
+        parser.add_argument('end', help='Date or time to export events up to.')
+        parser.add_argument('--format', dest='format', choices=FORMATS, default='jsonl')
+        parser.add_argument('--output', dest='output', default=None,
+                            help='File to write to. Written to standard output if not given.')
+        parser.add_argument('--after', dest='after_id', type=int, default=None,
+                            help='Id of the last event of an interrupted export, to carry on from.')
+        parser.add_argument('--flatten', action='store_true', dest='flatten', default=False,
+                            help='Give each value of the event details a field of its own.')
+        parser.add_argument('--details-fields', dest='details_fields', default='',
+                            help='Comma-separated details to give columns to in flattened CSV exports.')
+
+    def handle(self, *args, **options):
+        start, end = parse_time(options['start']), parse_time(options['end'])
+        if start is None or end is None:
+            raise CommandError('Start and end must be dates or times')
+        chunks = export_chunks(Event.objects.between(start, end), options['format'], options['after_id'],
+                               options['flatten'], [field for field in options['details_fields'].split(',') if field])
+        output = open(options['output'], 'wb') if options['output'] else sys.stdout
+        try:
+            for chunk in chunks:
+                output.write(chunk)
+        finally:
+            if output is not sys.stdout:
+                output.close()
@@ -34,9 +34,50 @@
 # copyright notice and these terms. You must not misrepresent the origins of this
 # program; modified versions of the program must be marked as such and not
 # identified as the original program.
+from datetime import date, datetime
+
+from django.apps.registry import Apps
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import User
 from django.contrib.sessions.models import Session
+from django.utils import timezone
+
+
+def month_start(month):
+    '''The first moment of the month of the date, in the current time zone.'''
+    start = datetime(month.year, month.month, 1)
+    return timezone.make_aware(start, timezone.get_current_timezone()) if settings.USE_TZ else start
+
+
+def local_date(dstamp):
+    if timezone.is_aware(dstamp):
+        dstamp = timezone.localtime(dstamp)
+    return dstamp.date()
+
+
+def next_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+class EventManager(models.Manager):
+    '''Routes queries for events to the archive tables of the months they cover as well as to
+    the event table.'''
+
+    def in_month(self, month):
+        '''Querysets of the events of the month of the date, as for between. Events loaded into
+        the event table after their month was archived are still found there.'''
+        month = date(month.year, month.month, 1)
+        return self.between(month_start(month), month_start(next_month(month)))
+
+    def between(self, start, end):
+        '''Querysets of the events posted from start up to end: one for the event table, then
+        one for each archived month in the range.'''
+        partitions = EventPartition.objects.filter(
+            month__gte=date(start.year, start.month, 1), month__lt=end).order_by('month')
+        return [self.filter(dstamp__gte=start, dstamp__lt=end)] + [
+            partition.model.objects.filter(dstamp__gte=start, dstamp__lt=end) for partition in partitions]
+
 
 class Event(models.Model):
     dstamp = models.DateTimeField()
@@ -46,8 +87,61 @@ class Event(models.Model):
     event_type = models.CharField(max_length=100)
     details = models.CharField(max_length=1000, null=True)
 
+    objects = EventManager()
+
+    class Meta:
+        index_together = [['dstamp', 'event_type'], ['app', 'dstamp']]
+
+# Archive tables are kept out of the app registry so that migrations leave them alone
+_archive_apps = Apps()
+_archive_models = {}
+
+
+def archive_model(month):
+    '''The model of the table the events of the month of the date are archived in.'''
+    key = '%04d%02d' % (month.year, month.month)
+    if key not in _archive_models:
+        meta = type(str('Meta'), (), {
+            'app_label': 'reports',
+            'apps': _archive_apps,
+            'db_table': 'reports_event_' + key,
+            'index_together': Event._meta.index_together,
+        })
+        _archive_models[key] = type(str('Event' + key), (models.Model,), {
+            '__module__': __name__,
+            'Meta': meta,
+            'id': models.IntegerField(primary_key=True),
+            'dstamp': models.DateTimeField(),
+            'app': models.CharField(max_length=100),
+            'user_id': models.IntegerField(null=True),
+            'session': models.CharField(max_length=100, null=True),
+            'event_type': models.CharField(max_length=100),
+            'details': models.CharField(max_length=1000, null=True),
+        })
+    return _archive_models[key]
+
 class HitsPerLevelPerDay(models.Model):
-    date = models.DateField()
+    date = models.DateField(db_index=True)
     level = models.CharField(max_length=1000, null=False)
     hits = models.IntegerField(null=False)
     updated_dstamp = models.DateTimeField(auto_now=False)
+
+class CompactedSegment(models.Model):
+    name = models.CharField(max_length=255, unique=True)
+    events = models.IntegerField()
+    loaded = models.DateTimeField(auto_now_add=True)
+
+class RollupState(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+    event_id = models.IntegerField(default=0)
+    dstamp = models.DateTimeField(null=True)
+    updated = models.DateTimeField(auto_now=True)
+
+class EventPartition(models.Model):
+    month = models.DateField(unique=True)
+    events = models.IntegerField()
+    archived = models.DateTimeField(auto_now_add=True)
+
+    @property
+    def model(self):
+        return archive_model(self.month)
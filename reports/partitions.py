@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+# Code for Life
+#
+# Copyright (C) 2016, Ocado Innovation Limited
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ADDITIONAL TERMS – Section 7 GNU General Public Licence
+#
+# This licence does not grant any right, title or interest in any “Ocado” logos,
+# trade names or the trademark “Ocado” or any other trademarks or domain names
+# owned by Ocado Innovation Limited or the Ocado group of companies or any other
+# distinctive brand features of “Ocado” as may be secured from time to time. You
+# must not distribute any modification of this program using the trademark
+# “Ocado” or claim any affiliation or association with Ocado or its employees.
+#
+# You are not authorised to use the name Ocado (or any of its trade names) or
+# the names of any author or contributor in advertising or for publicity purposes
+# pertaining to the distribution of this program, without the prior written
+# authorisation of Ocado.
+#
+# Any propagation, distribution or conveyance of this program must include this
+# copyright notice and these terms. You must not misrepresent the origins of this
+# program; modified versions of the program must be marked as such and not
+# identified as the original program.
+'''Monthly archive tables for events.
+
+Whole months of events are moved out of the event table into a table of their own, which
+EventManager routes queries to, and expired months are dropped a table at a time.
+'''
+import logging
+import os
+
+from django.db import connection, transaction
+from django.db.models import Max, Min
+
+from reports.export import COLUMNS, export_chunks
+from reports.models import Event, EventPartition, RollupState, archive_model, local_date, month_start, next_month
+from reports.rollup import HITS_PER_LEVEL_PER_DAY
+
+logger = logging.getLogger(__name__)
+
+
+def add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1, day=1)
+
+
+def unarchived_months(before):
+    '''The months with events still in the event table, up to the month of the date before.'''
+    first = Event.objects.aggregate(first=Min('dstamp'))['first']
+    if first is None:
+        return []
+    first = local_date(first)
+    months = []
+    month = first.replace(day=1)
+    while month < before.replace(day=1):
+        months.append(month)
+        month = next_month(month)
+    return months
+
+
+def archive_month(month):
+    '''Moves the events of the month out of the event table into the month's archive table.
+
+    Each step can be re-run if a later one fails, which matters where DDL can't be rolled back,
+    as on MySQL: the table is created first, only events not archived yet are copied, and only
+    copied events are deleted. Archiving a month again moves the events loaded since.
+
+    Returns the partition, or None if the month has events the hits rollup hasn't read yet.'''
+    month = month.replace(day=1)
+    start, end = month_start(month), month_start(next_month(month))
+    events = Event.objects.filter(dstamp__gte=start, dstamp__lt=end)
+    rollup = RollupState.objects.filter(name=HITS_PER_LEVEL_PER_DAY).first()
+    last_id = events.aggregate(last=Max('id'))['last']
+    if rollup is not None and last_id is not None and last_id > rollup.event_id:
+        logger.warning("Not archiving %s until its events have been rolled up" % month.strftime('%Y-%m'))
+        return None
+
+    model = archive_model(month)
+    table = model._meta.db_table
+    quote = connection.ops.quote_name
+    if table not in connection.introspection.table_names():
+        with connection.schema_editor() as editor:
+            editor.create_model(model)
+    with transaction.atomic():
+        columns = ', '.join(quote(column) for column in COLUMNS)
+        with connection.cursor() as cursor:
+            cursor.execute('INSERT INTO %s (%s) SELECT %s FROM %s WHERE %s >= %%s AND %s < %%s '
+                           'AND %s NOT IN (SELECT %s FROM %s)' % (
+                               quote(table), columns, columns, quote(Event._meta.db_table), quote('dstamp'),
+                               quote('dstamp'), quote('id'), quote('id'), quote(table)),
+                           [Event._meta.get_field('dstamp').get_db_prep_value(value, connection)
+                            for value in (start, end)])
+        events.filter(id__in=model.objects.values('id')).delete()
+        partition, _ = EventPartition.objects.get_or_create(month=month, defaults={'events': 0})
+        partition.events = model.objects.count()
+        partition.save()
+    return partition
+
+
+def export_partition(partition, directory):
+    '''Writes the events of the partition to a gzipped JSON-lines file in the directory, returning
+    its path.'''
+    path = os.path.join(directory, 'events-%s.jsonl.gz' % partition.month.strftime('%Y-%m'))
+    with open(path, 'wb') as export:
+        for chunk in export_chunks([partition.model.objects.all()]):
+            export.write(chunk)
+    return path
+
+
+def drop_partition(partition, export_directory=None):
+    '''Drops the archive table of the partition, after exporting it to the directory if given.'''
+    if export_directory:
+        export_partition(partition, export_directory)
+    with transaction.atomic():
+        with connection.schema_editor() as editor:
+            editor.delete_model(partition.model)
+        partition.delete()
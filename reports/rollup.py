@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+# Code for Life
+#
+# Copyright (C) 2016, Ocado Innovation Limited
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ADDITIONAL TERMS – Section 7 GNU General Public Licence
+#
+# This licence does not grant any right, title or interest in any “Ocado” logos,
+# trade names or the trademark “Ocado” or any other trademarks or domain names
+# owned by Ocado Innovation Limited or the Ocado group of companies or any other
+# distinctive brand features of “Ocado” as may be secured from time to time. You
+# must not distribute any modification of this program using the trademark
+# “Ocado” or claim any affiliation or association with Ocado or its employees.
+#
+# You are not authorised to use the name Ocado (or any of its trade names) or
+# the names of any author or contributor in advertising or for publicity purposes
+# pertaining to the distribution of this program, without the prior written
+# authorisation of Ocado.
+#
+# Any propagation, distribution or conveyance of this program must include this
+# copyright notice and these terms. You must not misrepresent the origins of this
+# program; modified versions of the program must be marked as such and not
+# identified as the original program.
+from collections import defaultdict
+from datetime import timedelta
+import json
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from reports import app_settings
+from reports.models import Event, HitsPerLevelPerDay, RollupState, local_date
+
+HITS_PER_LEVEL_PER_DAY = 'hits_per_level_per_day'
+HIGH_WATER_MARK_CACHE_KEY = 'reports-hits-high-water-mark'
+
+
+def _level(event_type, details):
+    hit_types = app_settings.REPORTS_LEVEL_HIT_EVENT_TYPES
+    if hit_types is not None and event_type not in hit_types:
+        return None
+    try:
+        details = json.loads(details or 'null')
+    except ValueError:
+        return None
+    if not isinstance(details, dict) or details.get('levelName') is None:
+        return None
+    return unicode(details['levelName'])[:HitsPerLevelPerDay._meta.get_field('level').max_length]
+
+
+def _add_hits(hits, now):
+    for (date, level), count in hits.items():
+        updated = HitsPerLevelPerDay.objects.filter(date=date, level=level).update(
+            hits=F('hits') + count, updated_dstamp=now)
+        if not updated:
+            HitsPerLevelPerDay.objects.create(date=date, level=level, hits=count, updated_dstamp=now)
+
+
+def lock_rollup():
+    '''Locks the hits rollup's state until the end of the transaction, and returns it.
+
+    compact_event_log takes the lock while it loads a segment, so the rollup never reads past
+    events a compactor hasn't committed yet.'''
+    return RollupState.objects.select_for_update().get(name=HITS_PER_LEVEL_PER_DAY)
+
+
+def _rollup_batch(batch_size, cutoff):
+    with transaction.atomic():
+        state = lock_rollup()
+        events = (Event.objects.filter(id__gt=state.event_id).order_by('id')
+                  .values_list('id', 'dstamp', 'event_type', 'details')[:batch_size])
+        hits = defaultdict(int)
+        read = 0
+        for event_id, dstamp, event_type, details in events:
+            if dstamp > cutoff:
+                break
+            level = _level(event_type, details)
+            if level is not None:
+                hits[(local_date(dstamp), level)] += 1
+            state.event_id, state.dstamp = event_id, dstamp
+            read += 1
+        if read:
+            _add_hits(hits, timezone.now())
+            state.save()
+    if read:
+        _publish_high_water_mark()
+    return read
+
+
+def _publish_high_water_mark():
+    # Read and written under the lock, after the batch has committed, so the cached mark never
+    # runs ahead of the hits and concurrent rollups can't move it backwards
+    with transaction.atomic():
+        cache.set(HIGH_WATER_MARK_CACHE_KEY, lock_rollup().event_id, None)
+
+
+def high_water_mark():
+    '''The id of the last event the hits rollup has read, which changes whenever the hits do.'''
+    mark = cache.get(HIGH_WATER_MARK_CACHE_KEY)
+    if mark is None:
+        mark = (RollupState.objects.filter(name=HITS_PER_LEVEL_PER_DAY)
+                .values_list('event_id', flat=True).first()) or 0
+        # Unlocked, so it mustn't replace a mark a rollup has just published
+        cache.add(HIGH_WATER_MARK_CACHE_KEY, mark, None)
+    return mark
+
+
+def rollup_hits(batch_size=1000):
+    '''Adds the events saved since the last rollup to HitsPerLevelPerDay, returning how many events
+    were read.
+
+    Events are read in id order, so events loaded late by compact_event_log are counted on the
+    day they were posted. Events saved as they are posted could still be committing with lower
+    ids than ones already visible, so the rollup stops at the first event posted in the last
+    REPORTS_ROLLUP_LAG seconds. Events loaded by compact_event_log keep the time they were
+    posted, which can't hold the rollup back, so compactors take the rollup's lock instead: the
+    rollup waits for them to commit, and they load one segment at a time. Each batch is counted
+    in the same transaction that advances the high-water mark, and concurrent rollups wait for
+    each other, so it's safe to run as often as wanted.'''
+    cutoff = timezone.now() - timedelta(seconds=app_settings.REPORTS_ROLLUP_LAG)
+    total = 0
+    while True:
+        read = _rollup_batch(batch_size, cutoff)
+        total += read
+        if read < batch_size:
+            return total
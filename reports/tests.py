@@ -34,6 +34,406 @@
 # copyright notice and these terms. You must not misrepresent the origins of this
 # program; modified versions of the program must be marked as such and not
 # identified as the original program.
+from datetime import date, datetime
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import time
+import zlib
+
+from django.conf.urls import include, url
+from django.core.cache import cache
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.core.urlresolvers import reverse
+from django.db import OperationalError
 from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from reports import app_settings, eventlog
+from reports.analytics import level_hits
+from reports.models import Event, EventPartition, HitsPerLevelPerDay, RollupState
+from reports.partitions import archive_month
+from reports.rollup import HIGH_WATER_MARK_CACHE_KEY, HITS_PER_LEVEL_PER_DAY, high_water_mark, rollup_hits
+from portal.tests.utils.teacher import signup_teacher_directly
+
+# Sites include the reports URLs alongside the portal's
+urlpatterns = [
+    url(r'^reports/', include('reports.urls')),
+    url(r'', include('django_autoconfig.autourlconf')),
+]
+
+
+@override_settings(ROOT_URLCONF='reports.tests')
+class EventIngestionTest(TestCase):
+    def post_events(self, body, content_type='application/json'):
+        return self.client.post(reverse('post_events'), body, content_type=content_type)
+
+    def test_single_event(self):
+        response = self.client.post(reverse('post_event'),
+                                    json.dumps({'app': 'RapidRouter', 'eventType': 'play', 'details': {'level': 1}}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(Event.objects.get().details), {'level': 1})
+
+    def test_array_reports_each_event(self):
+        response = self.post_events(json.dumps([
+            {'app': 'RapidRouter', 'eventType': 'play', 'details': {'level': 1}},
+            {'app': 'RapidRouter', 'details': {}},
+            {'app': 'RapidRouter', 'eventType': 'play', 'details': 'x' * 1000},
+            {'app': 'RapidRouter', 'eventType': 'stop', 'details': None},
+        ]))
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual((data['saved'], data['rejected']), (2, 2))
+        self.assertEqual([result['status'] for result in data['results']], ['ok', 'error', 'error', 'ok'])
+        self.assertEqual(data['results'][1]['error'], 'Missing event attributes')
+        self.assertEqual(sorted(Event.objects.values_list('event_type', flat=True)), ['play', 'stop'])
+
+    def test_newline_delimited(self):
+        body = '\n'.join([json.dumps({'app': 'RapidRouter', 'eventType': 'play', 'details': {}}),
+                          '{not json',
+                          '',
+                          json.dumps({'app': 'RapidRouter', 'eventType': 'stop', 'details': {}})])
+        data = json.loads(self.post_events(body, content_type='application/x-ndjson').content)
+        self.assertEqual([result['status'] for result in data['results']], ['ok', 'error', 'ok'])
+        self.assertEqual(Event.objects.count(), 2)
+
+    def test_inserts_in_chunks(self):
+        body = json.dumps([{'app': 'RapidRouter', 'eventType': 'play', 'details': i} for i in range(5)])
+        original = app_settings.REPORTS_BULK_CREATE_SIZE
+        app_settings.REPORTS_BULK_CREATE_SIZE = 2
+        try:
+            with self.assertNumQueries(3):
+                self.post_events(body)
+        finally:
+            app_settings.REPORTS_BULK_CREATE_SIZE = original
+        self.assertEqual(Event.objects.count(), 5)
+
+    def test_bad_batches(self):
+        self.assertEqual(self.post_events('[{').status_code, 400)
+        original = app_settings.REPORTS_MAX_BATCH_SIZE
+        app_settings.REPORTS_MAX_BATCH_SIZE = 1
+        try:
+            response = self.post_events(json.dumps([{}, {}]))
+        finally:
+            app_settings.REPORTS_MAX_BATCH_SIZE = original
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(self.client.get(reverse('post_events')).status_code, 405)
+
+
+@override_settings(ROOT_URLCONF='reports.tests')
+class EventLogTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.original = (app_settings.REPORTS_EVENT_LOG_DIR, app_settings.REPORTS_EVENT_LOG_SEGMENT_BYTES,
+                         app_settings.REPORTS_EVENT_LOG_SEGMENT_SECONDS)
+        app_settings.REPORTS_EVENT_LOG_DIR = self.directory
+
+    def tearDown(self):
+        eventlog.get_writer().close()
+        (app_settings.REPORTS_EVENT_LOG_DIR, app_settings.REPORTS_EVENT_LOG_SEGMENT_BYTES,
+         app_settings.REPORTS_EVENT_LOG_SEGMENT_SECONDS) = self.original
+        shutil.rmtree(self.directory)
+
+    def post_events(self, count):
+        body = json.dumps([{'app': 'RapidRouter', 'eventType': 'play', 'details': i} for i in range(count)])
+        response = self.client.post(reverse('post_events'), body, content_type='application/json')
+        self.assertEqual(json.loads(response.content)['saved'], count)
+
+    def compact(self):
+        call_command('compact_event_log', stdout=open(os.devnull, 'w'), stderr=open(os.devnull, 'w'))
+
+    def files(self):
+        return sorted(os.listdir(self.directory))
+
+    def test_events_are_written_behind(self):
+        self.post_events(3)
+        self.assertEqual(Event.objects.count(), 0)
+        [name] = self.files()
+        self.assertTrue(name.endswith(eventlog.OPEN_SUFFIX))
+
+        # The open segment is still locked by its writer, so it's left alone
+        self.compact()
+        self.assertEqual(Event.objects.count(), 0)
+
+        eventlog.get_writer().close()
+        self.compact()
+        self.assertEqual(sorted(Event.objects.values_list('details', flat=True)), ['0', '1', '2'])
+        self.assertEqual(self.files(), [])
+
+    def test_segments_rotate(self):
+        app_settings.REPORTS_EVENT_LOG_SEGMENT_BYTES = 1
+        self.post_events(2)
+        self.post_events(2)
+        self.post_events(2)
+        names = self.files()
+        self.assertEqual([name.endswith(eventlog.SEALED_SUFFIX) for name in names], [True, True, False])
+        self.compact()
+        self.assertEqual(Event.objects.count(), 4)
+
+    def test_abandoned_and_torn_segments(self):
+        self.post_events(2)
+        writer = eventlog.get_writer()
+        with open(writer.path, 'a') as segment:
+            segment.write('{"dstamp": "2016-')
+        # A process dying releases the lock on its segment
+        os.close(writer.fd)
+        writer.fd = None
+        self.compact()
+        self.assertEqual(Event.objects.count(), 2)
+        self.assertEqual(self.files(), [])
+
+    def test_segment_is_loaded_once(self):
+        self.post_events(2)
+        eventlog.get_writer().close()
+        [name] = self.files()
+        path = os.path.join(self.directory, name)
+        shutil.copy(path, path + '.copy')
+        self.compact()
+        # As if deleting the segment had been interrupted
+        os.rename(path + '.copy', path)
+        self.compact()
+        self.assertEqual(Event.objects.count(), 2)
+        self.assertEqual(self.files(), [])
+
+    def test_single_event_is_validated(self):
+        response = self.client.post(reverse('post_event'),
+                                    json.dumps({'app': 'R' * 1000, 'eventType': 'play', 'details': {}}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.files(), [])
+
+    def test_idle_segments_are_sealed(self):
+        app_settings.REPORTS_EVENT_LOG_SEGMENT_SECONDS = 0.1
+        self.post_events(2)
+        time.sleep(0.5)
+        [name] = self.files()
+        self.assertTrue(name.endswith(eventlog.SEALED_SUFFIX))
+
+    def test_failed_segments_are_set_aside(self):
+        with open(os.path.join(self.directory, 'events-0-broken' + eventlog.SEALED_SUFFIX), 'w') as segment:
+            segment.write(json.dumps({'dstamp': 'never', 'app': 'RapidRouter', 'user': None, 'session': None,
+                                      'event_type': 'play', 'details': '{}'}) + '\n')
+        self.post_events(2)
+        eventlog.get_writer().close()
+        self.compact()
+        self.assertEqual(Event.objects.count(), 2)
+        self.assertEqual(self.files(), ['events-0-broken' + eventlog.FAILED_SUFFIX])
+
+    def test_database_outages_leave_segments_sealed(self):
+        self.post_events(2)
+        eventlog.get_writer().close()
+        sealed = self.files()
+
+        def unavailable():
+            raise OperationalError('database is locked')
+        original = eventlog.lock_rollup
+        eventlog.lock_rollup = unavailable
+        try:
+            self.assertRaises(CommandError, self.compact)
+        finally:
+            eventlog.lock_rollup = original
+        self.assertEqual(self.files(), sealed)
+        self.assertEqual(Event.objects.count(), 0)
+
+        self.compact()
+        self.assertEqual(Event.objects.count(), 2)
+        self.assertEqual(self.files(), [])
+
+
+def local_time(*args):
+    return timezone.make_aware(datetime(*args), timezone.get_current_timezone())
+
+
+class RollupTest(TestCase):
+    def add_event(self, details, dstamp=None, event_type='PlayButtonPressed'):
+        Event.objects.create(dstamp=dstamp or local_time(2016, 3, 1, 12), app='RapidRouter',
+                             event_type=event_type, details=json.dumps(details))
+
+    def hits(self):
+        return dict(((row.date, row.level), row.hits) for row in HitsPerLevelPerDay.objects.all())
+
+    def test_incremental(self):
+        self.add_event({'levelName': 1})
+        self.add_event({'levelName': 1})
+        self.add_event({'levelName': '2'}, dstamp=local_time(2016, 3, 2, 9))
+        self.add_event({'other': 1})
+        self.add_event('not an object')
+        self.assertEqual(rollup_hits(batch_size=2), 5)
+        self.assertEqual(self.hits(), {(date(2016, 3, 1), '1'): 2, (date(2016, 3, 2), '2'): 1})
+
+        self.assertEqual(rollup_hits(), 0)
+        # An event loaded late from the event log still counts on the day it was posted
+        self.add_event({'levelName': 1})
+        self.assertEqual(rollup_hits(), 1)
+        self.assertEqual(self.hits()[(date(2016, 3, 1), '1')], 3)
+
+    def test_high_water_mark_is_the_committed_one(self):
+        cache.delete(HIGH_WATER_MARK_CACHE_KEY)
+        self.add_event({'levelName': 1})
+        self.add_event({'levelName': 1})
+        rollup_hits(batch_size=1)
+        state = RollupState.objects.get(name=HITS_PER_LEVEL_PER_DAY)
+        self.assertEqual(cache.get(HIGH_WATER_MARK_CACHE_KEY), state.event_id)
+        self.assertEqual(high_water_mark(), state.event_id)
+
+    def test_recent_events_wait(self):
+        self.add_event({'levelName': 1})
+        self.add_event({'levelName': 1}, dstamp=timezone.now())
+        self.add_event({'levelName': 1})
+        self.assertEqual(rollup_hits(), 1)
+        self.assertEqual(self.hits(), {(date(2016, 3, 1), '1'): 1})
+
+    def test_hit_event_types(self):
+        self.add_event({'levelName': 1})
+        self.add_event({'levelName': 1}, event_type='LevelSuccess')
+        original = app_settings.REPORTS_LEVEL_HIT_EVENT_TYPES
+        app_settings.REPORTS_LEVEL_HIT_EVENT_TYPES = ('LevelSuccess',)
+        try:
+            rollup_hits()
+        finally:
+            app_settings.REPORTS_LEVEL_HIT_EVENT_TYPES = original
+        self.assertEqual(self.hits(), {(date(2016, 3, 1), '1'): 1})
+
+
+class PartitionTest(TestCase):
+    def setUp(self):
+        for dstamp in (local_time(2016, 1, 31, 23), local_time(2016, 2, 1), local_time(2016, 2, 15)):
+            Event.objects.create(dstamp=dstamp, app='RapidRouter', event_type='play', details='{}')
+        rollup_hits()
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_archived_months_are_routed(self):
+        partition = archive_month(date(2016, 1, 1))
+        self.assertEqual(partition.events, 1)
+        self.assertEqual(Event.objects.count(), 2)
+
+        self.assertEqual([queryset.count() for queryset in Event.objects.in_month(date(2016, 1, 20))], [0, 1])
+        self.assertEqual([queryset.count() for queryset in Event.objects.in_month(date(2016, 2, 1))], [2])
+        querysets = Event.objects.between(local_time(2016, 1, 31), local_time(2016, 2, 10))
+        self.assertEqual([queryset.count() for queryset in querysets], [1, 1])
+
+    def test_unrolled_events_are_not_archived(self):
+        rollup_hits()
+        Event.objects.create(dstamp=local_time(2016, 1, 2), app='RapidRouter', event_type='play')
+        self.assertIsNone(archive_month(date(2016, 1, 1)))
+        rollup_hits()
+        self.assertEqual(archive_month(date(2016, 1, 1)).events, 2)
+
+    def test_late_events_are_found_and_archived(self):
+        archive_month(date(2016, 1, 1))
+        Event.objects.create(dstamp=local_time(2016, 1, 2), app='RapidRouter', event_type='play')
+        self.assertEqual([queryset.count() for queryset in Event.objects.in_month(date(2016, 1, 1))], [1, 1])
+        rollup_hits()
+        self.assertEqual(archive_month(date(2016, 1, 1)).events, 2)
+        self.assertEqual([queryset.count() for queryset in Event.objects.in_month(date(2016, 1, 1))], [0, 2])
+
+    def test_retention(self):
+        call_command('event_retention', archive_after=0, drop_after=0, export_dir=self.directory,
+                     stdout=open(os.devnull, 'w'))
+        self.assertEqual(Event.objects.count(), 0)
+        self.assertEqual(EventPartition.objects.count(), 0)
+        with gzip.open(os.path.join(self.directory, 'events-2016-02.jsonl.gz')) as export:
+            self.assertEqual(len(export.readlines()), 2)
+
+
+@override_settings(ROOT_URLCONF='reports.tests')
+class ExportTest(TestCase):
+    def setUp(self):
+        self.ids = [Event.objects.create(dstamp=local_time(2016, 3, day), app='RapidRouter', event_type='play',
+                                         details=json.dumps({'levelName': day, 'score': {'total': 10}})).id
+                    for day in (1, 2, 3)]
+        archive_month(date(2016, 2, 1))
+        Event.objects.create(dstamp=local_time(2016, 2, 10), app='RapidRouter', event_type='play')
+        rollup_hits()
+        archive_month(date(2016, 2, 1))
+
+    def export(self, *args, **options):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'export.gz')
+            call_command('export_events', *args, output=path, **options)
+            with gzip.open(path) as export:
+                return export.read().splitlines()
+        finally:
+            shutil.rmtree(directory)
+
+    def test_jsonl_across_archive_tables(self):
+        lines = self.export('2016-02-01', '2016-03-03')
+        self.assertEqual([json.loads(line)['dstamp'][:10] for line in lines],
+                         ['2016-03-01', '2016-03-02', '2016-02-10'])
+
+    def test_resume_and_flatten(self):
+        lines = self.export('2016-03-01', '2016-04-01', after_id=self.ids[0], flatten=True)
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual([row['id'] for row in rows], self.ids[1:])
+        self.assertEqual(rows[0]['details.levelName'], 2)
+        self.assertEqual(rows[0]['details.score.total'], 10)
+
+    def test_csv(self):
+        lines = self.export('2016-03-01', '2016-04-01', format='csv', flatten=True, details_fields='levelName')
+        self.assertEqual(lines[0], 'id,dstamp,app,user_id,session,event_type,details.levelName')
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[1].endswith(',play,1'))
+
+    def test_endpoint_is_for_staff(self):
+        url = reverse('export_events') + '?start=2016-03-01&end=2016-04-01'
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        user = User.objects.create_user('staff', password='password')
+        user.is_staff = True
+        user.save()
+        self.client.login(username='staff', password='password')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        lines = zlib.decompress(''.join(response.streaming_content), 16 + zlib.MAX_WBITS).splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(self.client.get(url + '&format=xml').status_code, 400)
+
+
+@override_settings(ROOT_URLCONF='reports.tests')
+class LevelHitsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        for day in (date(2016, 2, 29), date(2016, 3, 1), date(2016, 3, 7)):
+            Event.objects.create(dstamp=local_time(day.year, day.month, day.day, 12), app='RapidRouter',
+                                 event_type='play', details=json.dumps({'levelName': 1}))
+        rollup_hits()
+        email, password = signup_teacher_directly()
+        self.client.login(username=email, password=password)
+
+    def get(self, **params):
+        params.setdefault('start', '2016-02-01')
+        params.setdefault('end', '2016-03-31')
+        response = self.client.get(reverse('level_hits'), params)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)['levels']['1']
+
+    def test_granularities(self):
+        self.assertEqual(len(self.get(granularity='day')), 3)
+        self.assertEqual(self.get(granularity='week'),
+                         [{'period': '2016-02-29', 'hits': 2}, {'period': '2016-03-07', 'hits': 1}])
+        self.assertEqual(self.get(granularity='month'),
+                         [{'period': '2016-02-01', 'hits': 1}, {'period': '2016-03-01', 'hits': 2}])
+
+    def test_cached_until_the_rollup_moves_on(self):
+        self.get()
+        with self.assertNumQueries(0):
+            level_hits(date(2016, 2, 1), date(2016, 3, 31))
+        Event.objects.create(dstamp=local_time(2016, 3, 1, 13), app='RapidRouter',
+                             event_type='play', details=json.dumps({'levelName': 1}))
+        self.assertEqual(self.get()[1]['hits'], 1)
+        rollup_hits()
+        self.assertEqual(self.get()[1]['hits'], 2)
 
-# Create your tests here.
+    def test_students_and_bad_queries(self):
+        self.assertEqual(self.client.get(reverse('level_hits'), {'granularity': 'year'}).status_code, 400)
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('level_hits')).status_code, 403)
@@ -34,6 +34,191 @@
 # copyright notice and these terms. You must not misrepresent the origins of this
 # program; modified versions of the program must be marked as such and not
 # identified as the original program.
-from django.shortcuts import render
+from datetime import datetime
+import json
+import logging
 
-# Create your views here.
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework import status
+
+from portal.roles import get_user_role
+from reports import app_settings
+from reports.analytics import GRANULARITIES, level_hits
+from reports.eventlog import store_events
+from reports.export import FORMATS, export_chunks
+from reports.models import Event
+
+logger = logging.getLogger(__name__)
+
+NDJSON_CONTENT_TYPES = ('application/x-ndjson', 'application/jsonlines', 'application/x-jsonlines')
+
+
+class InvalidEvent(Exception):
+    pass
+
+
+def _user_and_session(request):
+    user = None
+    if not request.user.is_anonymous():
+        user = request.user
+    session_key = None
+    if request.session is not None:
+        session_key = request.session.session_key
+    return user, session_key
+
+
+def build_event(e, user, session_key, dstamp):
+    '''Makes an unsaved Event from a posted event, raising InvalidEvent if it can't be stored.'''
+    if not isinstance(e, dict):
+        raise InvalidEvent("Event is not an object")
+    try:
+        app, event_type, details = e["app"], e["eventType"], json.dumps(e["details"])
+    except KeyError:
+        raise InvalidEvent("Missing event attributes")
+    if not isinstance(app, basestring) or not isinstance(event_type, basestring):
+        raise InvalidEvent("Invalid event attributes")
+    for value, field in ((app, 'app'), (event_type, 'event_type'), (details, 'details')):
+        if len(value) > Event._meta.get_field(field).max_length:
+            raise InvalidEvent("Event attribute too long: " + field)
+    return Event(dstamp=dstamp, app=app, user=user, session=session_key,
+                 event_type=event_type, details=details)
+
+
+def event(request):
+    if request.method == 'POST':
+        try:
+            user, session_key = _user_and_session(request)
+            e = json.loads(request.body)
+            store_events([build_event(e, user, session_key, timezone.now())])
+            return HttpResponse("Success", content_type='text/plain', status=status.HTTP_200_OK)
+        except ValueError, e:
+            logger.error("Failed to parse event: " + str(request.body[0:1000]))
+            return HttpResponse("Failed to parse event", content_type='text/plain', status=status.HTTP_400_BAD_REQUEST)
+        except InvalidEvent, e:
+            logger.error(str(e) + ": " + str(request.body[0:1000]))
+            return HttpResponse(str(e), content_type='text/plain', status=status.HTTP_400_BAD_REQUEST)
+    else:
+        logger.info("Invalid method.")
+        return HttpResponse("Wrong method", content_type='text/plain', status=status.HTTP_405_METHOD_NOT_ALLOWED)
+
+
+def _parse_batch(request):
+    '''Returns the posted events, with a ValueError standing in for each line of newline-delimited
+    JSON that doesn't parse. A JSON array that doesn't parse raises ValueError.'''
+    content_type = request.META.get('CONTENT_TYPE', '').split(';')[0].strip()
+    body = request.body
+    if content_type not in NDJSON_CONTENT_TYPES and body.lstrip().startswith('['):
+        events = json.loads(body)
+        if not isinstance(events, list):
+            raise ValueError("Expected an array of events")
+        return events
+
+    events = []
+    for line in body.splitlines():
+        if not line.strip():
+            continue
+        try:
+            events.append(json.loads(line))
+        except ValueError, e:
+            events.append(e)
+    return events
+
+
+def events(request):
+    '''Stores a batch of events, posted as a JSON array or as newline-delimited JSON.
+
+    Valid events are stored even if others in the batch aren't, and the response lists the
+    status of each event in the order they were posted.'''
+    if request.method != 'POST':
+        logger.info("Invalid method.")
+        return HttpResponse("Wrong method", content_type='text/plain', status=status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    try:
+        posted = _parse_batch(request)
+    except ValueError:
+        logger.error("Failed to parse events: " + str(request.body[0:1000]))
+        return HttpResponse("Failed to parse events", content_type='text/plain', status=status.HTTP_400_BAD_REQUEST)
+    if len(posted) > app_settings.REPORTS_MAX_BATCH_SIZE:
+        return HttpResponse("Too many events", content_type='text/plain',
+                            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+    user, session_key = _user_and_session(request)
+    dstamp = timezone.now()
+    results = []
+    valid = []
+    for e in posted:
+        try:
+            if isinstance(e, ValueError):
+                raise InvalidEvent("Failed to parse event")
+            valid.append(build_event(e, user, session_key, dstamp))
+            results.append({'status': 'ok'})
+        except InvalidEvent, error:
+            results.append({'status': 'error', 'error': str(error)})
+
+    store_events(valid)
+    if len(valid) < len(posted):
+        logger.warning("Rejected %d of %d events" % (len(posted) - len(valid), len(posted)))
+
+    return JsonResponse({'saved': len(valid), 'rejected': len(posted) - len(valid), 'results': results})
+
+
+def parse_time(value):
+    '''Parses a date or time, taking it to be in the current time zone unless it says otherwise.'''
+    try:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            day = parse_date(value)
+            parsed = day and datetime(day.year, day.month, day.day)
+    except ValueError:
+        return None
+    if parsed is not None and timezone.is_naive(parsed) and timezone.is_aware(timezone.now()):
+        parsed = timezone.make_aware(parsed, timezone.get_current_timezone())
+    return parsed
+
+
+@staff_member_required
+def export_events(request):
+    '''Streams the events posted from ``start`` up to ``end`` as a gzipped CSV or JSON-lines file.
+
+    ``after`` carries on an interrupted export from the id of the last event it got, ``flatten``
+    gives each value of the details a field of its own and ``details_fields`` names the details
+    that get columns in a flattened CSV export.'''
+    start, end = parse_time(request.GET.get('start', '')), parse_time(request.GET.get('end', ''))
+    format = request.GET.get('format', 'jsonl')
+    after_id = request.GET.get('after')
+    if start is None or end is None or format not in FORMATS or (after_id and not after_id.isdigit()):
+        return HttpResponse("Invalid export", content_type='text/plain', status=status.HTTP_400_BAD_REQUEST)
+
+    details_fields = [field for field in request.GET.get('details_fields', '').split(',') if field]
+    chunks = export_chunks(Event.objects.between(start, end), format, int(after_id) if after_id else None,
+                           request.GET.get('flatten') == '1', details_fields)
+    response = StreamingHttpResponse(chunks, content_type='application/gzip')
+    response['Content-Disposition'] = 'attachment; filename="events.%s.gz"' % format
+    return response
+
+
+def level_hits_view(request):
+    '''Hits per level from ``start`` up to and including ``end``, by ``granularity`` (day, week or
+    month), for staff and teachers.'''
+    if not (request.user.is_staff or get_user_role(request.user).is_teacher):
+        return HttpResponse("Not allowed", content_type='text/plain', status=status.HTTP_403_FORBIDDEN)
+
+    try:
+        start, end = parse_date(request.GET.get('start', '')), parse_date(request.GET.get('end', ''))
+    except ValueError:
+        start = end = None
+    granularity = request.GET.get('granularity', 'day')
+    if start is None or end is None or granularity not in GRANULARITIES:
+        return HttpResponse("Invalid query", content_type='text/plain', status=status.HTTP_400_BAD_REQUEST)
+
+    hits = level_hits(start, end, granularity)
+    return JsonResponse({
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'granularity': granularity,
+        'levels': dict((level, [{'period': period.isoformat(), 'hits': count} for period, count in periods])
+                       for level, periods in hits.items()),
+    })
@@ -50,7 +50,6 @@ setup(name='codeforlife-portal',
         'djangocms_picture==0.1',
         'djangocms_teaser==0.1',
         'djangocms_video==0.1',
-        'django-online-status==0.1.0',
 
 
         'Pillow>=2.9.0',
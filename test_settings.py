@@ -19,11 +19,12 @@ DATABASES = {
         'ENGINE': 'django.db.backends.sqlite3',
     },
 }
-INSTALLED_APPS = ['portal']
+INSTALLED_APPS = ['portal', 'reports']
 PIPELINE_ENABLED = False
 ROOT_URLCONF = 'django_autoconfig.autourlconf'
 STATIC_ROOT = '.tests_static/'
 SECRET_KEY = 'bad_test_secret'
+EMAIL_OUTBOX_EAGER = True  # tests expect emails in django.core.mail.outbox straight away
 
 from django_autoconfig.autoconfig import configure_settings
 configure_settings(globals())